@@ -1,6 +1,9 @@
 import re
 import os
+import time
+import weakref
 import secrets
+from functools import partial
 import sqlalchemy as sa
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
@@ -39,7 +42,45 @@ def _mask_conn_str(url: str) -> str:
     except Exception:
         return "****"
 
+def _descartar_conexiones_heredadas(app_ref):
+    # Tras un fork el hijo no debe usar las conexiones del padre. close=False: los
+    # sockets siguen siendo del padre y el hijo solo las olvida y abre las suyas
+    app = app_ref()
+    if app is None:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def precargar_modulos():
+    """
+    Importa las librerías pesadas que vistas y jobs cargan de forma perezosa. Con
+    gunicorn --preload se llama en el maestro antes de crear los workers (ver
+    gunicorn.conf.py), así todos comparten esas páginas de memoria en lugar de
+    importar cada uno su copia.
+    """
+    from . import pipeline, pdf, graficos_sesion  # noqa: F401  (pandas, matplotlib, fpdf, openpyxl)
+    from .exportacion import XLSXWRITER_DISPONIBLE, PARQUET_DISPONIBLE
+    import boto3  # noqa: F401
+    import botocore.config  # noqa: F401
+    if XLSXWRITER_DISPONIBLE:
+        import xlsxwriter  # noqa: F401
+    if PARQUET_DISPONIBLE:
+        import pyarrow.parquet  # noqa: F401
+
+
 def create_app():
+    # Tiempos de cada fase del arranque (ms), ver benchmarks/bench_arranque.py
+    tiempos = {}
+    inicio = fase = time.perf_counter()
+
+    def _marcar(nombre):
+        nonlocal fase
+        ahora = time.perf_counter()
+        tiempos[nombre] = (ahora - fase) * 1000
+        fase = ahora
+
     app = Flask(__name__)
 
     # ===== SECRET_KEY seguro =====
@@ -74,9 +115,9 @@ def create_app():
         engine_opts = {
             "pool_pre_ping": True,   # Verifica la conexión antes de usarla
             "pool_recycle": 300,     # Recicla conexiones cada ~5 minutos
-            # Ajustes conservadores para free tier; puedes tunear si lo necesitas
-            "pool_size": 5,
-            "max_overflow": 5,
+            # Por worker; gunicorn.conf.py los calcula a partir de workers, hilos y jobs
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
             "pool_timeout": 30,
         }
         # Fuerza SSL si la URL no trae sslmode
@@ -92,22 +133,26 @@ def create_app():
 
     login_manager.login_view = "main.login"
     login_manager.login_message_category = "info"
+    _marcar("configuracion_y_extensiones")
 
     from .routes import main_bp
     app.register_blueprint(main_bp)
 
-    # Log de driver y prueba de conexión (usa las mismas engine options)
-    try:
-        engine = sa.create_engine(
-            app.config["SQLALCHEMY_DATABASE_URI"],
-            **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
-        )
-        app.logger.info(f"SQLAlchemy {sa.__version__}, driver: {engine.dialect.driver}")
-        with engine.connect() as conn:
-            conn.execute(sa.text("SELECT 1"))
-            app.logger.info("Conexión a DB verificada (SELECT 1 OK).")
-    except Exception as e:
-        app.logger.error(f"Engine creation/connection failed: {e}")
+    from .jobs import registrar_comandos
+    registrar_comandos(app)
+    _marcar("blueprint_y_comandos")
+
+    # Log de driver y prueba de conexión con el engine de Flask-SQLAlchemy (el mismo
+    # pool que usan las requests; antes se creaba y descartaba un engine aparte)
+    with app.app_context():
+        try:
+            app.logger.info(f"SQLAlchemy {sa.__version__}, driver: {db.engine.dialect.driver}")
+            with db.engine.connect() as conn:
+                conn.execute(sa.text("SELECT 1"))
+                app.logger.info("Conexión a DB verificada (SELECT 1 OK).")
+        except Exception as e:
+            app.logger.error(f"Engine creation/connection failed: {e}")
+    _marcar("verificacion_db")
 
     # No crear tablas automáticamente en producción - usar migraciones
     if not raw_url:  # Solo en desarrollo local con SQLite
@@ -117,5 +162,19 @@ def create_app():
                 print("✅ Tablas creadas/verificadas en SQLite")
             except Exception as e:
                 print(f"⚠️ Error al crear tablas: {e}")
+        _marcar("creacion_tablas")
+
+    # Con gunicorn --preload create_app corre en el maestro: no debe quedar ninguna
+    # conexión abierta que los workers hereden y compartan
+    with app.app_context():
+        for engine in db.engines.values():
+            # Una SQLite en memoria vive en su única conexión
+            if engine.url.database not in (None, "", ":memory:"):
+                engine.dispose()
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=partial(_descartar_conexiones_heredadas, weakref.ref(app)))
 
+    tiempos["total"] = (time.perf_counter() - inicio) * 1000
+    app.config["TIEMPOS_ARRANQUE"] = tiempos
+    app.logger.info("Arranque: " + ", ".join(f"{nombre} {ms:.0f} ms" for nombre, ms in tiempos.items()))
     return app
@@ -0,0 +1,281 @@
+# app/agregacion.py
+
+import numpy as np
+import pandas as pd
+
+# API estable del motor de agregación:
+#   preparar_datos(df)             -> df con columnas derivadas (demanda, stocks y mes)
+#   agregar_parcial(df)            -> agregados parciales (sumas y conteos) de un DataFrame preparado
+#   combinar_parciales(a, b)       -> parciales de a + b (b posterior a a en el archivo, o filas
+#                                     nuevas de un período siguiente)
+#   finalizar_agregados(parcial)   -> tablas finales (ventas_por_producto, gastos_por_mes, ...)
+#   agregar_inventario(df)         -> finalizar_agregados(agregar_parcial(df))
+#
+# agregar_parcial factoriza producto y mes una sola vez y calcula todas las sumas y
+# conteos con np.bincount, sin groupby ni ordenar el DataFrame completo.
+
+# Columnas que se calculan a partir de los datos del usuario
+COLUMNAS_DERIVADAS = ['Demanda diaria', 'Stock mínimo', 'Stock seguridad', 'Stock máximo']
+
+CLAVES = ['Nombre Producto', 'Mes']
+
+
+def preparar_datos(df):
+    """
+    Normaliza columnas y agrega las columnas derivadas (demanda, stocks y mes).
+    Sirve tanto para el DataFrame completo como para cada bloque en modo streaming.
+    """
+    df.columns = df.columns.str.strip()
+    df['Demanda diaria'] = 0
+    df['Stock mínimo'] = 0
+    df['Stock seguridad'] = 0
+    df['Stock máximo'] = 0
+    if 'Ventas Totales' in df.columns and 'Tiempo' in df.columns and 'Reposición (días)' in df.columns:
+        df['Demanda diaria'] = df['Ventas Totales'] / df['Tiempo']
+        df['Stock mínimo'] = df['Demanda diaria'] * df['Reposición (días)']
+        df['Stock seguridad'] = df['Stock mínimo'] * 0.05
+        df['Stock máximo'] = df['Stock mínimo'] + df['Stock seguridad']
+
+    if 'Nombre Producto' in df.columns:
+        df['Nombre Producto'] = df['Nombre Producto'].str.strip().str.lower()
+    else:
+        df['Nombre Producto'] = "Producto Genérico"
+
+    if 'Fecha' in df.columns:
+        df['Fecha'] = pd.to_datetime(df['Fecha'], dayfirst=False, errors='coerce')
+        df['Mes'] = df['Fecha'].dt.strftime('%B %Y')
+
+    return df
+
+
+def _valores(df, columna):
+    return df[columna].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _suma_y_conteo(codigos, valores, tamano):
+    """
+    Suma (ignorando NaN) y cantidad de valores no nulos por código. Los códigos
+    negativos (clave nula) se descartan, igual que en groupby.
+    """
+    no_nulos = (codigos >= 0) & ~np.isnan(valores)
+    suma = np.bincount(codigos[no_nulos], weights=valores[no_nulos], minlength=tamano)
+    conteo = np.bincount(codigos[no_nulos], minlength=tamano)
+    return suma, conteo
+
+
+def _ultimo_por_codigo(codigos, fechas, tamano):
+    """
+    Índice de la fila con la fecha más reciente de cada código (la última del archivo
+    si hay empate), o -1 si el código no tiene filas. Equivale a ordenar por Fecha
+    y tomar 'last', pero en O(n).
+    """
+    fecha_max = np.full(tamano, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(fecha_max, codigos, fechas)
+    candidatos = np.flatnonzero(fechas == fecha_max[codigos])
+    ultimo = np.full(tamano, -1, dtype=np.int64)
+    np.maximum.at(ultimo, codigos[candidatos], candidatos)
+    return ultimo
+
+
+def agregar_parcial(df):
+    """
+    Calcula los agregados parciales de un DataFrame preparado en una sola pasada
+    factorizada. Los parciales guardan sumas y conteos para poder combinarse después
+    sin volver a leer las filas.
+    """
+    parcial = {
+        'columnas': list(df.columns),
+        'total_ventas': 0.0,
+        'fecha_max': None,
+        'ventas_producto': None,
+        'ventas_mes': None,
+        'gastos_mes': None,
+        'stock_mes': None,
+        'ultimo_stock': None,
+        'stock_producto': None,
+    }
+
+    cod_prod, productos = pd.factorize(df['Nombre Producto'])
+    num_prod = len(productos)
+    productos = np.asarray(productos, dtype=object)
+
+    minimo = _valores(df, 'Stock mínimo')
+    maximo = _valores(df, 'Stock máximo')
+    min_suma, min_n = _suma_y_conteo(cod_prod, minimo, num_prod)
+    max_suma, max_n = _suma_y_conteo(cod_prod, maximo, num_prod)
+    parcial['stock_producto'] = pd.DataFrame({
+        'Nombre Producto': productos,
+        'min_suma': min_suma, 'min_n': min_n,
+        'max_suma': max_suma, 'max_n': max_n,
+    })
+
+    ventas = _valores(df, 'Ventas') if 'Ventas' in df.columns else None
+    if ventas is not None:
+        parcial['total_ventas'] = float(np.nansum(ventas))
+        parcial['ventas_producto'] = pd.DataFrame({
+            'Nombre Producto': productos,
+            'Ventas': _suma_y_conteo(cod_prod, ventas, num_prod)[0],
+        })
+
+    if 'Fecha' not in df.columns:
+        return parcial
+
+    fecha_max = df['Fecha'].max()
+    parcial['fecha_max'] = None if pd.isna(fecha_max) else fecha_max
+
+    cod_mes, meses = pd.factorize(df['Mes'])
+    num_meses = len(meses)
+    meses = np.asarray(meses, dtype=object)
+
+    # Clave compuesta (producto, mes) factorizada a códigos densos
+    validos = (cod_prod >= 0) & (cod_mes >= 0)
+    cod_pm = np.full(len(df), -1, dtype=np.int64)
+    cod_pm[validos], claves_pm = pd.factorize(cod_prod[validos].astype(np.int64) * num_meses + cod_mes[validos])
+    num_pm = len(claves_pm)
+    claves_pm = np.asarray(claves_pm, dtype=np.int64)
+    prod_pm = productos[claves_pm // max(num_meses, 1)]
+    mes_pm = meses[claves_pm % max(num_meses, 1)]
+
+    if ventas is not None:
+        parcial['ventas_mes'] = pd.DataFrame({
+            'Nombre Producto': prod_pm, 'Mes': mes_pm,
+            'Ventas': _suma_y_conteo(cod_pm, ventas, num_pm)[0],
+        })
+
+    if 'Gastos(compras)' in df.columns:
+        parcial['gastos_mes'] = pd.DataFrame({
+            'Mes': meses,
+            'Gastos(compras)': _suma_y_conteo(cod_mes, _valores(df, 'Gastos(compras)'), num_meses)[0],
+        })
+
+    if 'Stock Final' in df.columns:
+        min_suma, min_n = _suma_y_conteo(cod_pm, minimo, num_pm)
+        max_suma, max_n = _suma_y_conteo(cod_pm, maximo, num_pm)
+        parcial['stock_mes'] = pd.DataFrame({
+            'Nombre Producto': prod_pm, 'Mes': mes_pm,
+            'min_suma': min_suma, 'min_n': min_n,
+            'max_suma': max_suma, 'max_n': max_n,
+        })
+
+        stock_final = _valores(df, 'Stock Final')
+        con_stock = np.flatnonzero((cod_pm >= 0) & ~np.isnan(stock_final))
+        fechas = df['Fecha'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        ultimo = _ultimo_por_codigo(cod_pm[con_stock], fechas[con_stock], num_pm)
+        con_ultimo = ultimo >= 0
+        filas = con_stock[ultimo[con_ultimo]]
+        parcial['ultimo_stock'] = pd.DataFrame({
+            'Nombre Producto': prod_pm[con_ultimo], 'Mes': mes_pm[con_ultimo],
+            'Fecha': df['Fecha'].to_numpy()[filas],
+            'Stock Final': stock_final[filas],
+        })
+
+    return parcial
+
+
+def _ultimo_por_grupo(df):
+    # Equivale a ordenar por Fecha y tomar el último valor no nulo de cada (producto, mes)
+    return df.sort_values('Fecha', kind='stable').drop_duplicates(subset=CLAVES, keep='last')
+
+
+def _sumar(a, b, claves):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return pd.concat([a, b], ignore_index=True).groupby(claves, sort=False).sum().reset_index()
+
+
+def _combinar_ultimo(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return _ultimo_por_grupo(pd.concat([a, b], ignore_index=True))
+
+
+def _fecha_max(a, b):
+    fechas = [f for f in (a, b) if f is not None]
+    return max(fechas) if fechas else None
+
+
+def combinar_parciales(a, b):
+    """
+    Combina dos agregados parciales (b se considera posterior a a en el archivo).
+    Trabaja sobre tablas del tamaño productos x meses, no sobre las filas.
+    """
+    if a is None:
+        return b
+    return {
+        'columnas': a['columnas'],
+        'total_ventas': a['total_ventas'] + b['total_ventas'],
+        'fecha_max': _fecha_max(a['fecha_max'], b['fecha_max']),
+        'ventas_producto': _sumar(a['ventas_producto'], b['ventas_producto'], 'Nombre Producto'),
+        'ventas_mes': _sumar(a['ventas_mes'], b['ventas_mes'], CLAVES),
+        'gastos_mes': _sumar(a['gastos_mes'], b['gastos_mes'], 'Mes'),
+        'stock_mes': _sumar(a['stock_mes'], b['stock_mes'], CLAVES),
+        'ultimo_stock': _combinar_ultimo(a['ultimo_stock'], b['ultimo_stock']),
+        'stock_producto': _sumar(a['stock_producto'], b['stock_producto'], 'Nombre Producto'),
+    }
+
+
+def _promedio(suma, conteo):
+    return suma / conteo.where(conteo > 0)
+
+
+def finalizar_agregados(parcial):
+    """
+    Convierte los agregados parciales en las tablas que usa el resto de la aplicación:
+    ventas_por_producto, gastos_por_mes, resumen_productos y los datos de los gráficos.
+    El parcial se conserva en el resultado para poder continuar la sesión después
+    (modo incremental).
+    """
+    resultado = {
+        'columnas': parcial['columnas'],
+        'total_ventas': parcial['total_ventas'],
+        'fecha_max': parcial['fecha_max'],
+        'parcial': parcial,
+        'ventas_por_nombre': None,
+        'ventas_por_producto': None,
+        'gastos_por_mes': None,
+        'resumen_productos': None,
+        'stock_por_nombre': None,
+    }
+
+    if parcial['ventas_producto'] is not None:
+        resultado['ventas_por_nombre'] = (
+            parcial['ventas_producto'].sort_values('Nombre Producto').reset_index(drop=True)
+        )
+
+    if parcial['ventas_mes'] is not None:
+        resultado['ventas_por_producto'] = parcial['ventas_mes'].sort_values(CLAVES).reset_index(drop=True)
+
+    if parcial['gastos_mes'] is not None:
+        resultado['gastos_por_mes'] = parcial['gastos_mes'].sort_values('Mes').reset_index(drop=True)
+
+    if parcial['stock_mes'] is not None:
+        stock_mes = parcial['stock_mes'].sort_values(CLAVES).reset_index(drop=True)
+        ultimo = parcial['ultimo_stock'][CLAVES + ['Stock Final']]
+        resumen = stock_mes.merge(ultimo, on=CLAVES, how='left')
+        resultado['resumen_productos'] = pd.DataFrame({
+            'Nombre Producto': resumen['Nombre Producto'],
+            'Mes': resumen['Mes'],
+            'Stock_Final_Ultimo_Dia': resumen['Stock Final'],
+            'Stock_Minimo_Promedio': _promedio(resumen['min_suma'], resumen['min_n']),
+            'Stock_Maximo_Promedio': _promedio(resumen['max_suma'], resumen['max_n']),
+        })
+
+    stock = parcial['stock_producto'].sort_values('Nombre Producto').reset_index(drop=True)
+    resultado['stock_por_nombre'] = pd.DataFrame({
+        'Nombre Producto': stock['Nombre Producto'],
+        'Stock mínimo': _promedio(stock['min_suma'], stock['min_n']),
+        'Stock máximo': _promedio(stock['max_suma'], stock['max_n']),
+    })
+
+    return resultado
+
+
+def agregar_inventario(df):
+    """
+    Agregados de un DataFrame ya preparado y cargado completo en memoria.
+    """
+    return finalizar_agregados(agregar_parcial(df))
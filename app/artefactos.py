@@ -0,0 +1,371 @@
+# app/artefactos.py
+
+import io
+import os
+import json
+import zlib
+import struct
+from importlib.util import find_spec
+
+from .s3_utils import download_file_obj_from_s3, download_range_from_s3, file_exists_in_s3, upload_file_obj_to_s3
+from .cache import cache_artefactos
+from .datos_graficos import NOMBRE_DATOS_GRAFICOS
+
+# pandas (y pyarrow, su motor de Parquet) se importan solo en las funciones que leen
+# tablas: el dashboard y las descargas usan el encabezado y no los necesitan
+PARQUET_DISPONIBLE = find_spec('pyarrow') is not None
+
+# Bundle de sesión: un único objeto con todos los resúmenes de un procesamiento.
+#
+#   b"INVB" | versión (1 byte) | largo del encabezado (uint32 big-endian) | encabezado JSON | secciones
+#
+# El encabezado trae los totales ya calculados y la ubicación (offset/largo) de cada
+# sección, así el dashboard puede leer solo el encabezado con un GET por rango.
+# Versión 2: las tablas pueden ir en Parquet (columnar) además de JSON comprimido.
+# Opcionalmente incluye el parcial de la agregación (secciones 'parcial.*' y la clave
+# 'parcial' del encabezado) para continuar la sesión en modo incremental.
+# Con gráficos incluye además la sección 'datos_graficos' (JSON para Chart.js), que el
+# dashboard lee con un GET por rango.
+NOMBRE_BUNDLE = 'sesion.bundle'
+MAGIA_BUNDLE = b'INVB'
+VERSION_BUNDLE = 2
+_PREFIJO = struct.Struct('>4sBI')
+# Bytes que se piden en el primer GET por rango; alcanza para encabezados normales
+BYTES_ENCABEZADO = 4096
+
+RESUMEN_VACIO = {
+    'total_ventas': 0,
+    'producto_mas_vendido': 'N/A',
+    'producto_menos_vendido': 'N/A',
+    'alerta_presupuesto': '',
+    'presupuesto_mensual': 0,
+    'saldo_final': 0
+}
+
+TABLAS = ('ventas_por_producto', 'gastos_por_mes', 'resumen_productos')
+# Tablas del parcial de agregacion.py (sumas y conteos, combinables con filas nuevas)
+TABLAS_PARCIAL = ('ventas_producto', 'ventas_mes', 'gastos_mes', 'stock_mes', 'ultimo_stock', 'stock_producto')
+
+# Artefactos que se pueden descargar como JSON (los JSON sueltos de las sesiones anteriores
+# al bundle, más los datos de los gráficos). El resumen de ventas no: cambia si la sesión
+# se reutiliza con otro presupuesto y el JSON guardado quedaría desactualizado.
+ARTEFACTOS_JSON = TABLAS + ('nombres_graficos', NOMBRE_DATOS_GRAFICOS)
+# Validez (segundos) de los enlaces de descarga pre-firmados
+DESCARGA_URL_EXPIRA = int(os.getenv('DESCARGA_URL_EXPIRA', '300'))
+
+# Formato de las tablas: 'parquet' (si hay pyarrow) o 'json' (registros comprimidos)
+FORMATO_TABLAS = os.getenv('ARTEFACTOS_FORMATO', 'parquet' if PARQUET_DISPONIBLE else 'json')
+# Columnas con pocos valores distintos que se guardan como diccionario
+COLUMNAS_DICCIONARIO = ('Nombre Producto', 'Mes')
+
+
+def serializar_tabla(df, formato=FORMATO_TABLAS):
+    """
+    Serializa un DataFrame de resumen. Retorna (bytes, formato), donde formato es
+    'parquet' o 'json+zlib'. En Parquet los nombres de producto y los meses van
+    codificados como diccionario.
+    """
+    if formato == 'parquet':
+        categorias = {c: 'category' for c in COLUMNAS_DICCIONARIO if c in df.columns}
+        buffer = io.BytesIO()
+        df.astype(categorias).to_parquet(buffer, index=False)
+        return buffer.getvalue(), 'parquet'
+    return zlib.compress(df.to_json(orient='records').encode('utf-8')), 'json+zlib'
+
+
+def deserializar_tabla(datos, formato):
+    """
+    Lee una tabla serializada con serializar_tabla.
+    """
+    import pandas as pd
+
+    if formato == 'parquet':
+        if not PARQUET_DISPONIBLE:
+            raise RuntimeError("Se necesita pyarrow para leer artefactos en Parquet")
+        return pd.read_parquet(io.BytesIO(datos))
+    if formato == 'json+zlib':
+        datos = zlib.decompress(datos)
+    return pd.read_json(io.StringIO(datos.decode('utf-8')))
+
+
+def construir_bundle(resumen_ventas, tablas, nombres_graficos, parcial=None, datos_graficos=None):
+    """
+    Arma el bundle de sesión. `tablas` es un dict nombre -> DataFrame (o None si
+    la tabla no aplica para este archivo). `datos_graficos` son los datos que usa
+    el dashboard para dibujar los gráficos en el navegador. Retorna los bytes del objeto.
+    """
+    secciones = {}
+    cuerpo = io.BytesIO()
+
+    def agregar_seccion(nombre, datos, formato):
+        secciones[nombre] = {'offset': cuerpo.tell(), 'largo': len(datos), 'formato': formato}
+        cuerpo.write(datos)
+
+    for nombre in TABLAS:
+        df = tablas.get(nombre)
+        if df is not None:
+            agregar_seccion(nombre, *serializar_tabla(df))
+    agregar_seccion('nombres_graficos', zlib.compress(json.dumps(nombres_graficos).encode('utf-8')), 'json+zlib')
+    if datos_graficos is not None:
+        agregar_seccion(NOMBRE_DATOS_GRAFICOS, zlib.compress(json.dumps(datos_graficos).encode('utf-8')), 'json+zlib')
+
+    info_parcial = None
+    if parcial is not None and parcial['fecha_max'] is not None:
+        for nombre in TABLAS_PARCIAL:
+            df = parcial[nombre]
+            if df is not None:
+                if nombre == 'ultimo_stock':
+                    # Al continuar la sesión todas las filas viejas son anteriores a las nuevas
+                    df = df.drop(columns='Fecha')
+                agregar_seccion(f"parcial.{nombre}", *serializar_tabla(df))
+        info_parcial = {
+            'columnas': parcial['columnas'],
+            'total_ventas': parcial['total_ventas'],
+            'fecha_max': parcial['fecha_max'].isoformat(),
+        }
+
+    totales = {
+        'total_gastos': float(tablas['gastos_por_mes']['Gastos(compras)'].sum())
+        if tablas.get('gastos_por_mes') is not None else 0,
+        'total_ventas': float(tablas['ventas_por_producto']['Ventas'].sum())
+        if tablas.get('ventas_por_producto') is not None else 0,
+    }
+    encabezado = json.dumps({
+        'version': VERSION_BUNDLE,
+        'resumen_ventas': resumen_ventas,
+        'totales': totales,
+        'secciones': secciones,
+        'parcial': info_parcial,
+    }).encode('utf-8')
+
+    return _PREFIJO.pack(MAGIA_BUNDLE, VERSION_BUNDLE, len(encabezado)) + encabezado + cuerpo.getvalue()
+
+
+def _leer_prefijo(datos):
+    magia, version, largo = _PREFIJO.unpack_from(datos)
+    if magia != MAGIA_BUNDLE:
+        raise ValueError("El objeto no es un bundle de sesión")
+    if version > VERSION_BUNDLE:
+        raise ValueError(f"Versión de bundle no soportada: {version}")
+    return largo
+
+
+def leer_encabezado_bundle(datos):
+    """
+    Lee el encabezado de un bundle (completo o solo sus primeros bytes).
+    """
+    largo = _leer_prefijo(datos)
+    return json.loads(datos[_PREFIJO.size:_PREFIJO.size + largo].decode('utf-8'))
+
+
+def leer_seccion_bundle(datos, encabezado, nombre):
+    """
+    Retorna (bytes, formato) de una sección del bundle, o None si no existe.
+    """
+    seccion = encabezado['secciones'].get(nombre)
+    if seccion is None:
+        return None
+    inicio = _PREFIJO.size + _leer_prefijo(datos) + seccion['offset']
+    return datos[inicio:inicio + seccion['largo']], seccion['formato']
+
+
+def leer_artefacto(bucket_name, session_id, nombre):
+    """
+    Bytes de un artefacto de la sesión, pasando por la cache en memoria del proceso.
+    Los artefactos no cambian después de procesar, así que una vista repetida no
+    vuelve a S3. Retorna None si el artefacto no existe.
+    """
+    clave = (bucket_name, session_id, nombre)
+    datos = cache_artefactos.get(clave)
+    if datos is None:
+        contenido = download_file_obj_from_s3(bucket_name, f"{session_id}/{nombre}")
+        if not contenido:
+            return None
+        datos = contenido.getvalue()
+        cache_artefactos.set(clave, datos, len(datos))
+    return datos
+
+
+def _descargar_prefijo(bucket_name, session_id):
+    # Primeros bytes del bundle, hasta el final del encabezado
+    clave = (bucket_name, session_id, f"{NOMBRE_BUNDLE}#encabezado")
+    datos = cache_artefactos.get(clave)
+    if datos is None:
+        # Si el bundle completo ya está en cache, no hace falta ir a S3
+        datos = cache_artefactos.get((bucket_name, session_id, NOMBRE_BUNDLE))
+    if datos is None:
+        key = f"{session_id}/{NOMBRE_BUNDLE}"
+        datos = download_range_from_s3(bucket_name, key, 0, BYTES_ENCABEZADO - 1)
+        if not datos:
+            return None
+        largo = _leer_prefijo(datos)
+        faltan = _PREFIJO.size + largo - len(datos)
+        if faltan > 0:
+            resto = download_range_from_s3(bucket_name, key, len(datos), len(datos) + faltan - 1)
+            if resto is None:
+                return None
+            datos += resto
+        cache_artefactos.set(clave, datos, len(datos))
+    return datos
+
+
+def _descargar_encabezado(bucket_name, session_id):
+    datos = _descargar_prefijo(bucket_name, session_id)
+    return leer_encabezado_bundle(datos) if datos else None
+
+
+def _descargar_seccion(bucket_name, session_id, nombre):
+    """
+    (bytes, formato) de una sección del bundle, con un GET por rango en vez de
+    descargar el bundle completo. Retorna None si la sesión o la sección no existen.
+    """
+    prefijo = _descargar_prefijo(bucket_name, session_id)
+    if not prefijo:
+        return None
+    encabezado = leer_encabezado_bundle(prefijo)
+    seccion = encabezado['secciones'].get(nombre)
+    if seccion is None:
+        return None
+
+    clave = (bucket_name, session_id, f"{NOMBRE_BUNDLE}#{nombre}")
+    datos = cache_artefactos.get(clave)
+    if datos is None:
+        completo = cache_artefactos.get((bucket_name, session_id, NOMBRE_BUNDLE))
+        if completo is not None:
+            datos = leer_seccion_bundle(completo, encabezado, nombre)[0]
+        else:
+            inicio = _PREFIJO.size + _leer_prefijo(prefijo) + seccion['offset']
+            datos = download_range_from_s3(bucket_name, f"{session_id}/{NOMBRE_BUNDLE}",
+                                           inicio, inicio + seccion['largo'] - 1)
+            if datos is None:
+                return None
+        cache_artefactos.set(clave, datos, len(datos))
+    return datos, seccion['formato']
+
+
+def _descargar_json(bucket_name, session_id, nombre):
+    contenido = leer_artefacto(bucket_name, session_id, nombre)
+    if contenido:
+        return json.loads(contenido.decode('utf-8'))
+    return None
+
+
+def cargar_resumen_sesion(bucket_name, session_id):
+    """
+    Datos que necesita el dashboard: resumen de ventas y totales de gastos/ventas.
+    Con bundle solo se descarga el encabezado; las sesiones antiguas se leen de
+    los JSON sueltos.
+    """
+    encabezado = _descargar_encabezado(bucket_name, session_id)
+    if encabezado is not None:
+        return {
+            'resumen_ventas': encabezado['resumen_ventas'],
+            'total_gastos': encabezado['totales']['total_gastos'],
+            'total_ventas': encabezado['totales']['total_ventas'],
+        }
+
+    # Formato anterior: un JSON por artefacto
+    resumen_ventas = _descargar_json(bucket_name, session_id, 'resumen_ventas.json') or dict(RESUMEN_VACIO)
+    gastos_por_mes = _descargar_json(bucket_name, session_id, 'gastos_por_mes.json') or []
+    ventas_por_producto = _descargar_json(bucket_name, session_id, 'ventas_por_producto.json') or []
+    return {
+        'resumen_ventas': resumen_ventas,
+        'total_gastos': sum(item.get('Gastos(compras)', 0) for item in gastos_por_mes),
+        'total_ventas': sum(item.get('Ventas', 0) for item in ventas_por_producto),
+    }
+
+
+def cargar_sesion(bucket_name, session_id):
+    """
+    Todos los resúmenes de una sesión (lo que usa el PDF). Las tablas se retornan
+    como DataFrames, o None si la sesión no las tiene.
+    """
+    datos = leer_artefacto(bucket_name, session_id, NOMBRE_BUNDLE)
+    if datos:
+        encabezado = leer_encabezado_bundle(datos)
+        sesion = {'resumen_ventas': encabezado['resumen_ventas']}
+        for nombre in TABLAS:
+            seccion = leer_seccion_bundle(datos, encabezado, nombre)
+            sesion[nombre] = deserializar_tabla(*seccion) if seccion is not None else None
+        nombres = leer_seccion_bundle(datos, encabezado, 'nombres_graficos')
+        sesion['nombres_graficos'] = (json.loads(zlib.decompress(nombres[0]).decode('utf-8')) if nombres
+                                      else {"stock": [], "ventas": []})
+        return sesion
+
+    # Formato anterior: un JSON por artefacto
+    import pandas as pd
+
+    sesion = {'resumen_ventas': _descargar_json(bucket_name, session_id, 'resumen_ventas.json')}
+    for nombre in TABLAS:
+        tabla = leer_artefacto(bucket_name, session_id, f"{nombre}.json")
+        sesion[nombre] = pd.read_json(io.BytesIO(tabla)) if tabla else None
+    sesion['nombres_graficos'] = (_descargar_json(bucket_name, session_id, 'nombres_graficos.json')
+                                  or {"stock": [], "ventas": []})
+    return sesion
+
+
+def cargar_parcial(bucket_name, session_id):
+    """
+    Parcial de agregación guardado en el bundle de una sesión, listo para
+    combinarse con filas nuevas. Retorna None si la sesión no lo tiene.
+    """
+    datos = leer_artefacto(bucket_name, session_id, NOMBRE_BUNDLE)
+    if not datos:
+        return None
+    encabezado = leer_encabezado_bundle(datos)
+    info = encabezado.get('parcial')
+    if info is None:
+        return None
+
+    import pandas as pd
+
+    fecha_max = pd.Timestamp(info['fecha_max'])
+    parcial = {'columnas': info['columnas'], 'total_ventas': info['total_ventas'], 'fecha_max': fecha_max}
+    for nombre in TABLAS_PARCIAL:
+        seccion = leer_seccion_bundle(datos, encabezado, f"parcial.{nombre}")
+        df = deserializar_tabla(*seccion) if seccion is not None else None
+        if df is not None:
+            # Parquet devuelve las columnas de diccionario como categorías
+            df = df.astype({c: object for c in COLUMNAS_DICCIONARIO if c in df.columns})
+        parcial[nombre] = df
+    if parcial['ultimo_stock'] is not None:
+        parcial['ultimo_stock']['Fecha'] = fecha_max
+    return parcial
+
+
+def cargar_datos_graficos(bucket_name, session_id):
+    """
+    Datos de los gráficos de la sesión (ver datos_graficos.py), o None si la sesión
+    no los tiene (sin gráficos o procesada antes de existir esta sección).
+    """
+    seccion = _descargar_seccion(bucket_name, session_id, NOMBRE_DATOS_GRAFICOS)
+    if seccion is None:
+        return None
+    return json.loads(zlib.decompress(seccion[0]).decode('utf-8'))
+
+
+def exportar_json(bucket_name, session_id, nombre):
+    """
+    Key en S3 del artefacto `nombre`.json de la sesión, para descargarlo directo de S3.
+    Las sesiones con bundle no tienen los JSON sueltos: se generan a partir del bundle
+    la primera vez y se guardan junto a él. Retorna None si la sesión no lo tiene.
+    """
+    key = f"{session_id}/{nombre}.json"
+    if file_exists_in_s3(bucket_name, key):
+        return key
+
+    if nombre == NOMBRE_DATOS_GRAFICOS:
+        valor = cargar_datos_graficos(bucket_name, session_id)
+    else:
+        valor = cargar_sesion(bucket_name, session_id).get(nombre)
+    if valor is None:
+        return None
+
+    # Las tablas son DataFrames (pandas ya está cargado); el resto, JSON plano
+    if hasattr(valor, 'to_json'):
+        contenido = valor.to_json(orient='records', force_ascii=False)
+    else:
+        contenido = json.dumps(valor, ensure_ascii=False)
+    if not upload_file_obj_to_s3(io.BytesIO(contenido.encode('utf-8')), bucket_name, key, 'application/json'):
+        return None
+    return key
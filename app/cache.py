@@ -0,0 +1,92 @@
+# app/cache.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Cache en memoria del proceso, acotada por tamaño total en bytes (LRU) y con TTL.
+    Pensada para artefactos inmutables de S3; es segura entre hilos.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, tamaño, valor)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            expira, tamano, valor = entrada
+            if expira < time.monotonic():
+                self._quitar(clave)
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def set(self, clave, valor, tamano):
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + self.ttl, tamano, valor)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                clave_vieja = next(iter(self._datos))
+                self._quitar(clave_vieja)
+                self.evictions += 1
+
+    def _quitar(self, clave):
+        _, tamano, _ = self._datos.pop(clave)
+        self._bytes -= tamano
+
+    def invalidar(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / consultas if consultas else 0.0,
+                'entradas': len(self._datos),
+                'bytes': self._bytes,
+            }
+
+
+# Cache de artefactos de sesión (bundle, encabezado, JSON antiguos y gráficos)
+cache_artefactos = CacheLRU(
+    max_bytes=int(os.getenv('ARTEFACTOS_CACHE_MB', '64')) * 1024 * 1024,
+    ttl=int(os.getenv('ARTEFACTOS_CACHE_TTL', '3600'))
+)
+
+# Identidad de los usuarios autenticados (ver models.load_user). Cada entrada cuenta 1,
+# así que max_bytes es la cantidad máxima de usuarios; el TTL acota cuánto puede
+# durar en otros workers un dato que cambió (la invalidación es solo del proceso)
+cache_usuarios = CacheLRU(
+    max_bytes=int(os.getenv('USUARIOS_CACHE_MAX', '10000')),
+    ttl=int(os.getenv('USUARIOS_CACHE_TTL', '300'))
+)
@@ -0,0 +1,82 @@
+# app/datos_graficos.py
+
+import os
+import math
+
+# Productos por gráfico (una página del dashboard o un PNG del PDF)
+PRODUCTOS_POR_GRAFICO = 6
+# Dónde se dibujan los gráficos del dashboard: 'cliente' (Chart.js a partir de los datos
+# en JSON) o 'servidor' (PNG de matplotlib, dibujados al pedirlos y guardados en S3).
+# El PDF usa los PNG en ambos casos.
+MODOS_GRAFICOS = ('cliente', 'servidor')
+GRAFICOS_MODO = os.getenv('GRAFICOS_MODO', 'cliente')
+# Sección del bundle con los datos de los gráficos
+NOMBRE_DATOS_GRAFICOS = 'datos_graficos'
+
+
+def _numeros(serie):
+    # NaN (p. ej. un producto sin stock) -> null en el JSON
+    return [None if valor is None or math.isnan(valor) else round(float(valor), 2) for valor in serie]
+
+
+def construir_datos_graficos(df_stock=None, df_ventas=None):
+    """
+    Datos compactos de los gráficos: ventas y stock mínimo/máximo promedio por producto,
+    en el mismo orden que los gráficos del servidor. Retorna un dict serializable a JSON.
+    """
+    datos = {}
+    if df_ventas is not None:
+        datos['ventas'] = {
+            'productos': [str(p) for p in df_ventas['Nombre Producto']],
+            'ventas': _numeros(df_ventas['Ventas'].astype(float)),
+        }
+    if df_stock is not None:
+        datos['stock'] = {
+            'productos': [str(p) for p in df_stock['Nombre Producto']],
+            'minimo': _numeros(df_stock['Stock mínimo'].astype(float)),
+            'maximo': _numeros(df_stock['Stock máximo'].astype(float)),
+        }
+    return datos
+
+
+def paginar_datos_graficos(datos, pagina=None, tipo=None):
+    """
+    Recorta los datos a la página indicada (PRODUCTOS_POR_GRAFICO productos, desde 1);
+    sin página retorna todos. Con `tipo` ('stock' o 'ventas') solo ese gráfico.
+    Cada tipo incluye la cantidad total de páginas.
+    """
+    resultado = {'pagina': pagina, 'por_pagina': PRODUCTOS_POR_GRAFICO}
+    for nombre, series in datos.items():
+        if tipo is not None and nombre != tipo:
+            continue
+        total = len(series['productos'])
+        if pagina is not None:
+            inicio = (pagina - 1) * PRODUCTOS_POR_GRAFICO
+            series = {clave: valores[inicio:inicio + PRODUCTOS_POR_GRAFICO] for clave, valores in series.items()}
+        resultado[nombre] = dict(series, paginas=math.ceil(total / PRODUCTOS_POR_GRAFICO))
+    return resultado
+
+
+def nombre_grafico(tipo, parte):
+    return f"grafico_{tipo}_{parte}.png"
+
+
+def parsear_nombre_grafico(nombre):
+    # grafico_stock_12.png -> ('stock', 12)
+    tipo, parte = nombre[len('grafico_'):-len('.png')].rsplit('_', 1)
+    return tipo, int(parte)
+
+
+def nombres_disponibles(datos, modo=None):
+    """
+    nombres_graficos de una sesión: todos los gráficos que se pueden pedir (uno por
+    página de productos), estén o no dibujados, y el modo del dashboard.
+    """
+    nombres = {'stock': [], 'ventas': []}
+    for tipo in nombres:
+        if tipo in datos:
+            paginas = math.ceil(len(datos[tipo]['productos']) / PRODUCTOS_POR_GRAFICO)
+            nombres[tipo] = [nombre_grafico(tipo, parte) for parte in range(1, paginas + 1)]
+    if modo is not None:
+        nombres['modo'] = modo
+    return nombres
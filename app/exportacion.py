@@ -0,0 +1,162 @@
+# app/exportacion.py
+
+import os
+import tempfile
+from importlib.util import find_spec
+
+# Solo se verifica que estén instalados: se importan al escribir el primer bloque,
+# así las vistas que listan los formatos no cargan pyarrow ni xlsxwriter
+XLSXWRITER_DISPONIBLE = find_spec('xlsxwriter') is not None
+PARQUET_DISPONIBLE = find_spec('pyarrow') is not None
+
+# Formatos del inventario enriquecido: extensión -> content type
+FORMATOS_EXPORTACION = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORTACION_FORMATO = os.getenv('EXPORTACION_FORMATO', 'xlsx')
+NOMBRE_EXPORTACION = 'inventario_calculado'
+# Filas que se convierten juntas al escribir (acota la copia temporal de cada bloque)
+FILAS_POR_ESCRITURA = 10_000
+# Bytes que el archivo exportado puede ocupar en memoria antes de pasar a disco
+EXPORTACION_MAX_MEMORIA = 8 * 1024 * 1024
+
+
+def formatos_disponibles():
+    return [f for f in FORMATOS_EXPORTACION if f != 'parquet' or PARQUET_DISPONIBLE]
+
+
+class Exportador:
+    """
+    Escribe el inventario enriquecido por bloques, con memoria constante, en un archivo
+    temporal que pasa a disco cuando crece. El Excel usa xlsxwriter en modo
+    constant_memory (o el modo write-only de openpyxl si xlsxwriter no está instalado);
+    CSV y Parquet se escriben directamente y son bastante más rápidos.
+    """
+
+    def __init__(self, formato=None, tipos=None):
+        """
+        `tipos` (columna -> 'numero' o 'fecha'; el resto se escribe como texto) fija
+        los tipos del Parquet cuando los bloques vienen de lecturas separadas y sus
+        dtypes pueden variar. Sin `tipos` se deducen de los dtypes del primer bloque.
+        """
+        formato = formato or EXPORTACION_FORMATO
+        if formato not in formatos_disponibles():
+            raise ValueError(f"Formato de exportación no disponible: {formato}")
+        self.formato = formato
+        self.nombre = f"{NOMBRE_EXPORTACION}.{formato}"
+        self.content_type = FORMATOS_EXPORTACION[formato]
+        self.archivo = tempfile.SpooledTemporaryFile(max_size=EXPORTACION_MAX_MEMORIA)
+        self._filas = 0
+        self._tipos_declarados = tipos
+        self._tipos = None
+        self._libro = self._hoja = self._parquet = self._esquema = None
+
+    def agregar(self, df):
+        """
+        Agrega las filas de `df`. Todos los bloques deben tener las mismas columnas.
+        """
+        if len(df) == 0 and self._tipos is None:
+            # Sin filas igual se escriben los encabezados
+            self._escribir(df)
+        for inicio in range(0, len(df), FILAS_POR_ESCRITURA):
+            self._escribir(df.iloc[inicio:inicio + FILAS_POR_ESCRITURA])
+
+    def _escribir(self, bloque):
+        primero = self._tipos is None
+        if primero:
+            self._tipos = self._deducir_tipos(bloque)
+
+        if self.formato == 'csv':
+            self.archivo.write(bloque.to_csv(index=False, header=primero).encode('utf-8'))
+        elif self.formato == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet is None:
+                tipos_parquet = {'numero': pa.float64(), 'fecha': pa.timestamp('ns'), 'texto': pa.string()}
+                self._esquema = pa.schema([(str(columna), tipos_parquet[tipo])
+                                           for columna, tipo in self._tipos.items()])
+                self._parquet = pq.ParquetWriter(self.archivo, self._esquema)
+            tabla = pa.Table.from_pandas(self._normalizar(bloque), schema=self._esquema, preserve_index=False)
+            self._parquet.write_table(tabla)
+        else:
+            self._escribir_excel(bloque)
+        self._filas += len(bloque)
+
+    def _deducir_tipos(self, bloque):
+        # Se decide una vez: el esquema del Parquet no puede cambiar entre bloques
+        tipos = {}
+        for columna in bloque.columns:
+            if self._tipos_declarados is not None:
+                tipos[columna] = self._tipos_declarados.get(columna, 'texto')
+            elif bloque[columna].dtype.kind in 'biuf':
+                tipos[columna] = 'numero'
+            elif bloque[columna].dtype.kind == 'M':
+                tipos[columna] = 'fecha'
+            else:
+                tipos[columna] = 'texto'
+        return tipos
+
+    def _normalizar(self, bloque):
+        """
+        Convierte cada columna a su tipo fijo: números a float64 (un bloque de enteros
+        seguido de uno con decimales), fechas a datetime64[ns] y el resto a texto (una
+        columna vacía en el primer bloque no queda con tipo nulo).
+        """
+        import pandas as pd
+
+        columnas = {}
+        for columna, tipo in self._tipos.items():
+            serie = bloque[columna]
+            if tipo == 'numero':
+                columnas[columna] = pd.to_numeric(serie, errors='coerce').astype('float64')
+            elif tipo == 'fecha':
+                columnas[columna] = pd.to_datetime(serie, errors='coerce').astype('datetime64[ns]')
+            else:
+                columnas[columna] = serie.astype('string')
+        return pd.DataFrame(columnas, index=bloque.index)
+
+    def _escribir_excel(self, bloque):
+        if self._libro is None:
+            if XLSXWRITER_DISPONIBLE:
+                import xlsxwriter
+
+                # constant_memory: cada fila se escribe a disco apenas se completa
+                self._libro = xlsxwriter.Workbook(self.archivo, {
+                    'constant_memory': True,
+                    'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+                })
+                self._hoja = self._libro.add_worksheet()
+            else:
+                from openpyxl import Workbook
+
+                self._libro = Workbook(write_only=True)
+                self._hoja = self._libro.create_sheet()
+            self._agregar_fila_excel(0, list(bloque.columns))
+
+        valores = bloque.astype(object).where(bloque.notna(), None)
+        # La fila 0 es el encabezado
+        for i, valores_fila in enumerate(valores.itertuples(index=False, name=None), start=self._filas + 1):
+            self._agregar_fila_excel(i, valores_fila)
+
+    def _agregar_fila_excel(self, fila, valores):
+        if XLSXWRITER_DISPONIBLE:
+            self._hoja.write_row(fila, 0, valores)
+        else:
+            self._hoja.append(valores)
+
+    def cerrar(self):
+        """
+        Termina el archivo y lo retorna posicionado al inicio, listo para subirlo.
+        """
+        if self._libro is not None:
+            if XLSXWRITER_DISPONIBLE:
+                self._libro.close()
+            else:
+                self._libro.save(self.archivo)
+        if self._parquet is not None:
+            self._parquet.close()
+        self.archivo.seek(0)
+        return self.archivo
@@ -0,0 +1,152 @@
+# app/graficos.py
+
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .datos_graficos import PRODUCTOS_POR_GRAFICO
+
+# Procesos para dibujar gráficos en paralelo; 1 = en el mismo proceso. Cada proceso
+# importa matplotlib y pandas (unos 100 MB) y se crea por cada web worker, así que
+# conviene subirlo solo con pocos workers y memoria de sobra
+GRAFICOS_WORKERS = int(os.getenv('GRAFICOS_WORKERS', '1'))
+
+# Figuras reutilizables, una por hilo y tipo de gráfico
+_figuras = threading.local()
+
+
+def dividir_en_grupos(df):
+    """
+    Divide el DataFrame en grupos de PRODUCTOS_POR_GRAFICO filas (uno por gráfico).
+    """
+    return [df.iloc[i:i + PRODUCTOS_POR_GRAFICO] for i in range(0, len(df), PRODUCTOS_POR_GRAFICO)]
+
+
+class _FiguraBarras:
+    """
+    Figura de barras (API orientada a objetos de Agg, sin pyplot) que se reutiliza
+    entre gráficos: se crean PRODUCTOS_POR_GRAFICO barras por serie una sola vez y
+    cada gráfico solo cambia alturas, etiquetas y título. Con varias series las
+    barras se apilan.
+    """
+
+    def __init__(self, series, figsize, ancho, xlabel, ylabel, titulo, leyenda):
+        self.figura = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figura)
+        self.ejes = self.figura.add_subplot()
+        self.titulo = titulo
+        posiciones = range(PRODUCTOS_POR_GRAFICO)
+        self.series = [
+            (columna, self.ejes.bar(posiciones, [0] * PRODUCTOS_POR_GRAFICO, ancho, color=color, label=etiqueta))
+            for columna, etiqueta, color in series
+        ]
+        self.ejes.set_xlabel(xlabel)
+        self.ejes.set_ylabel(ylabel)
+        self.ejes.set_xticks(posiciones)
+        if leyenda:
+            self.ejes.legend()
+
+    def renderizar(self, df_chunk, parte):
+        cantidad = len(df_chunk)
+        base = [0.0] * cantidad
+        for columna, barras in self.series:
+            # Como en pandas, un valor faltante se dibuja con altura 0
+            alturas = df_chunk[columna].astype(float).fillna(0).tolist()
+            for i, barra in enumerate(barras):
+                visible = i < cantidad
+                barra.set_visible(visible)
+                if visible:
+                    barra.set_y(base[i])
+                    barra.set_height(alturas[i])
+            base = [b + h for b, h in zip(base, alturas)]
+
+        self.ejes.set_xticks(range(cantidad))
+        self.ejes.set_xticklabels([str(p) for p in df_chunk['Nombre Producto']], rotation=45)
+        self.ejes.set_xlim(-0.5, cantidad - 0.5)
+        minimo, maximo = min(base + [0.0]), max(base + [0.0])
+        margen = (maximo - minimo) * 0.05 or 1
+        self.ejes.set_ylim(minimo - margen if minimo < 0 else 0, maximo + margen)
+        self.ejes.set_title(self.titulo.format(parte=parte))
+        self.figura.tight_layout()
+
+        img_buffer = io.BytesIO()
+        self.figura.savefig(img_buffer, format='png')
+        return img_buffer.getvalue()
+
+
+def _figura(tipo):
+    figuras = getattr(_figuras, 'figuras', None)
+    if figuras is None:
+        figuras = _figuras.figuras = {}
+    if tipo not in figuras:
+        if tipo == 'stock':
+            figuras[tipo] = _FiguraBarras(
+                [('Stock mínimo', 'Stock mínimo', 'C0'), ('Stock máximo', 'Stock máximo', 'C1')],
+                figsize=(6.4, 4.8), ancho=0.5, xlabel='Nombre Producto', ylabel='Cantidad',
+                titulo='Stock Mínimo y Máximo Promedio por Producto (Parte {parte})', leyenda=True)
+        else:
+            figuras[tipo] = _FiguraBarras(
+                [('Ventas', 'Ventas', 'skyblue')],
+                figsize=(10, 6), ancho=0.8, xlabel='Producto', ylabel='Ventas',
+                titulo='Ventas Totales por Producto (Parte {parte})', leyenda=False)
+    return figuras[tipo]
+
+
+def renderizar_grafico_stock(df_chunk, parte):
+    """
+    Dibuja el gráfico de stock mínimo/máximo promedio de un grupo y retorna el PNG en bytes.
+    """
+    return _figura('stock').renderizar(df_chunk, parte)
+
+
+def renderizar_grafico_ventas(df_chunk, parte):
+    """
+    Dibuja el gráfico de ventas totales de un grupo y retorna el PNG en bytes.
+    """
+    return _figura('ventas').renderizar(df_chunk, parte)
+
+
+def renderizar_graficos(df_stock=None, df_ventas=None, workers=None, solo=None):
+    """
+    Dibuja todos los gráficos de stock y ventas. Retorna un dict con listas
+    ordenadas de (nombre, png_bytes) para 'stock' y 'ventas', con los mismos
+    nombres grafico_stock_i.png / grafico_ventas_i.png de siempre. Con `solo`
+    se dibujan únicamente los nombres incluidos.
+    """
+    workers = GRAFICOS_WORKERS if workers is None else workers
+
+    tareas = []
+    if df_stock is not None:
+        for i, df_chunk in enumerate(dividir_en_grupos(df_stock)):
+            tareas.append(('stock', f"grafico_stock_{i + 1}.png", renderizar_grafico_stock, df_chunk, i + 1))
+    if df_ventas is not None:
+        for i, df_chunk in enumerate(dividir_en_grupos(df_ventas)):
+            tareas.append(('ventas', f"grafico_ventas_{i + 1}.png", renderizar_grafico_ventas, df_chunk, i + 1))
+    if solo is not None:
+        tareas = [tarea for tarea in tareas if tarea[1] in solo]
+
+    if workers > 1 and len(tareas) > 1:
+        try:
+            # Un pool por lote que se cierra al terminar: los procesos no quedan ocupando
+            # memoria en cada web worker entre un lote y otro. 'spawn' para no heredar
+            # hilos ni conexiones del proceso web (los jobs corren en hilos)
+            with ProcessPoolExecutor(max_workers=min(workers, len(tareas)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futuros = [pool.submit(funcion, df_chunk, parte) for _, _, funcion, df_chunk, parte in tareas]
+                imagenes = [futuro.result() for futuro in futuros]
+        except BrokenProcessPool:
+            # Si el pool murió (p. ej. por falta de memoria) se dibuja en este proceso
+            imagenes = [funcion(df_chunk, parte) for _, _, funcion, df_chunk, parte in tareas]
+    else:
+        imagenes = [funcion(df_chunk, parte) for _, _, funcion, df_chunk, parte in tareas]
+
+    graficos = {'stock': [], 'ventas': []}
+    for (tipo, nombre, _, _, _), png in zip(tareas, imagenes):
+        graficos[tipo].append((nombre, png))
+    return graficos
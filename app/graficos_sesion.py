@@ -0,0 +1,106 @@
+# app/graficos_sesion.py
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .artefactos import leer_artefacto, cargar_datos_graficos
+from .cache import cache_artefactos
+from .datos_graficos import nombre_grafico, parsear_nombre_grafico
+from .graficos import dividir_en_grupos, renderizar_graficos, renderizar_grafico_stock, renderizar_grafico_ventas
+from .s3_utils import file_exists_in_s3, upload_file_obj_to_s3, upload_many_file_objs_to_s3
+
+# Consultas simultáneas a S3 al buscar varios gráficos
+GRAFICOS_DESCARGAS_WORKERS = 8
+
+RENDERIZADORES = {'stock': renderizar_grafico_stock, 'ventas': renderizar_grafico_ventas}
+
+
+def _dataframe(datos_graficos, tipo):
+    """
+    DataFrame con las columnas que usan los renderizadores de graficos.py.
+    """
+    series = datos_graficos[tipo]
+    if tipo == 'stock':
+        return pd.DataFrame({
+            'Nombre Producto': series['productos'],
+            'Stock mínimo': pd.Series(series['minimo'], dtype=float),
+            'Stock máximo': pd.Series(series['maximo'], dtype=float),
+        })
+    return pd.DataFrame({
+        'Nombre Producto': series['productos'],
+        'Ventas': pd.Series(series['ventas'], dtype=float),
+    })
+
+
+def _grafico_guardado(bucket_name, session_id, nombre):
+    # Cache del proceso y luego S3; el HEAD evita registrar un error por cada gráfico aún no dibujado
+    png = cache_artefactos.get((bucket_name, session_id, nombre))
+    if png is None and file_exists_in_s3(bucket_name, f"{session_id}/{nombre}"):
+        png = leer_artefacto(bucket_name, session_id, nombre)
+    return png
+
+
+def _guardar_en_cache(bucket_name, session_id, nombre, png):
+    cache_artefactos.set((bucket_name, session_id, nombre), png, len(png))
+
+
+def obtener_grafico(bucket_name, session_id, tipo, parte):
+    """
+    PNG de un gráfico de la sesión. La primera vez se dibuja a partir de los datos
+    guardados en el bundle y se guarda en S3 (y en la cache del proceso); las
+    siguientes se sirve lo guardado. Retorna None si el gráfico no existe.
+    """
+    nombre = nombre_grafico(tipo, parte)
+    png = _grafico_guardado(bucket_name, session_id, nombre)
+    if png is not None:
+        return png
+
+    datos = cargar_datos_graficos(bucket_name, session_id)
+    if not datos or tipo not in datos:
+        return None
+    grupos = dividir_en_grupos(_dataframe(datos, tipo))
+    if not 1 <= parte <= len(grupos):
+        return None
+
+    png = RENDERIZADORES[tipo](grupos[parte - 1], parte)
+    upload_file_obj_to_s3(io.BytesIO(png), bucket_name, f"{session_id}/{nombre}", 'image/png')
+    _guardar_en_cache(bucket_name, session_id, nombre, png)
+    return png
+
+
+def obtener_graficos(bucket_name, session_id, nombres, workers=GRAFICOS_DESCARGAS_WORKERS):
+    """
+    PNG de varios gráficos (lo que usa el PDF). Los ya guardados se descargan en
+    paralelo y los que faltan se dibujan juntos en el pool de graficos.py y se
+    guardan en S3. Retorna una lista de (nombre, bytes o None, error o None) en el
+    mismo orden que `nombres`.
+    """
+    def _buscar(nombre):
+        try:
+            return nombre, _grafico_guardado(bucket_name, session_id, nombre), None
+        except Exception as e:
+            return nombre, None, e
+
+    if not nombres:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(nombres)))) as executor:
+        resultados = list(executor.map(_buscar, nombres))
+
+    faltantes = {nombre for nombre, png, error in resultados if png is None and error is None}
+    if faltantes:
+        datos = cargar_datos_graficos(bucket_name, session_id) or {}
+        tipos = {parsear_nombre_grafico(nombre)[0] for nombre in faltantes}
+        dibujados = renderizar_graficos(
+            _dataframe(datos, 'stock') if 'stock' in tipos and 'stock' in datos else None,
+            _dataframe(datos, 'ventas') if 'ventas' in tipos and 'ventas' in datos else None,
+            solo=faltantes,
+        )
+        nuevos = dict(dibujados['stock'] + dibujados['ventas'])
+        upload_many_file_objs_to_s3([(io.BytesIO(png), f"{session_id}/{nombre}", 'image/png')
+                                     for nombre, png in nuevos.items()], bucket_name)
+        for nombre, png in nuevos.items():
+            _guardar_en_cache(bucket_name, session_id, nombre, png)
+        resultados = [(nombre, nuevos.get(nombre, png), error) for nombre, png, error in resultados]
+    return resultados
@@ -0,0 +1,118 @@
+# app/ingesta.py
+
+import os
+import hashlib
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from .agregacion import preparar_datos, agregar_parcial, combinar_parciales, finalizar_agregados, COLUMNAS_DERIVADAS
+
+# Columnas numéricas que se convierten en cada bloque (un bloque vacío no debe romper los cálculos)
+COLUMNAS_NUMERICAS = ['Ventas', 'Gastos(compras)', 'Ventas Totales', 'Tiempo', 'Reposición (días)', 'Stock Final']
+
+# Tipos del inventario enriquecido para el Exportador: los dtypes de cada bloque dependen
+# de sus valores (enteros en uno, decimales en otro, una columna vacía) y el Parquet
+# necesita el mismo esquema en todos
+TIPOS_EXPORTACION = {columna: 'numero' for columna in COLUMNAS_NUMERICAS + COLUMNAS_DERIVADAS}
+TIPOS_EXPORTACION['Fecha'] = 'fecha'
+
+FILAS_POR_BLOQUE = int(os.getenv('INGESTA_FILAS_POR_BLOQUE', '5000'))
+
+
+def iterar_bloques_excel(archivo, filas_por_bloque=FILAS_POR_BLOQUE, desde=None):
+    """
+    Lee la primera hoja del Excel en modo solo lectura y entrega DataFrames de a
+    `filas_por_bloque` filas, ya preparados con `preparar_datos`. Con `desde` solo
+    se entregan las filas con Fecha posterior a esa fecha.
+    """
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = wb.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(encabezado)]
+
+        bloque = []
+        for fila in filas:
+            if all(valor is None for valor in fila):
+                continue
+            bloque.append(fila[:len(columnas)])
+            if len(bloque) >= filas_por_bloque:
+                df = _bloque_a_dataframe(bloque, columnas, desde)
+                if not df.empty:
+                    yield df
+                bloque = []
+        if bloque:
+            df = _bloque_a_dataframe(bloque, columnas, desde)
+            if not df.empty:
+                yield df
+    finally:
+        wb.close()
+
+
+def _bloque_a_dataframe(filas, columnas, desde=None):
+    df = pd.DataFrame.from_records(filas, columns=columnas)
+    if desde is not None:
+        # Se filtra antes de calcular nada: las filas ya procesadas no cuestan más que leerlas
+        nombre = next((c for c in df.columns if c.strip() == 'Fecha'), None)
+        if nombre is None:
+            raise ValueError("El modo incremental necesita la columna 'Fecha'.")
+        fechas = pd.to_datetime(df[nombre], errors='coerce')
+        if fechas.isna().any():
+            # El procesamiento completo cuenta esas filas, pero aquí no se puede saber si
+            # son nuevas o si ya están en la sesión anterior
+            raise ValueError("El archivo tiene filas sin una Fecha válida; el modo incremental no "
+                             "puede saber si son nuevas. Procesa el archivo completo.")
+        df = df[fechas > desde].reset_index(drop=True)
+    for columna in COLUMNAS_NUMERICAS:
+        nombre = next((c for c in df.columns if c.strip() == columna), None)
+        if nombre is not None:
+            df[nombre] = pd.to_numeric(df[nombre], errors='coerce')
+    return preparar_datos(df)
+
+
+def agregar_excel_streaming(archivo, filas_por_bloque=FILAS_POR_BLOQUE, exportador=None, parcial_base=None):
+    """
+    Procesa el Excel por bloques. La memoria depende de la cantidad de productos y
+    meses, no de la cantidad de filas. Si se indica `exportador` (ver exportacion.py)
+    cada bloque se escribe ahí a medida que se lee.
+
+    Con `parcial_base` (el parcial de una sesión anterior) solo se leen las filas
+    posteriores a su fecha máxima y se combinan con él; el archivo exportado
+    contiene solo esas filas nuevas.
+    """
+    desde = parcial_base['fecha_max'] if parcial_base is not None else None
+    parcial = None
+
+    for bloque in iterar_bloques_excel(archivo, filas_por_bloque, desde=desde):
+        if exportador is not None:
+            exportador.agregar(bloque)
+        parcial = combinar_parciales(parcial, agregar_parcial(bloque))
+
+    if parcial is None:
+        if desde is not None:
+            raise ValueError(f"El archivo no tiene filas posteriores al {desde:%d/%m/%Y}.")
+        raise ValueError("El archivo Excel no tiene filas para procesar.")
+    if parcial_base is not None:
+        parcial = combinar_parciales(parcial_base, parcial)
+    return finalizar_agregados(parcial)
+
+
+def hash_archivo(archivo):
+    """
+    SHA-256 del contenido del Excel (ruta o archivo abierto), leído por bloques.
+    Un archivo abierto queda en la misma posición en la que estaba.
+    """
+    h = hashlib.sha256()
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloque)
+    else:
+        posicion = archivo.tell()
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+            h.update(bloque)
+        archivo.seek(posicion)
+    return h.hexdigest()
@@ -0,0 +1,347 @@
+# app/jobs.py
+
+import os
+import json
+import uuid
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+import sqlalchemy as sa
+from flask import current_app
+
+from . import db
+from .models import Job
+from .s3_utils import (generate_presigned_post, download_to_temp_file_from_s3, delete_file_from_s3,
+                       put_bucket_lifecycle_rule, put_bucket_cors_rule)
+
+# Cantidad de hilos por proceso que ejecutan jobs; 0 = procesar dentro de la request
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '1'))
+# Carpeta donde se guardan los archivos subidos hasta que el job los procesa
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'inventariate_jobs'))
+# Renderizar y guardar el PDF en S3 apenas termina el procesamiento (1 = sí)
+PDF_PRERENDER = os.getenv('PDF_PRERENDER', '0') == '1'
+# Subida directa desde el navegador: nombre del Excel en el prefijo de la sesión,
+# tamaño máximo y validez (segundos) del POST pre-firmado
+NOMBRE_ENTRADA = 'entrada.xlsx'
+SUBIDA_MAX_BYTES = int(os.getenv('SUBIDA_MAX_BYTES', str(100 * 1024 * 1024)))
+SUBIDA_EXPIRA = int(os.getenv('SUBIDA_EXPIRA', '900'))
+# Las subidas directas llevan esta etiqueta: una regla de lifecycle del bucket borra
+# las que nadie procesó (el job borra las demás) después de SUBIDA_RETENCION_DIAS
+ETIQUETA_SUBIDA = {'inventariate': 'subida'}
+SUBIDA_RETENCION_DIAS = int(os.getenv('SUBIDA_RETENCION_DIAS', '1'))
+REGLA_LIFECYCLE_SUBIDAS = {
+    'ID': 'inventariate-subidas-sin-procesar',
+    'Filter': {'Tag': {'Key': 'inventariate', 'Value': 'subida'}},
+    'Status': 'Enabled',
+    'Expiration': {'Days': SUBIDA_RETENCION_DIAS},
+}
+# Segundos que un job puede seguir en proceso antes de considerarlo huérfano (su worker
+# se reinició o murió) y cuántas veces se reclama antes de marcarlo con error
+JOBS_TIMEOUT = int(os.getenv('JOBS_TIMEOUT', '3600'))
+JOBS_MAX_INTENTOS = int(os.getenv('JOBS_MAX_INTENTOS', '2'))
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_EN_PROCESO = 'en_proceso'
+ESTADO_COMPLETADO = 'completado'
+ESTADO_ERROR = 'error'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Pool de hilos local del proceso. Se crea de forma perezosa para que cada worker
+    de gunicorn tenga el suyo (nunca se hereda a través de un fork).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix='inventariate-job')
+        return _executor
+
+
+def _reiniciar_tras_fork():
+    # Un pool heredado no tiene hilos en el hijo: los jobs enviados nunca correrían
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def ruta_subida_local(session_id):
+    """
+    Dónde queda el Excel de una subida directa cuando no hay S3 (reemplazo local).
+    """
+    return os.path.join(JOBS_DIR, f"{session_id}-{NOMBRE_ENTRADA}")
+
+
+def preparar_subida(bucket_name):
+    """
+    Reserva un session_id para que el navegador suba el Excel directo al prefijo de
+    la sesión. Retorna (key, post), donde post es el POST pre-firmado ({'url',
+    'fields'}) o None si no hay S3 y hay que usar la subida local.
+    """
+    key = f"{uuid.uuid4()}/{NOMBRE_ENTRADA}"
+    post = None
+    if bucket_name:
+        post = generate_presigned_post(bucket_name, key, SUBIDA_MAX_BYTES, expiration=SUBIDA_EXPIRA,
+                                       tags=ETIQUETA_SUBIDA)
+    return key, post
+
+
+def encolar_procesamiento(archivo, user_id, bucket_name, parametros, archivo_key=None):
+    """
+    Guarda el archivo subido, registra el job en la DB y lo envía al pool local.
+    Con `archivo_key` el Excel ya está en S3 (subida directa, ver preparar_subida) o
+    en su reemplazo local, y el job usa el session_id de esa key.
+    Retorna el Job recién creado.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job_id = str(uuid.uuid4())
+    if archivo_key is not None:
+        session_id = archivo_key.split('/', 1)[0]
+        ruta_archivo = ruta_subida_local(session_id)
+        if not os.path.exists(ruta_archivo):
+            # El job lo descarga de S3 por partes al ejecutarse
+            ruta_archivo = None
+            parametros = dict(parametros, archivo_key=archivo_key)
+    else:
+        session_id = str(uuid.uuid4())
+        ruta_archivo = os.path.join(JOBS_DIR, f"{job_id}.xlsx")
+        archivo.save(ruta_archivo)
+
+    job = Job(
+        id=job_id,
+        estado=ESTADO_PENDIENTE,
+        session_id=session_id,
+        bucket_name=bucket_name,
+        ruta_archivo=ruta_archivo,
+        parametros=json.dumps(parametros),
+        user_id=user_id
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    if JOBS_WORKERS > 0:
+        _get_executor().submit(ejecutar_job, app, job_id)
+    else:
+        ejecutar_job(app, job_id)
+    return job
+
+
+def _reclamar_job(job_id):
+    """
+    Marca el job como en proceso solo si seguía pendiente. El UPDATE condicional
+    evita que dos consumidores (hilos o procesos) ejecuten el mismo job.
+    """
+    result = db.session.execute(
+        sa.update(Job)
+        .where(Job.id == job_id, Job.estado == ESTADO_PENDIENTE)
+        .values(estado=ESTADO_EN_PROCESO, started_at=datetime.utcnow(), intentos=Job.intentos + 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def ejecutar_job(app, job_id):
+    """
+    Ejecuta un job pendiente dentro de un contexto de aplicación propio.
+    """
+    with app.app_context():
+        try:
+            if not _reclamar_job(job_id):
+                return
+
+            job = db.session.get(Job, job_id)
+            parametros = json.loads(job.parametros or '{}')
+            archivo_key = parametros.get('archivo_key')
+            archivo = job.ruta_archivo
+            try:
+                if archivo_key:
+                    # Subida directa: el objeto se copia por partes a un temporal y se procesa
+                    archivo = download_to_temp_file_from_s3(job.bucket_name, archivo_key)
+                    if archivo is None:
+                        raise ValueError("No se encontró el archivo subido.")
+
+                # pandas y compañía se importan con el primer job, no al arrancar el worker
+                from .pipeline import procesar_inventario
+
+                # Si el archivo ya se había procesado, el job apunta a esa sesión
+                job.session_id = procesar_inventario(
+                    archivo,
+                    job.session_id,
+                    job.bucket_name,
+                    presupuesto_mensual=parametros.get('presupuesto_mensual', 0.0),
+                    generar_graficos=parametros.get('generar_graficos', False),
+                    modo_streaming=parametros.get('modo_streaming', False),
+                    user_id=job.user_id,
+                    sesion_base=parametros.get('sesion_base'),
+                    modo_graficos=parametros.get('modo_graficos'),
+                    formato_exportacion=parametros.get('formato_exportacion')
+                )
+                job.estado = ESTADO_COMPLETADO
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(Job, job_id)
+                job.estado = ESTADO_ERROR
+                job.error = str(e)
+                app.logger.error(f"Job {job_id} falló: {e}")
+
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            if job.ruta_archivo and os.path.exists(job.ruta_archivo):
+                os.remove(job.ruta_archivo)
+            if archivo_key:
+                # El Excel subido ya no hace falta: los resultados quedan en el bundle
+                if archivo is not None:
+                    archivo.close()
+                delete_file_from_s3(job.bucket_name, archivo_key)
+
+            if PDF_PRERENDER and job.estado == ESTADO_COMPLETADO:
+                try:
+                    from .pdf import preparar_reporte
+                    preparar_reporte(job.user_id, job.session_id)
+                except Exception as e:
+                    # El reporte se generará al pedirlo
+                    app.logger.error(f"No se pudo pre-renderizar el PDF del job {job_id}: {e}")
+        finally:
+            db.session.remove()
+
+
+def recuperar_huerfanos(app, timeout=None):
+    """
+    Jobs en proceso desde hace más de `timeout` segundos (JOBS_TIMEOUT): el worker que
+    los ejecutaba se reinició o murió. Vuelven a la cola, o quedan con error si ya se
+    reclamaron JOBS_MAX_INTENTOS veces. Los UPDATE condicionales permiten que varios
+    workers lo hagan a la vez. Retorna (reencolados, fallidos).
+    """
+    limite = datetime.utcnow() - timedelta(seconds=JOBS_TIMEOUT if timeout is None else timeout)
+    # Los jobs anteriores a started_at solo tienen created_at
+    huerfano = sa.and_(Job.estado == ESTADO_EN_PROCESO,
+                       sa.func.coalesce(Job.started_at, Job.created_at) < limite)
+    with app.app_context():
+        try:
+            fallidos = db.session.execute(
+                sa.update(Job).where(huerfano, Job.intentos >= JOBS_MAX_INTENTOS)
+                .values(estado=ESTADO_ERROR, finished_at=datetime.utcnow(),
+                        error="El procesamiento se interrumpió; vuelve a subir el archivo.")
+            ).rowcount
+            reencolados = db.session.execute(
+                sa.update(Job).where(huerfano).values(estado=ESTADO_PENDIENTE)
+            ).rowcount
+            db.session.commit()
+        finally:
+            db.session.remove()
+    if reencolados or fallidos:
+        app.logger.warning(f"Jobs huérfanos: {reencolados} reencolados, {fallidos} con error")
+    return reencolados, fallidos
+
+
+def limpiar_subidas_locales(app):
+    """
+    Borra de JOBS_DIR las subidas directas locales (sin S3) con más de
+    SUBIDA_RETENCION_DIAS que ningún job pendiente o en proceso usa: el navegador
+    subió el archivo pero el formulario nunca se envió. Retorna cuántas borró.
+    """
+    if not os.path.isdir(JOBS_DIR):
+        return 0
+    limite = datetime.now().timestamp() - SUBIDA_RETENCION_DIAS * 86400
+    with app.app_context():
+        try:
+            en_uso = {row[0] for row in db.session.execute(
+                sa.select(Job.ruta_archivo).where(Job.estado.in_([ESTADO_PENDIENTE, ESTADO_EN_PROCESO]))
+            )}
+        finally:
+            db.session.remove()
+
+    borradas = 0
+    for nombre in os.listdir(JOBS_DIR):
+        ruta = os.path.join(JOBS_DIR, nombre)
+        if nombre.endswith(f"-{NOMBRE_ENTRADA}") and ruta not in en_uso and os.path.getmtime(ruta) < limite:
+            os.remove(ruta)
+            borradas += 1
+    return borradas
+
+
+def _ids_pendientes(app):
+    with app.app_context():
+        try:
+            return [row[0] for row in db.session.execute(
+                sa.select(Job.id).where(Job.estado == ESTADO_PENDIENTE).order_by(Job.created_at)
+            )]
+        finally:
+            db.session.remove()
+
+
+def procesar_pendientes(app):
+    """
+    Ejecuta en este proceso todos los jobs pendientes (p. ej. los que quedaron en cola
+    cuando se reinició un worker). Retorna la cantidad de jobs revisados.
+    """
+    pendientes = _ids_pendientes(app)
+    for job_id in pendientes:
+        ejecutar_job(app, job_id)
+    return len(pendientes)
+
+
+def _reanudar_cola(app):
+    try:
+        recuperar_huerfanos(app)
+        limpiar_subidas_locales(app)
+        for job_id in _ids_pendientes(app):
+            _get_executor().submit(ejecutar_job, app, job_id)
+    except Exception as e:
+        # Por ejemplo, la DB todavía no tiene la tabla jobs; la cola sigue con los nuevos
+        app.logger.error(f"No se pudo reanudar la cola de jobs: {e}")
+
+
+def reanudar_cola(app):
+    """
+    Al arrancar un proceso que atiende requests: recupera los jobs huérfanos y envía
+    los pendientes al pool local, en segundo plano para no demorar el arranque. Se
+    llama en cada worker (gunicorn.conf.py), nunca en el maestro: los hilos del pool
+    no sobreviven al fork. Sin pool (JOBS_WORKERS=0) quedan para `flask jobs-worker`.
+    """
+    if JOBS_WORKERS > 0:
+        _get_executor().submit(_reanudar_cola, app)
+
+
+def registrar_comandos(app):
+    @app.cli.command("jobs-worker")
+    def jobs_worker():
+        """Recupera los jobs huérfanos y procesa los pendientes de la cola."""
+        reencolados, fallidos = recuperar_huerfanos(app)
+        if reencolados or fallidos:
+            click.echo(f"Jobs huérfanos: {reencolados} reencolados, {fallidos} con error")
+        total = procesar_pendientes(app)
+        click.echo(f"Jobs revisados: {total}")
+        click.echo(f"Subidas locales sin procesar borradas: {limpiar_subidas_locales(app)}")
+
+    @app.cli.command("s3-configurar")
+    @click.option('--origen', 'origenes', multiple=True,
+                  help="Origen de la app (p. ej. https://inventariate.onrender.com); se puede repetir.")
+    def s3_configurar(origenes):
+        """Configura el bucket para la subida directa: regla CORS y expiración de subidas sin procesar."""
+        bucket_name = os.getenv('S3_BUCKET_NAME')
+        if not bucket_name:
+            raise click.ClickException("S3_BUCKET_NAME no está configurado.")
+        if origenes:
+            put_bucket_cors_rule(bucket_name, {
+                'ID': 'inventariate-subida-directa',
+                'AllowedOrigins': list(origenes),
+                'AllowedMethods': ['POST'],
+                'AllowedHeaders': ['*'],
+                'MaxAgeSeconds': 3000,
+            })
+        else:
+            click.echo("Sin --origen no se cambia la regla CORS.")
+        put_bucket_lifecycle_rule(bucket_name, REGLA_LIFECYCLE_SUBIDAS)
@@ -1,11 +1,45 @@
 from . import db, login_manager, bcrypt
+from .cache import cache_usuarios
 from flask_login import UserMixin
 from datetime import datetime
 
+
+class IdentidadUsuario(UserMixin):
+    """
+    Lo que las vistas usan de current_user (id y username), sin el hash de la
+    contraseña ni relaciones: se guarda en cache_usuarios y no necesita la DB.
+    """
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def __repr__(self):
+        return f"User('{self.username}')"
+
+
 @login_manager.user_loader
 def load_user(user_id: str):
-    # para Flask-SQLAlchemy 3.x, mejor db.session.get
-    return db.session.get(User, int(user_id))
+    # Se ejecuta en cada request autenticada: la DB solo se consulta si el usuario no
+    # está en la cache del proceso (o expiró)
+    user_id = int(user_id)
+    identidad = cache_usuarios.get(user_id)
+    if identidad is None:
+        # para Flask-SQLAlchemy 3.x, mejor db.session.get
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identidad = IdentidadUsuario(user.id, user.username)
+        cache_usuarios.set(user_id, identidad, 1)
+    return identidad
+
+
+def invalidar_usuario(user_id):
+    """
+    Quita al usuario de la cache del proceso (cambio de contraseña, logout).
+    """
+    cache_usuarios.invalidar(int(user_id))
+
 
 class User(db.Model, UserMixin):
     __tablename__ = "users"  # <- antes implícito "user" pero tiene problemas con palabras reservadas
@@ -27,6 +61,8 @@ class User(db.Model, UserMixin):
 
     def set_password(self, password: str):
         self.password = bcrypt.generate_password_hash(password).decode("utf-8")
+        if self.id is not None:
+            invalidar_usuario(self.id)
 
     def check_password(self, password: str) -> bool:
         return bcrypt.check_password_hash(self.password, password)
@@ -41,3 +77,81 @@ class History(db.Model):
 
     # FK debe apuntar al nuevo nombre de tabla
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        # Un saldo por usuario y mes (registrar_historial hace upsert sobre esta restricción)
+        db.UniqueConstraint("user_id", "year", "month", name="uq_history_user_id_year_month"),
+        db.Index("ix_history_user_id_date_recorded", user_id, date_recorded.desc()),
+    )
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    # Cola de procesamiento respaldada por la DB (sin broker externo)
+    id = db.Column(db.String(36), primary_key=True)
+    estado = db.Column(db.String(20), nullable=False, default="pendiente", index=True)
+    session_id = db.Column(db.String(36), nullable=False)
+    bucket_name = db.Column(db.String(255))
+    ruta_archivo = db.Column(db.String(512))
+    parametros = db.Column(db.Text, nullable=False, default="{}")
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Última vez que un consumidor lo reclamó y cuántas veces se reclamó
+    started_at = db.Column(db.DateTime)
+    intentos = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    finished_at = db.Column(db.DateTime)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+
+class ProcessingSession(db.Model):
+    __tablename__ = "processing_sessions"
+    # Un procesamiento de Excel; el id es el mismo prefijo de los artefactos en S3
+    id = db.Column(db.String(36), primary_key=True)
+    bucket_name = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    budget = db.Column(db.Float, nullable=False, default=0)
+    total_sales = db.Column(db.Float, nullable=False, default=0)
+    total_monthly_sales = db.Column(db.Float, nullable=False, default=0)
+    total_expenses = db.Column(db.Float, nullable=False, default=0)
+    final_balance = db.Column(db.Float, nullable=False, default=0)
+    # Los nombres de producto vienen tal cual de la hoja del usuario: sin límite de largo
+    best_seller = db.Column(db.Text)
+    worst_seller = db.Column(db.Text)
+    budget_alert = db.Column(db.String(255))
+    charts_enabled = db.Column(db.Boolean, nullable=False, default=False)
+    chart_names = db.Column(db.Text, nullable=False, default='{"stock": [], "ventas": []}')
+    # SHA-256 del Excel subido; permite reutilizar la sesión si se vuelve a subir el mismo archivo
+    content_hash = db.Column(db.String(64))
+    # Formato del inventario exportado (xlsx, csv o parquet) y modo de los gráficos
+    export_format = db.Column(db.String(10))
+    chart_mode = db.Column(db.String(10))
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_processing_sessions_user_id_created_at", "user_id", "created_at"),
+        db.Index("ix_processing_sessions_user_id_content_hash", "user_id", "content_hash"),
+    )
+
+
+class ProductMonthSummary(db.Model):
+    __tablename__ = "product_month_summaries"
+    id = db.Column(db.Integer, primary_key=True)
+    product = db.Column(db.Text, nullable=False)
+    month = db.Column(db.String(20), nullable=False)
+    sales = db.Column(db.Float)
+    final_stock = db.Column(db.Float)
+    avg_min_stock = db.Column(db.Float)
+    avg_max_stock = db.Column(db.Float)
+
+    session_id = db.Column(db.String(36), db.ForeignKey("processing_sessions.id", ondelete="CASCADE"),
+                           nullable=False, index=True)
+
+
+class MonthlyExpense(db.Model):
+    __tablename__ = "monthly_expenses"
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(20), nullable=False)
+    expenses = db.Column(db.Float, nullable=False, default=0)
+
+    session_id = db.Column(db.String(36), db.ForeignKey("processing_sessions.id", ondelete="CASCADE"),
+                           nullable=False, index=True)
@@ -2,13 +2,116 @@
 
 from fpdf import FPDF
 import pandas as pd
-import json
 import os
-import io
+import json
+import zlib
+import hashlib
 from flask import session
-from .s3_utils import download_file_obj_from_s3
+from flask_login import current_user
+from PIL import Image
+from .artefactos import cargar_sesion
+from .graficos_sesion import obtener_graficos
+from .sesiones import cargar_sesion_db, cargar_resumen_db
+from .s3_utils import file_exists_in_s3, upload_file_obj_to_s3, generate_presigned_url
 from io import BytesIO
 
+# Descargas simultáneas de gráficos al armar el PDF
+PDF_DESCARGAS_WORKERS = int(os.getenv('PDF_DESCARGAS_WORKERS', '8'))
+# Subir cuando cambie el diseño del reporte: los PDF ya guardados en S3 dejan de usarse
+VERSION_REPORTE = 2
+# Validez (segundos) del enlace de descarga del reporte
+REPORTE_URL_EXPIRA = int(os.getenv('REPORTE_URL_EXPIRA', '300'))
+NOMBRE_DESCARGA_REPORTE = 'Reporte_Inventario.pdf'
+# Filas máximas por tabla; las demás se resumen en una fila "Otros". 0 = sin límite
+PDF_MAX_FILAS = int(os.getenv('PDF_MAX_FILAS', '1000'))
+
+
+class _Acumulador:
+    """
+    Texto que crece con += sin copiar todo en cada paso. fpdf 1.7.2 arma el documento
+    concatenando strings, lo que es cuadrático con miles de páginas.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._largo = 0
+
+    def __iadd__(self, texto):
+        self._partes.append(texto)
+        self._largo += len(texto)
+        return self
+
+    def __len__(self):
+        return self._largo
+
+    def __str__(self):
+        return ''.join(self._partes)
+
+
+class ReportePDF(FPDF):
+    """
+    FPDF que además acepta imágenes PNG en memoria, sin pasar por archivos temporales.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffer = _Acumulador()
+        self._imagenes_memoria = {}
+        # Gráficos que no se pudieron insertar (un reporte incompleto no se guarda en S3)
+        self.graficos_fallidos = 0
+
+    def imagen_desde_bytes(self, nombre, datos, x=None, y=None, w=0, h=0):
+        """
+        Inserta un PNG a partir de sus bytes. `nombre` identifica la imagen dentro del PDF.
+        """
+        self._imagenes_memoria[nombre] = datos
+        self.image(nombre, x=x, y=y, w=w, h=h, type='png')
+
+    def output(self, name='', dest=''):
+        if self.state < 3:
+            self.close()
+        self.buffer = str(self.buffer)
+        return super().output(name, dest)
+
+    def _parsepng(self, name):
+        datos = self._imagenes_memoria.pop(name, None)
+        if datos is None:
+            return super()._parsepng(name)
+        # Pillow decodifica el PNG en C; el parser de fpdf separa el canal alfa píxel a píxel.
+        # Los gráficos de matplotlib tienen fondo opaco, así que el alfa se descarta.
+        imagen = Image.open(BytesIO(datos)).convert('RGB')
+        return {
+            'w': imagen.width,
+            'h': imagen.height,
+            'cs': 'DeviceRGB',
+            'bpc': 8,
+            'f': 'FlateDecode',
+            'data': zlib.compress(imagen.tobytes()),
+            'trns': '',
+        }
+
+
+def agregar_graficos(pdf, graficos):
+    """
+    Inserta los gráficos ya descargados, uno por página. Un gráfico con error o que
+    no se encontró cuenta en pdf.graficos_fallidos.
+    """
+    for i, (nombre, grafico_content, error) in enumerate(graficos):
+        try:
+            if error is not None:
+                raise error
+            if not grafico_content:
+                raise ValueError("no se encontró el gráfico")
+            pdf.imagen_desde_bytes(nombre, grafico_content, x=10, y=None, w=180)
+            pdf.ln(85)  # Espacio después del gráfico
+
+            # Agregar página si hay más gráficos y este no es el último
+            if i < len(graficos) - 1:
+                pdf.add_page()
+        except Exception as e:
+            pdf.graficos_fallidos += 1
+            pdf.cell(200, 10, txt=f"Error al cargar gráfico {nombre}: {str(e)}", ln=True)
+
 
 def format_currency(value):
     """
@@ -20,212 +123,272 @@ def format_currency(value):
     return f"${value:,}".replace(",", ".")
 
 
-def generar_pdf():
-    try:
-        # Obtener información de la sesión desde S3
-        session_id = session.get('processing_session')
-        bucket_name = session.get('bucket_name')
+def formatear_moneda(serie):
+    """
+    Versión vectorizada de format_currency para una columna completa.
+    """
+    enteros = serie.astype(float).fillna(0).round().astype('int64')
+    return ('$' + enteros.map('{:,}'.format).str.replace(',', '.', regex=False)).tolist()
 
-        if not session_id or not bucket_name:
-            raise Exception("No se encontró sesión de procesamiento. Por favor, procesa un archivo primero.")
 
-        # Descargar resumen_ventas.json desde S3
-        resumen_content = download_file_obj_from_s3(bucket_name, f"{session_id}/resumen_ventas.json")
-        if resumen_content:
-            resumen_ventas = json.loads(resumen_content.getvalue().decode('utf-8'))
-            generar_graficos_opcion = resumen_ventas.get('generar_graficos', False)
-        else:
-            resumen_ventas = {
-                'total_ventas': 0,
-                'producto_mas_vendido': 'N/A',
-                'producto_menos_vendido': 'N/A',
-                'alerta_presupuesto': ''
-            }
-            generar_graficos_opcion = False
-
-        # Descargar resumen_productos.json desde S3
-        productos_content = download_file_obj_from_s3(bucket_name, f"{session_id}/resumen_productos.json")
-        if productos_content:
-            df_productos = pd.read_json(BytesIO(productos_content.getvalue()))
-        else:
-            df_productos = pd.DataFrame(
-                columns=['Nombre Producto', 'Mes', 'Stock Final', 'Stock mínimo', 'Stock máximo'])
-
-        # Descargar gastos_por_mes.json desde S3
-        gastos_content = download_file_obj_from_s3(bucket_name, f"{session_id}/gastos_por_mes.json")
-        if gastos_content:
-            df_gastos = pd.read_json(BytesIO(gastos_content.getvalue()))
-            df_gastos = df_gastos.rename(columns={'Gastos(compras)': 'Gastos'})
-        else:
-            df_gastos = pd.DataFrame(columns=['Mes', 'Gastos'])
+def limitar_filas(df, columna, max_filas=None):
+    """
+    Si la tabla tiene más de `max_filas` filas, retorna las `max_filas` con mayor
+    `columna` y el resto por separado, para resumirlo en una sola fila.
+    Retorna (visibles, resto), con resto None si no hubo que recortar.
+    """
+    max_filas = PDF_MAX_FILAS if max_filas is None else max_filas
+    if not max_filas or len(df) <= max_filas:
+        return df, None
+    ordenado = df.sort_values(columna, ascending=False, kind='stable', na_position='last')
+    return ordenado.iloc[:max_filas], ordenado.iloc[max_filas:]
 
-        # Descargar ventas_por_producto.json desde S3
-        ventas_content = download_file_obj_from_s3(bucket_name, f"{session_id}/ventas_por_producto.json")
-        if ventas_content:
-            df_ventas_mes = pd.read_json(BytesIO(ventas_content.getvalue()))
-        else:
-            df_ventas_mes = pd.DataFrame(columns=['Nombre Producto', 'Mes', 'Ventas'])
 
-        # Descargar nombres_graficos.json desde S3
-        nombres_content = download_file_obj_from_s3(bucket_name, f"{session_id}/nombres_graficos.json")
-        if nombres_content:
-            nombres_graficos = json.loads(nombres_content.getvalue().decode('utf-8'))
-        else:
-            nombres_graficos = {"stock": [], "ventas": []}
+def _nota_limite(visibles, resto):
+    if resto is None:
+        return ""
+    return f" (top {len(visibles)} de {len(visibles) + len(resto)})"
 
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.set_font("Arial", size=12)
 
-        pdf.set_font("Arial", 'B', 20)
-        pdf.cell(200, 10, txt="Reporte de Inventario y Finanzas", ln=True, align='C')
-        pdf.ln(10)
+def dibujar_tabla(pdf, columnas, filas, alto=10, tamano_fuente=10):
+    """
+    Dibuja una tabla con el encabezado repetido en cada página. `columnas` es una
+    lista de (título, ancho) y `filas` una lista de tuplas de textos ya formateados.
+    """
+    ultima = len(columnas) - 1
+
+    def encabezado():
+        pdf.set_fill_color(200, 220, 255)
+        pdf.set_font("Arial", 'B', tamano_fuente)
+        for i, (titulo, ancho) in enumerate(columnas):
+            pdf.cell(ancho, alto, titulo, 1, 1 if i == ultima else 0, 'C', 1)
+        pdf.set_font("Arial", '', tamano_fuente)
+
+    encabezado()
+    anchos = [ancho for _, ancho in columnas]
+    celdas = list(enumerate(anchos))
+    for fila in filas:
+        # El salto de página se hace aquí (y no en cell) para volver a dibujar el encabezado
+        if pdf.get_y() + alto > pdf.page_break_trigger:
+            pdf.add_page()
+            encabezado()
+        for i, ancho in celdas:
+            pdf.cell(ancho, alto, fila[i], 1, 1 if i == ultima else 0, 'C')
+
 
+def construir_pdf(sesion, session_id, bucket_name):
+    """
+    Arma el reporte de una sesión ya cargada (cargar_sesion_db o cargar_sesion) y
+    retorna el ReportePDF. No depende de la request.
+    """
+    resumen_ventas = sesion['resumen_ventas']
+    if resumen_ventas:
+        generar_graficos_opcion = resumen_ventas.get('generar_graficos', False)
+    else:
+        resumen_ventas = {
+            'total_ventas': 0,
+            'producto_mas_vendido': 'N/A',
+            'producto_menos_vendido': 'N/A',
+            'alerta_presupuesto': ''
+        }
+        generar_graficos_opcion = False
+
+    df_productos = sesion['resumen_productos']
+    if df_productos is None:
+        df_productos = pd.DataFrame(
+            columns=['Nombre Producto', 'Mes', 'Stock Final', 'Stock mínimo', 'Stock máximo'])
+
+    df_gastos = sesion['gastos_por_mes']
+    if df_gastos is not None:
+        df_gastos = df_gastos.rename(columns={'Gastos(compras)': 'Gastos'})
+    else:
+        df_gastos = pd.DataFrame(columns=['Mes', 'Gastos'])
+
+    df_ventas_mes = sesion['ventas_por_producto']
+    if df_ventas_mes is None:
+        df_ventas_mes = pd.DataFrame(columns=['Nombre Producto', 'Mes', 'Ventas'])
+
+    nombres_graficos = sesion['nombres_graficos']
+
+    pdf = ReportePDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font("Arial", size=12)
+
+    pdf.set_font("Arial", 'B', 20)
+    pdf.cell(200, 10, txt="Reporte de Inventario y Finanzas", ln=True, align='C')
+    pdf.ln(10)
+
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(200, 10, txt="1. Resumen General", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Total de ventas: {format_currency(resumen_ventas.get('total_ventas', 0))}", ln=True)
+    pdf.cell(200, 10, txt=f"Producto más vendido: {resumen_ventas.get('producto_mas_vendido', 'N/A')}", ln=True)
+    pdf.cell(200, 10, txt=f"Producto menos vendido: {resumen_ventas.get('producto_menos_vendido', 'N/A')}", ln=True)
+
+    # Información adicional del resumen
+    if 'presupuesto_mensual' in resumen_ventas:
+        pdf.cell(200, 10,
+                 txt=f"Presupuesto mensual: {format_currency(resumen_ventas.get('presupuesto_mensual', 0))}",
+                 ln=True)
+
+    if 'saldo_final' in resumen_ventas:
+        saldo_final = resumen_ventas.get('saldo_final', 0)
+        color = 0, 0, 0  # Negro por defecto
+        if saldo_final < 0:
+            color = 255, 0, 0  # Rojo para déficit
+        elif saldo_final > 0:
+            color = 0, 128, 0  # Verde para superávit
+
+        pdf.set_text_color(*color)
+        pdf.cell(200, 10, txt=f"Saldo final: {format_currency(saldo_final)}", ln=True)
+        pdf.set_text_color(0, 0, 0)  # Volver a negro
+
+    if resumen_ventas.get('alerta_presupuesto'):
+        pdf.set_text_color(255, 0, 0)
+        pdf.cell(200, 10, txt=resumen_ventas['alerta_presupuesto'], ln=True)
+        pdf.set_text_color(0, 0, 0)
+    pdf.ln(5)
+
+    if not df_ventas_mes.empty:
+        visibles, resto = limitar_filas(df_ventas_mes, 'Ventas')
         pdf.set_font("Arial", 'B', 14)
-        pdf.cell(200, 10, txt="1. Resumen General", ln=True)
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt=f"Total de ventas: {format_currency(resumen_ventas.get('total_ventas', 0))}", ln=True)
-        pdf.cell(200, 10, txt=f"Producto más vendido: {resumen_ventas.get('producto_mas_vendido', 'N/A')}", ln=True)
-        pdf.cell(200, 10, txt=f"Producto menos vendido: {resumen_ventas.get('producto_menos_vendido', 'N/A')}", ln=True)
-
-        # Información adicional del resumen
-        if 'presupuesto_mensual' in resumen_ventas:
-            pdf.cell(200, 10,
-                     txt=f"Presupuesto mensual: {format_currency(resumen_ventas.get('presupuesto_mensual', 0))}",
-                     ln=True)
-
-        if 'saldo_final' in resumen_ventas:
-            saldo_final = resumen_ventas.get('saldo_final', 0)
-            color = 0, 0, 0  # Negro por defecto
-            if saldo_final < 0:
-                color = 255, 0, 0  # Rojo para déficit
-            elif saldo_final > 0:
-                color = 0, 128, 0  # Verde para superávit
-
-            pdf.set_text_color(*color)
-            pdf.cell(200, 10, txt=f"Saldo final: {format_currency(saldo_final)}", ln=True)
-            pdf.set_text_color(0, 0, 0)  # Volver a negro
-
-        if resumen_ventas.get('alerta_presupuesto'):
-            pdf.set_text_color(255, 0, 0)
-            pdf.cell(200, 10, txt=resumen_ventas['alerta_presupuesto'], ln=True)
-            pdf.set_text_color(0, 0, 0)
+        pdf.cell(200, 10, txt="2. Ventas por Producto y Mes" + _nota_limite(visibles, resto), ln=True)
         pdf.ln(5)
 
-        if not df_ventas_mes.empty:
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(200, 10, txt="2. Ventas por Producto y Mes", ln=True)
-            pdf.ln(5)
-
-            pdf.set_fill_color(200, 220, 255)
-            pdf.set_font("Arial", 'B', 10)
-            pdf.cell(60, 10, "Producto", 1, 0, 'C', 1)
-            pdf.cell(60, 10, "Mes", 1, 0, 'C', 1)
-            pdf.cell(60, 10, "Ventas", 1, 1, 'C', 1)
-
-            pdf.set_font("Arial", '', 10)
-            for index, row in df_ventas_mes.iterrows():
-                pdf.cell(60, 10, str(row.get('Nombre Producto', 'N/A')), 1, 0, 'C')
-                pdf.cell(60, 10, str(row.get('Mes', 'N/A')), 1, 0, 'C')
-                pdf.cell(60, 10, str(format_currency(row.get('Ventas', 0))), 1, 1, 'C')
-        pdf.ln(5)
+        filas = list(zip(visibles['Nombre Producto'].astype(str), visibles['Mes'].astype(str),
+                         formatear_moneda(visibles['Ventas'])))
+        if resto is not None:
+            filas.append((f"Otros ({len(resto)} filas)", "", format_currency(resto['Ventas'].sum())))
+        dibujar_tabla(pdf, [("Producto", 60), ("Mes", 60), ("Ventas", 60)], filas, tamano_fuente=10)
+    pdf.ln(5)
 
-        if not df_gastos.empty:
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(200, 10, txt="3. Gastos por Mes", ln=True)
-            pdf.ln(5)
+    if not df_gastos.empty:
+        visibles, resto = limitar_filas(df_gastos, 'Gastos')
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(200, 10, txt="3. Gastos por Mes" + _nota_limite(visibles, resto), ln=True)
+        pdf.ln(5)
 
-            pdf.set_fill_color(200, 220, 255)
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(95, 10, "Mes", 1, 0, 'C', 1)
-            pdf.cell(95, 10, "Gastos", 1, 1, 'C', 1)
+        filas = list(zip(visibles['Mes'].astype(str), formatear_moneda(visibles['Gastos'])))
+        if resto is not None:
+            filas.append((f"Otros ({len(resto)} meses)", format_currency(resto['Gastos'].sum())))
+        dibujar_tabla(pdf, [("Mes", 95), ("Gastos", 95)], filas, tamano_fuente=12)
+    pdf.ln(5)
 
-            pdf.set_font("Arial", '', 12)
-            for index, row in df_gastos.iterrows():
-                pdf.cell(95, 10, str(row.get('Mes', 'N/A')), 1, 0, 'C')
-                pdf.cell(95, 10, str(format_currency(row.get('Gastos', 0))), 1, 1, 'C')
+    if not df_productos.empty:
+        visibles, resto = limitar_filas(df_productos, 'Stock_Final_Ultimo_Dia')
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(200, 10, txt="4. Resumen de Stock por Producto" + _nota_limite(visibles, resto), ln=True)
         pdf.ln(5)
 
-        if not df_productos.empty:
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(200, 10, txt="4. Resumen de Stock por Producto", ln=True)
-            pdf.ln(5)
-
-            pdf.set_fill_color(200, 220, 255)
-            pdf.set_font("Arial", 'B', 10)
-            pdf.cell(40, 10, "Producto", 1, 0, 'C', 1)
-            pdf.cell(30, 10, "Mes", 1, 0, 'C', 1)
-            pdf.cell(40, 10, "Stock Final", 1, 0, 'C', 1)
-            pdf.cell(40, 10, "Stock Min. Prom.", 1, 0, 'C', 1)
-            pdf.cell(40, 10, "Stock Máx. Prom.", 1, 1, 'C', 1)
-
-            pdf.set_font("Arial", '', 10)
-            for index, row in df_productos.iterrows():
-                pdf.cell(40, 10, str(row.get('Nombre Producto', 'N/A')), 1, 0, 'C')
-                pdf.cell(30, 10, str(row.get('Mes', 'N/A')), 1, 0, 'C')
-                pdf.cell(40, 10, str(int(row.get('Stock_Final_Ultimo_Dia', 0))), 1, 0, 'C')
-                pdf.cell(40, 10, f"{row.get('Stock_Minimo_Promedio', 0):.2f}", 1, 0, 'C')
-                pdf.cell(40, 10, f"{row.get('Stock_Maximo_Promedio', 0):.2f}", 1, 1, 'C')
-        pdf.ln(5)
+        filas = list(zip(
+            visibles['Nombre Producto'].astype(str),
+            visibles['Mes'].astype(str),
+            visibles['Stock_Final_Ultimo_Dia'].astype(float).fillna(0).astype('int64').astype(str),
+            visibles['Stock_Minimo_Promedio'].astype(float).map('{:.2f}'.format),
+            visibles['Stock_Maximo_Promedio'].astype(float).map('{:.2f}'.format),
+        ))
+        if resto is not None:
+            filas.append((f"Otros ({len(resto)} filas)", "",
+                          str(int(resto['Stock_Final_Ultimo_Dia'].fillna(0).sum())),
+                          f"{resto['Stock_Minimo_Promedio'].mean():.2f}",
+                          f"{resto['Stock_Maximo_Promedio'].mean():.2f}"))
+        dibujar_tabla(pdf, [("Producto", 40), ("Mes", 30), ("Stock Final", 40), ("Stock Min. Prom.", 40),
+                            ("Stock Máx. Prom.", 40)], filas, tamano_fuente=10)
+    pdf.ln(5)
+
+    # Sección de gráficos (solo si hay gráficos y la opción está activada)
+    if generar_graficos_opcion and (nombres_graficos['ventas'] or nombres_graficos['stock']):
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(200, 10, txt="5. Gráficos", ln=True)
+        pdf.ln(10)
 
-        # Sección de gráficos (solo si hay gráficos y la opción está activada)
-        if generar_graficos_opcion and (nombres_graficos['ventas'] or nombres_graficos['stock']):
-            pdf.add_page()
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(200, 10, txt="5. Gráficos", ln=True)
-            pdf.ln(10)
-
-            # Descargar y mostrar gráficos de ventas
-            for i, nombre in enumerate(nombres_graficos['ventas']):
-                try:
-                    # Descargar gráfico desde S3
-                    grafico_content = download_file_obj_from_s3(bucket_name, f"{session_id}/{nombre}")
-                    if grafico_content:
-                        # Guardar temporalmente para mostrarlo en el PDF
-                        temp_path = f"/tmp/{nombre}"
-                        with open(temp_path, 'wb') as f:
-                            f.write(grafico_content.getvalue())
-
-                        pdf.image(temp_path, x=10, y=None, w=180)
-                        pdf.ln(85)  # Espacio después del gráfico
-
-                        # Limpiar archivo temporal
-                        os.remove(temp_path)
-
-                        # Agregar página si hay más gráficos y este no es el último
-                        if i < len(nombres_graficos['ventas']) - 1 or nombres_graficos['stock']:
-                            pdf.add_page()
-                except Exception as e:
-                    pdf.cell(200, 10, txt=f"Error al cargar gráfico {nombre}: {str(e)}", ln=True)
-
-            # Descargar y mostrar gráficos de stock
-            for i, nombre in enumerate(nombres_graficos['stock']):
-                try:
-                    # Descargar gráfico desde S3
-                    grafico_content = download_file_obj_from_s3(bucket_name, f"{session_id}/{nombre}")
-                    if grafico_content:
-                        # Guardar temporalmente para mostrarlo en el PDF
-                        temp_path = f"/tmp/{nombre}"
-                        with open(temp_path, 'wb') as f:
-                            f.write(grafico_content.getvalue())
-
-                        pdf.image(temp_path, x=10, y=None, w=180)
-                        pdf.ln(85)  # Espacio después del gráfico
-
-                        # Limpiar archivo temporal
-                        os.remove(temp_path)
-
-                        # Agregar página si hay más gráficos
-                        if i < len(nombres_graficos['stock']) - 1:
-                            pdf.add_page()
-                except Exception as e:
-                    pdf.cell(200, 10, txt=f"Error al cargar gráfico {nombre}: {str(e)}", ln=True)
-
-        # Pie de página con información de la sesión
-        pdf.set_y(-15)
-        pdf.set_font('Arial', 'I', 8)
-        pdf.cell(0, 10, f'Reporte generado el: {session_id}', 0, 0, 'C')
+        # Los gráficos ya guardados se descargan a la vez, los que faltan se dibujan
+        # juntos, y todos se insertan desde memoria
+        nombres = nombres_graficos['ventas'] + nombres_graficos['stock']
+        agregar_graficos(pdf, obtener_graficos(bucket_name, session_id, nombres, workers=PDF_DESCARGAS_WORKERS))
+
+    # Pie de página con información de la sesión
+    pdf.set_y(-15)
+    pdf.set_font('Arial', 'I', 8)
+    pdf.cell(0, 10, f'Reporte generado el: {session_id}', 0, 0, 'C')
+
+    return pdf
+
+
+def clave_reporte(session_id, resumen_ventas):
+    """
+    Key del PDF guardado en S3: versión del diseño más una firma del resumen, que
+    cambia si el mismo archivo se vuelve a procesar con otro presupuesto, y del
+    límite de filas de las tablas (PDF_MAX_FILAS).
+    """
+    contenido = {'resumen_ventas': resumen_ventas, 'max_filas': PDF_MAX_FILAS}
+    firma = hashlib.sha256(json.dumps(contenido, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"{session_id}/reporte_v{VERSION_REPORTE}_{firma[:16]}.pdf"
+
+
+def preparar_reporte(user_id, session_id=None):
+    """
+    Asegura que el PDF de la sesión esté guardado en S3 (solo se renderiza la primera
+    vez). Retorna {'bucket_name', 'key', 'pdf'}: con key si quedó guardado, o con
+    key None y los bytes en 'pdf' si se renderizó pero no se guardó (gráficos que
+    fallaron o error de S3). Retorna None si la sesión no está en la DB.
+    """
+    resumen = cargar_resumen_db(user_id, session_id)
+    if resumen is None:
+        return None
+    session_id = resumen['session_id']
+    bucket_name = resumen['bucket_name']
+    key = clave_reporte(session_id, resumen['resumen_ventas'])
+    reporte = {'bucket_name': bucket_name, 'key': key, 'pdf': None}
+
+    if not file_exists_in_s3(bucket_name, key):
+        pdf = construir_pdf(cargar_sesion_db(user_id, session_id), session_id, bucket_name)
+        reporte['pdf'] = pdf.output(dest='S').encode('latin-1')
+        # Un reporte incompleto se entrega igual, pero no se guarda para no servirlo siempre
+        if pdf.graficos_fallidos or not upload_file_obj_to_s3(BytesIO(reporte['pdf']), bucket_name, key,
+                                                              'application/pdf'):
+            reporte['key'] = None
+    return reporte
+
+
+def obtener_reporte(user_id, session_id=None):
+    """
+    El reporte para descargar: {'url'} con una URL pre-firmada y de corta duración
+    si está guardado en S3, o {'pdf'} con los bytes ya renderizados si no se pudo
+    guardar (así no se vuelve a renderizar). None si hay que generarlo desde la
+    aplicación (sesión que no está en la DB).
+    """
+    reporte = preparar_reporte(user_id, session_id)
+    if reporte is None:
+        return None
+    if reporte['key'] is None:
+        return {'url': None, 'pdf': reporte['pdf']}
+    url = generate_presigned_url(reporte['bucket_name'], reporte['key'], expiration=REPORTE_URL_EXPIRA,
+                                 download_name=NOMBRE_DESCARGA_REPORTE)
+    if url is None and reporte['pdf'] is None:
+        return None
+    return {'url': url, 'pdf': reporte['pdf']}
+
+
+def generar_pdf():
+    try:
+        # Obtener la sesión: primero la DB, luego el bundle de S3 (sesiones antiguas)
+        session_id = session.get('processing_session')
+        bucket_name = session.get('bucket_name')
+
+        sesion = cargar_sesion_db(current_user.id, session_id)
+        if sesion is not None:
+            session_id = sesion['session_id']
+            bucket_name = sesion['bucket_name']
+        elif session_id and bucket_name:
+            sesion = cargar_sesion(bucket_name, session_id)
+        else:
+            raise Exception("No se encontró sesión de procesamiento. Por favor, procesa un archivo primero.")
+
+        pdf = construir_pdf(sesion, session_id, bucket_name)
+        return BytesIO(pdf.output(dest='S').encode('latin-1'))
 
     except Exception as e:
         # En caso de error, crear un PDF con el mensaje de error
@@ -235,8 +398,4 @@ def generar_pdf():
         pdf.cell(200, 10, txt="Error al generar el reporte PDF", ln=True)
         pdf.cell(200, 10, txt=f"Detalles: {str(e)}", ln=True)
         pdf.cell(200, 10, txt="Por favor, intenta procesar el archivo nuevamente.", ln=True)
-
-    finally:
-        # Generar el PDF final
-        pdf_output = pdf.output(dest='S').encode('latin-1')
-        return BytesIO(pdf_output)
\ No newline at end of file
+        return BytesIO(pdf.output(dest='S').encode('latin-1'))
\ No newline at end of file
@@ -0,0 +1,215 @@
+# app/pipeline.py
+
+import io
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+
+from . import db
+from .models import History
+from .s3_utils import upload_many_file_objs_to_s3
+from .ingesta import agregar_excel_streaming, hash_archivo, TIPOS_EXPORTACION
+from .exportacion import Exportador
+from .agregacion import preparar_datos, agregar_inventario
+from .datos_graficos import construir_datos_graficos, nombres_disponibles, GRAFICOS_MODO
+from .artefactos import construir_bundle, cargar_parcial, NOMBRE_BUNDLE
+from .sesiones import guardar_sesion, obtener_sesion, buscar_sesion_por_contenido, actualizar_presupuesto
+
+
+def format_currency_string(value):
+    """
+    Formatea un número como moneda con separadores de miles y signo de pesos.
+    """
+    if value is None:
+        return "$0"
+    value = int(round(value))
+    return f"${value:,}".replace(",", ".")
+
+
+def calcular_saldo(presupuesto_mensual, total_ventas, total_gastos):
+    """
+    Saldo final del período y el mensaje de alerta si hay déficit.
+    """
+    saldo_final = presupuesto_mensual + total_ventas - total_gastos
+    alerta_presupuesto = ""
+    if saldo_final < 0:
+        deficit = abs(saldo_final)
+        alerta_presupuesto = f"¡Alerta! Tienes un déficit de {format_currency_string(deficit)}."
+    return saldo_final, alerta_presupuesto
+
+
+# INSERT ... ON CONFLICT de cada motor soportado
+INSERT_CON_CONFLICTO = {'postgresql': insert_postgresql, 'sqlite': insert_sqlite}
+
+
+def registrar_historial(user_id, saldo_final):
+    """
+    Guarda (o actualiza) el saldo del mes actual en el historial del usuario, con un
+    solo INSERT ... ON CONFLICT sobre la restricción única (user_id, year, month):
+    una ida a la DB y sin carreras entre cargas simultáneas.
+    """
+    ahora = datetime.now()
+    valores = {'user_id': user_id, 'month': ahora.strftime('%B'), 'year': ahora.year, 'balance': saldo_final}
+
+    insert = INSERT_CON_CONFLICTO.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        # Otros motores: lectura y escritura por separado
+        existente = History.query.filter_by(user_id=user_id, month=valores['month'], year=valores['year']).first()
+        if existente:
+            existente.balance = saldo_final
+        else:
+            db.session.add(History(**valores))
+    else:
+        sentencia = insert(History).values(**valores)
+        db.session.execute(sentencia.on_conflict_do_update(
+            index_elements=['user_id', 'year', 'month'],
+            set_={'balance': sentencia.excluded.balance},
+        ))
+    db.session.commit()
+
+
+def reutilizar_sesion(ps, presupuesto_mensual, generar_graficos, user_id):
+    """
+    El mismo archivo ya se procesó: solo cambian el saldo, la alerta y el historial.
+    No se vuelve a leer el Excel ni se sube nada a S3. Retorna el id de la sesión.
+    """
+    saldo_final, alerta_presupuesto = calcular_saldo(presupuesto_mensual, ps.total_sales, ps.total_expenses)
+    actualizar_presupuesto(ps, presupuesto_mensual, saldo_final, alerta_presupuesto, generar_graficos)
+    registrar_historial(user_id, saldo_final)
+    return ps.id
+
+
+def _cargar_sesion_base(user_id, sesion_base):
+    """
+    Parcial de la sesión anterior sobre la que continúa un procesamiento incremental.
+    """
+    base = obtener_sesion(user_id, sesion_base) if user_id is not None else None
+    if base is None:
+        raise ValueError("No se encontró el procesamiento anterior indicado.")
+    parcial_base = cargar_parcial(base.bucket_name, base.id)
+    if parcial_base is None:
+        raise ValueError("El procesamiento anterior no admite modo incremental; procesa el archivo completo.")
+    return parcial_base
+
+
+def procesar_inventario(archivo, session_id, bucket_name, presupuesto_mensual=0.0, generar_graficos=False,
+                        modo_streaming=False, user_id=None, sesion_base=None, modo_graficos=None,
+                        formato_exportacion=None):
+    """
+    Ejecuta el procesamiento completo de un Excel de inventario: agregados, historial,
+    gráficos y artefactos en S3 bajo el prefijo `session_id`. No depende de la request,
+    así que puede correr tanto en la vista como en un job en segundo plano.
+
+    Con `sesion_base` (modo incremental) solo se procesan las filas con Fecha posterior
+    a la última fecha de esa sesión y se combinan con sus resúmenes.
+
+    Los gráficos no se dibujan aquí: se guardan sus datos y `modo_graficos` ('cliente'
+    o 'servidor', por defecto GRAFICOS_MODO) indica cómo los muestra el dashboard.
+
+    El inventario enriquecido se exporta en `formato_exportacion` ('xlsx', 'csv' o
+    'parquet', por defecto EXPORTACION_FORMATO) con memoria constante (exportacion.py).
+
+    Retorna el id de la sesión, que puede ser el de una sesión anterior si el mismo
+    archivo ya se había procesado.
+    """
+    modo_graficos = modo_graficos or GRAFICOS_MODO
+    exportador = Exportador(formato_exportacion, tipos=TIPOS_EXPORTACION)
+    content_hash = hash_archivo(archivo)
+    if user_id is not None:
+        previa = buscar_sesion_por_contenido(user_id, content_hash, generar_graficos, exportador.formato,
+                                             modo_graficos)
+        if previa is not None:
+            return reutilizar_sesion(previa, presupuesto_mensual, generar_graficos, user_id)
+
+    parcial_base = None
+    if sesion_base:
+        parcial_base = _cargar_sesion_base(user_id, sesion_base)
+
+    if modo_streaming or parcial_base is not None:
+        # Lectura por bloques: la memoria depende de productos y meses, no de filas.
+        # En modo incremental las filas ya procesadas se descartan al leerlas.
+        agregados = agregar_excel_streaming(archivo, exportador=exportador, parcial_base=parcial_base)
+    else:
+        # Leer el Excel directamente desde el archivo subido
+        df = preparar_datos(pd.read_excel(archivo))
+        agregados = agregar_inventario(df)
+        exportador.agregar(df)
+    columnas = agregados['columnas']
+
+    # Artefactos (buffer, key, content_type) que se suben a S3 al final
+    artefactos = []
+
+    total_ventas = 0
+    total_gastos = 0
+    producto_mas_vendido = "N/A"
+    producto_menos_vendido = "N/A"
+    gastos_por_mes = pd.DataFrame(columns=['Mes', 'Gastos(compras)'])
+
+    df_ventas = agregados['ventas_por_nombre']
+    if df_ventas is not None:
+        total_ventas = agregados['total_ventas']
+        if not df_ventas.empty:
+            producto_mas_vendido = df_ventas.loc[df_ventas['Ventas'].idxmax()]['Nombre Producto']
+            producto_menos_vendido = df_ventas.loc[df_ventas['Ventas'].idxmin()]['Nombre Producto']
+
+    if 'Fecha' in columnas:
+        if agregados['gastos_por_mes'] is not None:
+            gastos_por_mes = agregados['gastos_por_mes']
+
+        if not gastos_por_mes.empty:
+            total_gastos = gastos_por_mes['Gastos(compras)'].sum()
+
+        saldo_final, alerta_presupuesto = calcular_saldo(presupuesto_mensual, total_ventas, total_gastos)
+
+        resumen_ventas = {
+            'total_ventas': float(total_ventas),
+            'producto_mas_vendido': producto_mas_vendido,
+            'producto_menos_vendido': producto_menos_vendido,
+            'alerta_presupuesto': alerta_presupuesto,
+            'generar_graficos': generar_graficos,
+            'presupuesto_mensual': presupuesto_mensual,
+            'saldo_final': saldo_final
+        }
+
+        datos_graficos = None
+        nombres_graficos = {"stock": [], "ventas": []}
+        if generar_graficos:
+            # Solo se guardan los datos: el dashboard los dibuja con Chart.js y los PNG
+            # (modo servidor y PDF) se dibujan la primera vez que se piden (graficos_sesion.py)
+            datos_graficos = construir_datos_graficos(agregados['stock_por_nombre'], agregados['ventas_por_nombre'])
+            nombres_graficos = nombres_disponibles(datos_graficos, modo_graficos)
+
+        # Un solo objeto con resumen, tablas y nombres de gráficos (ver artefactos.py)
+        bundle = construir_bundle(resumen_ventas, {
+            'ventas_por_producto': agregados['ventas_por_producto'],
+            'gastos_por_mes': agregados['gastos_por_mes'],
+            'resumen_productos': agregados['resumen_productos'],
+        }, nombres_graficos, parcial=agregados['parcial'], datos_graficos=datos_graficos)
+        artefactos.append((io.BytesIO(bundle), f"{session_id}/{NOMBRE_BUNDLE}", 'application/octet-stream'))
+
+    # Guardar el inventario enriquecido en S3 (en modo streaming ya se escribió por
+    # bloques; en modo incremental contiene solo las filas nuevas)
+    artefactos.append((exportador.cerrar(), f"{session_id}/{exportador.nombre}", exportador.content_type))
+
+    # Todas las subidas van juntas y en paralelo: el tiempo depende del objeto más lento
+    reporte = upload_many_file_objs_to_s3(artefactos, bucket_name)
+    fallidos = [r['key'] for r in reporte if not r['ok']]
+    if fallidos:
+        # Sin bundle o sin inventario la sesión queda incompleta: el job termina con
+        # error y no se registra nada en la DB
+        raise RuntimeError(f"No se pudieron guardar los resultados en S3: {', '.join(fallidos)}")
+
+    if 'Fecha' in columnas and user_id is not None:
+        # Save historical data to the database
+        registrar_historial(user_id, saldo_final)
+        # Resúmenes en la DB para servir dashboard, historial y PDF sin ir a S3. Una
+        # sesión incremental se guarda sin hash: su bundle y su inventario exportado
+        # tienen solo las filas nuevas y no sirven para una carga completa del archivo
+        guardar_sesion(session_id, user_id, bucket_name, resumen_ventas, agregados, nombres_graficos,
+                       content_hash=content_hash if parcial_base is None else None,
+                       formato_exportacion=exportador.formato,
+                       modo_graficos=modo_graficos)
+
+    return session_id
@@ -1,30 +1,23 @@
-from flask import Blueprint, render_template, request, send_file, redirect, url_for, send_from_directory, flash, session
-import pandas as pd
-from .pdf import generar_pdf
+from flask import Blueprint, render_template, request, send_file, redirect, url_for, send_from_directory, flash, session, jsonify, make_response, abort
 import os
-import json
+from io import BytesIO
 from datetime import datetime
-import matplotlib.pyplot as plt
-
-plt.switch_backend('Agg')
 from . import db, bcrypt
-from .models import User, History
+from .models import User, History, Job, invalidar_usuario
+from .cache import cache_usuarios, cache_artefactos
 from flask_login import login_user, current_user, logout_user, login_required
-import io
-import uuid
-from .s3_utils import upload_file_obj_to_s3, download_file_obj_from_s3, generate_presigned_url
+from .artefactos import cargar_resumen_sesion, RESUMEN_VACIO
+from .sesiones import cargar_resumen_db, sesiones_recientes
+from .artefactos import cargar_datos_graficos, exportar_json, ARTEFACTOS_JSON, DESCARGA_URL_EXPIRA
+from .s3_utils import generate_presigned_url, file_exists_in_s3
+from .exportacion import formatos_disponibles, FORMATOS_EXPORTACION, EXPORTACION_FORMATO, NOMBRE_EXPORTACION
+from .datos_graficos import paginar_datos_graficos, MODOS_GRAFICOS
+from .jobs import encolar_procesamiento, preparar_subida, ruta_subida_local, NOMBRE_ENTRADA, ESTADO_COMPLETADO, ESTADO_ERROR
 
 main_bp = Blueprint('main', __name__)
 
-
-def format_currency_string(value):
-    """
-    Formatea un número como moneda con separadores de miles y signo de pesos.
-    """
-    if value is None:
-        return "$0"
-    value = int(round(value))
-    return f"${value:,}".replace(",", ".")
+# Usuarios (separados por coma) que pueden ver las estadísticas internas; vacío = nadie
+ADMIN_USUARIOS = {u.strip() for u in os.getenv('ADMIN_USUARIOS', '').split(',') if u.strip()}
 
 
 @main_bp.route("/")
@@ -73,6 +66,7 @@ def login():
 @main_bp.route("/logout")
 @login_required
 def logout():
+    invalidar_usuario(current_user.id)
     logout_user()
     return redirect(url_for('main.index'))
 
@@ -81,240 +75,151 @@ def logout():
 @login_required
 def upload():
     processed = request.args.get('processed')
+    job_id = request.args.get('job')
     cache_buster = datetime.now().strftime('%Y%m%d%H%M%S')
-    return render_template("upload.html", processed=processed, cache_buster=cache_buster)
+    sesiones_anteriores = sesiones_recientes(current_user.id)
+    return render_template("upload.html", processed=processed, job_id=job_id, cache_buster=cache_buster,
+                           sesiones_anteriores=sesiones_anteriores, session_id=session.get('processing_session'),
+                           formatos_exportacion=formatos_disponibles(), formato_exportacion=EXPORTACION_FORMATO)
 
 
 @main_bp.route("/procesar", methods=["POST"])
 @login_required
 def procesar():
-    if 'archivo' not in request.files:
-        return redirect(url_for('main.upload', error="No se seleccionó ningún archivo."))
-
-    archivo = request.files['archivo']
-    if archivo.filename == '':
-        return redirect(url_for('main.upload', error="No se seleccionó ningún archivo."))
+    # Subida directa: el Excel ya está en S3 (o en la carpeta local) y solo llega la key
+    archivo_key = request.form.get('archivo_key') or None
+    archivo = None
+    if archivo_key is not None:
+        if archivo_key != session.get('subida_pendiente'):
+            return redirect(url_for('main.upload', error="La subida del archivo no es válida; vuelve a intentarlo."))
+        session.pop('subida_pendiente')
+    else:
+        if 'archivo' not in request.files:
+            return redirect(url_for('main.upload', error="No se seleccionó ningún archivo."))
+
+        archivo = request.files['archivo']
+        if archivo.filename == '':
+            return redirect(url_for('main.upload', error="No se seleccionó ningún archivo."))
 
     try:
-        # Generar un ID único para esta sesión de procesamiento
-        session_id = str(uuid.uuid4())
         bucket_name = os.getenv('S3_BUCKET_NAME')
 
-        # Leer el Excel directamente desde el archivo subido
-        df = pd.read_excel(archivo)
-
         presupuesto_str = request.form.get('presupuesto', '0')
-        presupuesto_mensual = float(presupuesto_str)
-
-        generar_graficos = 'generar_graficos' in request.form
-
-        df.columns = df.columns.str.strip()
-        df['Demanda diaria'] = 0
-        df['Stock mínimo'] = 0
-        df['Stock seguridad'] = 0
-        df['Stock máximo'] = 0
-        if 'Ventas Totales' in df.columns and 'Tiempo' in df.columns and 'Reposición (días)' in df.columns:
-            df['Demanda diaria'] = df['Ventas Totales'] / df['Tiempo']
-            df['Stock mínimo'] = df['Demanda diaria'] * df['Reposición (días)']
-            df['Stock seguridad'] = df['Stock mínimo'] * 0.05
-            df['Stock máximo'] = df['Stock mínimo'] + df['Stock seguridad']
-
-        if 'Nombre Producto' in df.columns:
-            df['Nombre Producto'] = df['Nombre Producto'].str.strip().str.lower()
-        else:
-            df['Nombre Producto'] = "Producto Genérico"
-
-        total_ventas = 0
-        total_gastos = 0
-        producto_mas_vendido = "N/A"
-        producto_menos_vendido = "N/A"
-        alerta_presupuesto = ""
-        gastos_por_mes = pd.DataFrame(columns=['Mes', 'Gastos(compras)'])
-
-        if 'Ventas' in df.columns and not df['Ventas'].empty:
-            total_ventas = df['Ventas'].sum()
-            df_ventas = df.groupby('Nombre Producto')['Ventas'].sum().reset_index()
-            if not df_ventas.empty:
-                producto_mas_vendido = df_ventas.loc[df_ventas['Ventas'].idxmax()]['Nombre Producto']
-                producto_menos_vendido = df_ventas.loc[df_ventas['Ventas'].idxmin()]['Nombre Producto']
-
-        if 'Fecha' in df.columns:
-            df['Fecha'] = pd.to_datetime(df['Fecha'], dayfirst=False, errors='coerce')
-            df['Mes'] = df['Fecha'].dt.strftime('%B %Y')
-
-            if 'Ventas' in df.columns:
-                df_ventas_mes = df.groupby(['Nombre Producto', 'Mes'])['Ventas'].sum().reset_index()
-                # Guardar en S3 en lugar de local
-                ventas_json = df_ventas_mes.to_json(orient='records')
-                file_obj = io.BytesIO(ventas_json.encode('utf-8'))
-                upload_file_obj_to_s3(file_obj, bucket_name, f"{session_id}/ventas_por_producto.json",
-                                      'application/json')
-
-            if 'Gastos(compras)' in df.columns:
-                gastos_por_mes = df.groupby('Mes')['Gastos(compras)'].sum().reset_index()
-                # Guardar en S3
-                gastos_json = gastos_por_mes.to_json(orient='records')
-                file_obj = io.BytesIO(gastos_json.encode('utf-8'))
-                upload_file_obj_to_s3(file_obj, bucket_name, f"{session_id}/gastos_por_mes.json", 'application/json')
-
-            if not gastos_por_mes.empty:
-                total_gastos = gastos_por_mes['Gastos(compras)'].sum()
-
-            saldo_final = presupuesto_mensual + total_ventas - total_gastos
-            if saldo_final < 0:
-                deficit = abs(saldo_final)
-                alerta_presupuesto = f"¡Alerta! Tienes un déficit de {format_currency_string(deficit)}."
-
-            # Save historical data to the database
-            if current_user.is_authenticated:
-                month_year = datetime.now().strftime('%B %Y')
-                current_month_history = History.query.filter_by(user_id=current_user.id,
-                                                                month=datetime.now().strftime('%B'),
-                                                                year=datetime.now().year).first()
-                if current_month_history:
-                    current_month_history.balance = saldo_final
-                else:
-                    new_history = History(
-                        month=datetime.now().strftime('%B'),
-                        year=datetime.now().year,
-                        balance=saldo_final,
-                        owner=current_user
-                    )
-                    db.session.add(new_history)
-                db.session.commit()
-
-            if 'Stock Final' in df.columns and 'Nombre Producto' in df.columns:
-                df_sorted = df.sort_values('Fecha')
-                resumen_productos = df_sorted.groupby(['Nombre Producto', 'Mes']).agg(
-                    Stock_Final_Ultimo_Dia=('Stock Final', 'last'),
-                    Stock_Minimo_Promedio=('Stock mínimo', 'mean'),
-                    Stock_Maximo_Promedio=('Stock máximo', 'mean')
-                ).reset_index()
-                # Guardar en S3
-                productos_json = resumen_productos.to_json(orient='records')
-                file_obj = io.BytesIO(productos_json.encode('utf-8'))
-                upload_file_obj_to_s3(file_obj, bucket_name, f"{session_id}/resumen_productos.json", 'application/json')
-            else:
-                resumen_productos = pd.DataFrame()
-
-            resumen_ventas = {
-                'total_ventas': float(total_ventas),
-                'producto_mas_vendido': producto_mas_vendido,
-                'producto_menos_vendido': producto_menos_vendido,
-                'alerta_presupuesto': alerta_presupuesto,
-                'generar_graficos': generar_graficos,
-                'presupuesto_mensual': presupuesto_mensual,
-                'saldo_final': saldo_final
-            }
-            # Guardar en S3
-            resumen_json = json.dumps(resumen_ventas)
-            file_obj = io.BytesIO(resumen_json.encode('utf-8'))
-            upload_file_obj_to_s3(file_obj, bucket_name, f"{session_id}/resumen_ventas.json", 'application/json')
-
-            if generar_graficos:
-                # Inicializar listas para nombres de gráficos
-                graficos_stock_nombres = []
-                graficos_ventas_nombres = []
-
-                if 'Stock mínimo' in df.columns and 'Stock máximo' in df.columns and 'Nombre Producto' in df.columns:
-                    df_grafico = df_sorted.groupby('Nombre Producto').agg({
-                        'Stock mínimo': 'mean',
-                        'Stock máximo': 'mean'
-                    }).reset_index()
-
-                    num_productos = len(df_grafico)
-                    num_graficos_stock = (num_productos + 5) // 6
-
-                    for i in range(num_graficos_stock):
-                        start_idx = i * 6
-                        end_idx = start_idx + 6
-                        df_chunk = df_grafico.iloc[start_idx:end_idx]
-
-                        plt.figure(figsize=(10, 6))
-                        df_chunk.set_index('Nombre Producto').plot(kind='bar', stacked=True)
-                        plt.title(f'Stock Mínimo y Máximo Promedio por Producto (Parte {i + 1})')
-                        plt.ylabel('Cantidad')
-                        plt.xticks(rotation=45)
-                        plt.tight_layout()
-
-                        # Guardar gráfico en buffer y subir a S3
-                        img_buffer = io.BytesIO()
-                        plt.savefig(img_buffer, format='png')
-                        img_buffer.seek(0)
-                        upload_file_obj_to_s3(img_buffer, bucket_name, f"{session_id}/grafico_stock_{i + 1}.png",
-                                              'image/png')
-                        plt.close()
-
-                        graficos_stock_nombres.append(f"grafico_stock_{i + 1}.png")
-
-                if 'Ventas' in df.columns and 'Nombre Producto' in df.columns:
-                    df_grafico_ventas = df.groupby('Nombre Producto')['Ventas'].sum().reset_index()
-
-                    num_productos = len(df_grafico_ventas)
-                    num_graficos_ventas = (num_productos + 5) // 6
-
-                    for i in range(num_graficos_ventas):
-                        start_idx = i * 6
-                        end_idx = start_idx + 6
-                        df_chunk = df_grafico_ventas.iloc[start_idx:end_idx]
-
-                        plt.figure(figsize=(10, 6))
-                        plt.bar(df_chunk['Nombre Producto'], df_chunk['Ventas'], color='skyblue')
-                        plt.title(f'Ventas Totales por Producto (Parte {i + 1})')
-                        plt.ylabel('Ventas')
-                        plt.xlabel('Producto')
-                        plt.xticks(rotation=45)
-                        plt.tight_layout()
-
-                        # Guardar gráfico en buffer y subir a S3
-                        img_buffer = io.BytesIO()
-                        plt.savefig(img_buffer, format='png')
-                        img_buffer.seek(0)
-                        upload_file_obj_to_s3(img_buffer, bucket_name, f"{session_id}/grafico_ventas_{i + 1}.png",
-                                              'image/png')
-                        plt.close()
-
-                        graficos_ventas_nombres.append(f"grafico_ventas_{i + 1}.png")
-
-                # Guardar nombres de gráficos en S3
-                nombres_graficos = {"stock": graficos_stock_nombres, "ventas": graficos_ventas_nombres}
-                nombres_json = json.dumps(nombres_graficos)
-                file_obj = io.BytesIO(nombres_json.encode('utf-8'))
-                upload_file_obj_to_s3(file_obj, bucket_name, f"{session_id}/nombres_graficos.json", 'application/json')
-            else:
-                # Guardar JSON vacío para gráficos
-                nombres_graficos = {"stock": [], "ventas": []}
-                nombres_json = json.dumps(nombres_graficos)
-                file_obj = io.BytesIO(nombres_json.encode('utf-8'))
-                upload_file_obj_to_s3(file_obj, bucket_name, f"{session_id}/nombres_graficos.json", 'application/json')
-
-        # Guardar el Excel procesado en S3
-        excel_buffer = io.BytesIO()
-        df.to_excel(excel_buffer, index=False)
-        excel_buffer.seek(0)
-        upload_file_obj_to_s3(excel_buffer, bucket_name, f"{session_id}/inventario_calculado.xlsx",
-                              'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        parametros = {
+            'presupuesto_mensual': float(presupuesto_str),
+            'generar_graficos': 'generar_graficos' in request.form,
+            'modo_streaming': 'modo_streaming' in request.form,
+            # Modo incremental: continuar un procesamiento anterior con las filas nuevas
+            'sesion_base': request.form.get('sesion_base') or None,
+        }
+        modo_graficos = request.form.get('modo_graficos')
+        if modo_graficos in MODOS_GRAFICOS:
+            parametros['modo_graficos'] = modo_graficos
+        formato_exportacion = request.form.get('formato_exportacion')
+        if formato_exportacion in formatos_disponibles():
+            parametros['formato_exportacion'] = formato_exportacion
+
+        # El procesamiento corre en el pool de jobs; la request solo encola
+        job = encolar_procesamiento(archivo, current_user.id, bucket_name, parametros, archivo_key=archivo_key)
+
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'job_id': job.id, 'estado_url': url_for('main.estado_job', job_id=job.id)}), 202
+        return redirect(url_for('main.upload', job=job.id))
 
-        # Guardar session_id en la sesión de usuario para acceder luego
-        session['processing_session'] = session_id
-        session['bucket_name'] = bucket_name
+    except Exception as e:
+        return render_template("upload.html", error=f"Error al procesar el archivo: {e}",
+                               formatos_exportacion=formatos_disponibles(), formato_exportacion=EXPORTACION_FORMATO), 500
 
-        return redirect(url_for('main.upload', processed='True'))
 
+@main_bp.route("/subidas", methods=["POST"])
+@login_required
+def preparar_subida_route():
+    # POST pre-firmado para que el navegador suba el Excel directo a S3, sin pasar por este worker
+    try:
+        key, post = preparar_subida(os.getenv('S3_BUCKET_NAME'))
     except Exception as e:
-        return render_template("upload.html", error=f"Error al procesar el archivo: {e}"), 500
+        return jsonify({'error': f"No se pudo preparar la subida: {e}"}), 503
+    anterior = session.get('subida_pendiente')
+    if anterior and os.path.exists(ruta_subida_local(anterior.split('/', 1)[0])):
+        # Subida local que no se llegó a procesar
+        os.remove(ruta_subida_local(anterior.split('/', 1)[0]))
+    session['subida_pendiente'] = key
+    if post is None:
+        # Sin S3: se sube a este servidor y se guarda en la carpeta de jobs
+        session_id = key.split('/', 1)[0]
+        post = {'url': url_for('main.subida_local', session_id=session_id), 'fields': {}}
+    return jsonify({'key': key, 'url': post['url'], 'fields': post['fields']})
+
+
+@main_bp.route("/subidas/local/<session_id>", methods=["POST"])
+@login_required
+def subida_local(session_id):
+    if session.get('subida_pendiente') != f"{session_id}/{NOMBRE_ENTRADA}" or 'file' not in request.files:
+        return jsonify({'error': 'Subida no válida'}), 400
+    os.makedirs(os.path.dirname(ruta_subida_local(session_id)), exist_ok=True)
+    request.files['file'].save(ruta_subida_local(session_id))
+    return '', 204
+
+
+@main_bp.route("/jobs/<job_id>")
+@login_required
+def estado_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'error': 'Job no encontrado'}), 404
+
+    respuesta = {'job_id': job.id, 'estado': job.estado}
+    if job.estado == ESTADO_COMPLETADO:
+        # Guardar session_id en la sesión de usuario para acceder luego
+        session['processing_session'] = job.session_id
+        session['bucket_name'] = job.bucket_name
+        respuesta['redirect'] = url_for('main.upload', processed='True')
+    elif job.estado == ESTADO_ERROR:
+        respuesta['error'] = f"Error al procesar el archivo: {job.error}"
+    return jsonify(respuesta)
 
 
 @main_bp.route("/history")
 @login_required
 def history():
-    history_records = History.query.filter_by(owner=current_user).order_by(History.date_recorded.desc()).limit(12).all()
-    return render_template('history.html', history_records=history_records)
+    history_records = History.query.filter_by(user_id=current_user.id).order_by(History.date_recorded.desc()).limit(12).all()
+    processing_sessions = sesiones_recientes(current_user.id)
+    return render_template('history.html', history_records=history_records, processing_sessions=processing_sessions)
+
+
+@main_bp.route("/estadisticas/cache")
+@login_required
+def estadisticas_cache():
+    # Solo para administradores: los contadores son de todos los usuarios. Son de este
+    # proceso (cada worker de gunicorn tiene los suyos) y el endpoint no modifica las caches
+    if current_user.username not in ADMIN_USUARIOS:
+        abort(404)
+    return jsonify({
+        'pid': os.getpid(),
+        'usuarios': cache_usuarios.estadisticas(),
+        'artefactos': cache_artefactos.estadisticas(),
+    })
 
 
 @main_bp.route("/generar_pdf")
 @login_required
 def generar_pdf_route():
+    # fpdf, pandas y matplotlib se importan con el primer reporte, no al arrancar el worker
+    from .pdf import generar_pdf, obtener_reporte, NOMBRE_DESCARGA_REPORTE
+
+    # El reporte queda guardado en S3: se renderiza una vez y se descarga directo de S3
+    try:
+        reporte = obtener_reporte(current_user.id, session.get('processing_session'))
+    except Exception:
+        reporte = None
+    if reporte is not None and reporte['url']:
+        return redirect(reporte['url'])
+    if reporte is not None and reporte['pdf']:
+        # Ya se renderizó pero no se guardó (p. ej. faltó un gráfico): se envía ese mismo
+        return send_file(BytesIO(reporte['pdf']), as_attachment=True, download_name=NOMBRE_DESCARGA_REPORTE,
+                         mimetype='application/pdf')
+
+    # Sesiones que no están en la DB (o S3 no disponible): se genera y se envía como antes
     try:
         pdf_stream = generar_pdf()
         return send_file(
@@ -334,45 +239,21 @@ def dashboard():
         session_id = session.get('processing_session')
         bucket_name = session.get('bucket_name')
 
-        if session_id and bucket_name:
-            # Descargar resumen_ventas.json desde S3
-            resumen_content = download_file_obj_from_s3(bucket_name, f"{session_id}/resumen_ventas.json")
-            if resumen_content:
-                resumen_ventas = json.loads(resumen_content.getvalue().decode('utf-8'))
-            else:
-                resumen_ventas = {
-                    'total_ventas': 0,
-                    'producto_mas_vendido': 'N/A',
-                    'producto_menos_vendido': 'N/A',
-                    'alerta_presupuesto': '',
-                    'presupuesto_mensual': 0,
-                    'saldo_final': 0
-                }
-
-            # Descargar gastos_por_mes.json desde S3
-            gastos_content = download_file_obj_from_s3(bucket_name, f"{session_id}/gastos_por_mes.json")
-            if gastos_content:
-                gastos_por_mes = json.loads(gastos_content.getvalue().decode('utf-8'))
-                total_gastos = sum(item.get('Gastos(compras)', 0) for item in gastos_por_mes)
-            else:
-                total_gastos = 0
-
-            # Descargar ventas_por_producto.json desde S3
-            ventas_content = download_file_obj_from_s3(bucket_name, f"{session_id}/ventas_por_producto.json")
-            if ventas_content:
-                ventas_por_producto = json.loads(ventas_content.getvalue().decode('utf-8'))
-                total_ventas = sum(item.get('Ventas', 0) for item in ventas_por_producto)
-            else:
-                total_ventas = 0
+        # Primero la DB (una consulta); sin cookie se muestra el último procesamiento del usuario
+        resumen_sesion = cargar_resumen_db(current_user.id, session_id)
+        if resumen_sesion is None and session_id and bucket_name:
+            # Sesiones anteriores a la DB: solo el encabezado del bundle (o los JSON sueltos)
+            resumen_sesion = cargar_resumen_sesion(bucket_name, session_id)
+
+        nombres_graficos = {}
+        if resumen_sesion:
+            session_id = resumen_sesion.get('session_id', session_id)
+            nombres_graficos = resumen_sesion.get('nombres_graficos') or {}
+            resumen_ventas = resumen_sesion['resumen_ventas']
+            total_gastos = resumen_sesion['total_gastos']
+            total_ventas = resumen_sesion['total_ventas']
         else:
-            resumen_ventas = {
-                'total_ventas': 0,
-                'producto_mas_vendido': 'N/A',
-                'producto_menos_vendido': 'N/A',
-                'alerta_presupuesto': '',
-                'presupuesto_mensual': 0,
-                'saldo_final': 0
-            }
+            resumen_ventas = dict(RESUMEN_VACIO)
             total_gastos = 0
             total_ventas = 0
 
@@ -384,7 +265,9 @@ def dashboard():
             total_gastos=total_gastos,
             total_ventas=total_ventas,
             gasto_neto=gasto_neto,
-            saldo_final=resumen_ventas.get('saldo_final', 0)
+            saldo_final=resumen_ventas.get('saldo_final', 0),
+            session_id=session_id,
+            nombres_graficos=nombres_graficos
         )
 
     except Exception as e:
@@ -399,6 +282,121 @@ def dashboard():
         )
 
 
+def _ubicar_sesion(session_id):
+    """
+    (bucket_name, session_id) de una sesión del usuario actual, o (None, None).
+    Sin session_id se usa la más reciente.
+    """
+    resumen = cargar_resumen_db(current_user.id, session_id)
+    if resumen is not None:
+        return resumen['bucket_name'], resumen['session_id']
+    if session_id and session_id == session.get('processing_session') and session.get('bucket_name'):
+        # Sesiones anteriores a la DB: solo la de la cookie
+        return session.get('bucket_name'), session_id
+    return None, None
+
+
+@main_bp.route("/graficos/datos")
+@login_required
+def datos_graficos():
+    # Datos de los gráficos para Chart.js; ?tipo=stock|ventas y ?pagina=N (o 'todas')
+    tipo = request.args.get('tipo')
+    if tipo is not None and tipo not in ('stock', 'ventas'):
+        return jsonify({'error': 'Tipo de gráfico no válido'}), 400
+    pagina = request.args.get('pagina', 'todas')
+    if pagina == 'todas':
+        pagina = None
+    elif not pagina.isdigit() or int(pagina) < 1:
+        return jsonify({'error': 'Página no válida'}), 400
+    else:
+        pagina = int(pagina)
+
+    sesion_pedida = request.args.get('sesion')
+    bucket_name, session_id = _ubicar_sesion(sesion_pedida or session.get('processing_session'))
+    if bucket_name is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+
+    datos = cargar_datos_graficos(bucket_name, session_id)
+    if datos is None:
+        return jsonify({'error': 'La sesión no tiene datos de gráficos'}), 404
+
+    respuesta = jsonify(paginar_datos_graficos(datos, pagina, tipo))
+    if sesion_pedida:
+        # Los datos de una sesión no cambian después de procesarla y la URL la identifica
+        respuesta.headers['Cache-Control'] = 'private, max-age=3600'
+    else:
+        # Sin ?sesion= la respuesta depende de la cookie: no se puede reutilizar
+        respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+@main_bp.route("/grafico/<session_id>/<tipo>/<int:parte>.png")
+@login_required
+def grafico(session_id, tipo, parte):
+    # Se dibuja la primera vez que se pide y luego se sirve desde S3 o la cache del proceso
+    if tipo not in ('stock', 'ventas'):
+        return "Gráfico no encontrado", 404
+    bucket_name, session_id = _ubicar_sesion(session_id)
+    if bucket_name is None:
+        return "Gráfico no encontrado", 404
+
+    from .graficos_sesion import obtener_grafico
+
+    png = obtener_grafico(bucket_name, session_id, tipo, parte)
+    if png is None:
+        return "Gráfico no encontrado", 404
+
+    respuesta = make_response(png)
+    respuesta.headers['Content-Type'] = 'image/png'
+    # El gráfico de una sesión nunca cambia: el navegador no vuelve a pedirlo
+    respuesta.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return respuesta
+
+
+def _redirigir_a_s3(bucket_name, key, download_name):
+    # Enlace pre-firmado y de corta duración: los bytes van de S3 al navegador, no pasan por el worker
+    url = generate_presigned_url(bucket_name, key, expiration=DESCARGA_URL_EXPIRA, download_name=download_name)
+    if url is None:
+        return "No se pudo generar el enlace de descarga", 503
+    return redirect(url)
+
+
+@main_bp.route("/descargas/<session_id>/inventario_calculado")
+@login_required
+def descargar_inventario(session_id):
+    resumen = cargar_resumen_db(current_user.id, session_id)
+    if resumen is not None and resumen['formato_exportacion']:
+        nombre = f"{NOMBRE_EXPORTACION}.{resumen['formato_exportacion']}"
+        return _redirigir_a_s3(resumen['bucket_name'], f"{resumen['session_id']}/{nombre}", nombre)
+
+    # Sesiones guardadas sin el formato (o solo en la cookie): se busca el archivo en cada uno
+    bucket_name, session_id = _ubicar_sesion(session_id)
+    if bucket_name is None:
+        return "Archivo no encontrado", 404
+    for formato in FORMATOS_EXPORTACION:
+        nombre = f"{NOMBRE_EXPORTACION}.{formato}"
+        if file_exists_in_s3(bucket_name, f"{session_id}/{nombre}"):
+            return _redirigir_a_s3(bucket_name, f"{session_id}/{nombre}", nombre)
+    return "Archivo no encontrado", 404
+
+
+@main_bp.route("/descargas/<session_id>/<nombre>.json")
+@login_required
+def descargar_json(session_id, nombre):
+    if nombre not in ARTEFACTOS_JSON:
+        return "Archivo no encontrado", 404
+    bucket_name, session_id = _ubicar_sesion(session_id)
+    if bucket_name is None:
+        return "Archivo no encontrado", 404
+    try:
+        key = exportar_json(bucket_name, session_id, nombre)
+    except Exception:
+        key = None
+    if key is None:
+        return "Archivo no encontrado", 404
+    return _redirigir_a_s3(bucket_name, key, f"{nombre}.json")
+
+
 @main_bp.route("/descargar-plantilla")
 def descargar_plantilla():
     return send_from_directory(
@@ -1,14 +1,22 @@
-import boto3
 import os
+import tempfile
+import threading
 from botocore.exceptions import NoCredentialsError, ClientError
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 import uuid
 
+# Máximo de subidas simultáneas en upload_many_file_objs_to_s3
+S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', '8'))
+# Conexiones HTTP que mantiene abiertas el cliente compartido
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', str(max(10, S3_UPLOAD_WORKERS))))
 
-def get_s3_client():
-    """
-    Inicializa y retorna un cliente de S3 usando las variables de entorno
-    """
+_s3_client = None
+_s3_client_pid = None
+_s3_client_lock = threading.Lock()
+
+
+def _crear_s3_client():
     aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
     aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
     region_name = os.getenv('AWS_REGION', 'us-east-1')
@@ -16,14 +24,55 @@ def get_s3_client():
     if not aws_access_key_id or not aws_secret_access_key:
         raise Exception("AWS credentials not found in environment variables")
 
+    # boto3 tarda en importarse: solo lo pagan los procesos que usan S3
+    import boto3
+    from botocore.config import Config
+
     return boto3.client(
         's3',
         aws_access_key_id=aws_access_key_id,
         aws_secret_access_key=aws_secret_access_key,
-        region_name=region_name
+        region_name=region_name,
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True
+        )
     )
 
 
+def get_s3_client():
+    """
+    Retorna el cliente de S3 compartido del proceso (se crea la primera vez).
+    Los clientes de boto3 son thread-safe; tras un fork (workers de gunicorn)
+    el proceso hijo crea el suyo para no compartir conexiones con el padre.
+    """
+    global _s3_client, _s3_client_pid
+    pid = os.getpid()
+    if _s3_client is not None and _s3_client_pid == pid:
+        return _s3_client
+
+    with _s3_client_lock:
+        if _s3_client is None or _s3_client_pid != pid:
+            _s3_client = _crear_s3_client()
+            _s3_client_pid = pid
+        return _s3_client
+
+
+def reset_s3_client():
+    """
+    Descarta el cliente compartido; el siguiente get_s3_client() crea uno nuevo.
+    """
+    global _s3_client, _s3_client_pid, _s3_client_lock
+    _s3_client = None
+    _s3_client_pid = None
+    # El lock pudo quedar tomado por otro hilo del padre en el momento del fork
+    _s3_client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_s3_client)
+
+
 def upload_file_to_s3(file_path, bucket_name, s3_file_name=None):
     """
     Sube un archivo local a S3
@@ -69,6 +118,41 @@ def upload_file_obj_to_s3(file_obj, bucket_name, s3_file_name, content_type='app
         return False
 
 
+def upload_many_file_objs_to_s3(items, bucket_name, max_workers=S3_UPLOAD_WORKERS):
+    """
+    Sube varios objetos de archivo a S3 en paralelo con un pool de hilos acotado.
+    `items` es una lista de tuplas (file_obj, s3_file_name, content_type).
+    Retorna un reporte por objeto, en el mismo orden: {'key', 'ok', 'error'}.
+    """
+    if not items:
+        return []
+
+    s3_client = get_s3_client()  # los clientes de boto3 se pueden compartir entre hilos
+
+    def _subir(item):
+        file_obj, s3_file_name, content_type = item
+        try:
+            file_obj.seek(0)
+            s3_client.upload_fileobj(
+                file_obj,
+                bucket_name,
+                s3_file_name,
+                ExtraArgs={'ContentType': content_type}
+            )
+            return {'key': s3_file_name, 'ok': True, 'error': None}
+        except Exception as e:
+            return {'key': s3_file_name, 'ok': False, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        reporte = list(executor.map(_subir, items))
+
+    fallidos = [r for r in reporte if not r['ok']]
+    print(f"{len(reporte) - len(fallidos)}/{len(reporte)} file objects uploaded to {bucket_name}")
+    for r in fallidos:
+        print(f"Error uploading file object {r['key']}: {r['error']}")
+    return reporte
+
+
 def download_file_from_s3(bucket_name, s3_file_name, local_path):
     """
     Descarga un archivo desde S3 al sistema local
@@ -107,16 +191,69 @@ def download_file_obj_from_s3(bucket_name, s3_file_name):
         return None
 
 
-def generate_presigned_url(bucket_name, object_name, expiration=3600):
+def download_to_temp_file_from_s3(bucket_name, s3_file_name, max_memory=8 * 1024 * 1024):
+    """
+    Descarga un objeto de S3 por partes a un archivo temporal (en memoria hasta
+    `max_memory` bytes y luego en disco). Retorna el archivo posicionado al inicio,
+    o None si el objeto no existe o hubo un error.
+    """
+    s3_client = get_s3_client()
+    file_obj = tempfile.SpooledTemporaryFile(max_size=max_memory)
+
+    try:
+        s3_client.download_fileobj(bucket_name, s3_file_name, file_obj)
+        file_obj.seek(0)
+        print(f"File {s3_file_name} downloaded from {bucket_name} to a temporary file")
+        return file_obj
+    except Exception as e:
+        file_obj.close()
+        print(f"Error downloading file: {e}")
+        return None
+
+
+def download_range_from_s3(bucket_name, s3_file_name, start, end):
+    """
+    Descarga solo los bytes [start, end] (inclusive) de un objeto de S3.
+    Retorna los bytes leídos o None si el objeto no existe o hubo un error.
+    """
+    s3_client = get_s3_client()
+
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=s3_file_name, Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+    except Exception as e:
+        print(f"Error downloading range of {s3_file_name}: {e}")
+        return None
+
+
+def file_exists_in_s3(bucket_name, s3_file_name):
+    """
+    Indica si el objeto existe (HEAD, sin descargarlo)
+    """
+    s3_client = get_s3_client()
+
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=s3_file_name)
+        return True
+    except ClientError:
+        return False
+
+
+def generate_presigned_url(bucket_name, object_name, expiration=3600, download_name=None):
     """
-    Genera una URL pre-firmada para descargar un archivo desde S3
+    Genera una URL pre-firmada para descargar un archivo desde S3. Con `download_name`
+    el navegador lo descarga como adjunto con ese nombre.
     """
     s3_client = get_s3_client()
 
+    params = {'Bucket': bucket_name, 'Key': object_name}
+    if download_name:
+        params['ResponseContentDisposition'] = f'attachment; filename="{download_name}"'
+
     try:
         url = s3_client.generate_presigned_url(
             'get_object',
-            Params={'Bucket': bucket_name, 'Key': object_name},
+            Params=params,
             ExpiresIn=expiration
         )
         return url
@@ -125,6 +262,84 @@ def generate_presigned_url(bucket_name, object_name, expiration=3600):
         return None
 
 
+def generate_presigned_post(bucket_name, object_name, max_bytes, expiration=900, tags=None):
+    """
+    Genera un POST pre-firmado para que el navegador suba un archivo directo a S3
+    con la key indicada y como máximo `max_bytes`. Con `tags` ({clave: valor}) el
+    objeto se crea etiquetado. Retorna {'url', 'fields'} o None.
+    """
+    s3_client = get_s3_client()
+
+    fields = {}
+    conditions = [['content-length-range', 1, max_bytes]]
+    if tags:
+        fields['tagging'] = '<Tagging><TagSet>' + ''.join(
+            f"<Tag><Key>{clave}</Key><Value>{valor}</Value></Tag>" for clave, valor in tags.items()
+        ) + '</TagSet></Tagging>'
+        conditions.append({'tagging': fields['tagging']})
+
+    try:
+        return s3_client.generate_presigned_post(
+            bucket_name,
+            object_name,
+            Fields=fields or None,
+            Conditions=conditions,
+            ExpiresIn=expiration
+        )
+    except Exception as e:
+        print(f"Error generating presigned POST: {e}")
+        return None
+
+
+def _reemplazar_regla(reglas, regla):
+    # Las demás reglas del bucket se conservan; la de igual ID se reemplaza
+    return [r for r in reglas if r.get('ID') != regla['ID']] + [regla]
+
+
+def put_bucket_lifecycle_rule(bucket_name, rule):
+    """
+    Agrega (o reemplaza, según su ID) una regla de lifecycle del bucket.
+    """
+    s3_client = get_s3_client()
+
+    try:
+        try:
+            reglas = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)['Rules']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+                raise
+            reglas = []
+        s3_client.put_bucket_lifecycle_configuration(
+            Bucket=bucket_name, LifecycleConfiguration={'Rules': _reemplazar_regla(reglas, rule)}
+        )
+        print(f"Lifecycle rule {rule['ID']} set on {bucket_name}")
+        return True
+    except Exception as e:
+        print(f"Error setting lifecycle rule: {e}")
+        return False
+
+
+def put_bucket_cors_rule(bucket_name, rule):
+    """
+    Agrega (o reemplaza, según su ID) una regla CORS del bucket.
+    """
+    s3_client = get_s3_client()
+
+    try:
+        try:
+            reglas = s3_client.get_bucket_cors(Bucket=bucket_name)['CORSRules']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchCORSConfiguration':
+                raise
+            reglas = []
+        s3_client.put_bucket_cors(Bucket=bucket_name, CORSConfiguration={'CORSRules': _reemplazar_regla(reglas, rule)})
+        print(f"CORS rule {rule['ID']} set on {bucket_name}")
+        return True
+    except Exception as e:
+        print(f"Error setting CORS rule: {e}")
+        return False
+
+
 def list_files_in_bucket(bucket_name, prefix=''):
     """
     Lista todos los archivos en un bucket de S3 con un prefijo opcional
@@ -0,0 +1,208 @@
+# app/sesiones.py
+
+import json
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from . import db
+from .models import ProcessingSession, ProductMonthSummary, MonthlyExpense
+
+
+def _sin_nan(valor):
+    # Solo se llama al guardar un procesamiento, cuando pandas ya está cargado
+    import pandas as pd
+    return None if pd.isna(valor) else float(valor)
+
+
+def guardar_sesion(session_id, user_id, bucket_name, resumen_ventas, agregados, nombres_graficos,
+                   content_hash=None, formato_exportacion=None, modo_graficos=None):
+    """
+    Guarda en la DB el resumen del procesamiento y las tablas por producto/mes y por mes,
+    con inserciones en bloque. Así dashboard, historial y PDF no dependen de S3 ni de
+    la cookie de sesión.
+    """
+    claves = ['Nombre Producto', 'Mes']
+    ventas = agregados['ventas_por_producto']
+    stock = agregados['resumen_productos']
+    gastos = agregados['gastos_por_mes']
+
+    if ventas is not None and stock is not None:
+        productos = ventas.merge(stock, on=claves, how='outer', sort=True)
+    else:
+        productos = ventas if ventas is not None else stock
+
+    total_gastos = float(gastos['Gastos(compras)'].sum()) if gastos is not None else 0.0
+    total_ventas_mes = float(ventas['Ventas'].sum()) if ventas is not None else 0.0
+
+    db.session.add(ProcessingSession(
+        id=session_id,
+        user_id=user_id,
+        bucket_name=bucket_name,
+        budget=resumen_ventas['presupuesto_mensual'],
+        total_sales=resumen_ventas['total_ventas'],
+        total_monthly_sales=total_ventas_mes,
+        total_expenses=total_gastos,
+        final_balance=float(resumen_ventas['saldo_final']),
+        best_seller=resumen_ventas['producto_mas_vendido'],
+        worst_seller=resumen_ventas['producto_menos_vendido'],
+        budget_alert=resumen_ventas['alerta_presupuesto'],
+        charts_enabled=resumen_ventas['generar_graficos'],
+        chart_names=json.dumps(nombres_graficos),
+        content_hash=content_hash,
+        export_format=formato_exportacion,
+        chart_mode=modo_graficos
+    ))
+    db.session.flush()
+
+    if productos is not None and not productos.empty:
+        db.session.execute(sa.insert(ProductMonthSummary), [
+            {
+                'session_id': session_id,
+                'product': fila['Nombre Producto'],
+                'month': fila['Mes'],
+                'sales': _sin_nan(fila.get('Ventas')),
+                'final_stock': _sin_nan(fila.get('Stock_Final_Ultimo_Dia')),
+                'avg_min_stock': _sin_nan(fila.get('Stock_Minimo_Promedio')),
+                'avg_max_stock': _sin_nan(fila.get('Stock_Maximo_Promedio')),
+            }
+            for fila in productos.to_dict('records')
+        ])
+
+    if gastos is not None and not gastos.empty:
+        db.session.execute(sa.insert(MonthlyExpense), [
+            {'session_id': session_id, 'month': fila['Mes'], 'expenses': _sin_nan(fila['Gastos(compras)']) or 0.0}
+            for fila in gastos.to_dict('records')
+        ])
+
+    db.session.commit()
+
+
+def _buscar_sesion(user_id, session_id=None):
+    """
+    La sesión indicada (si pertenece al usuario) o, sin session_id, la más reciente.
+    """
+    consulta = ProcessingSession.query.filter_by(user_id=user_id)
+    if session_id:
+        return consulta.filter_by(id=session_id).first()
+    return consulta.order_by(ProcessingSession.created_at.desc()).first()
+
+
+def obtener_sesion(user_id, session_id):
+    """
+    La sesión indicada si pertenece al usuario, o None.
+    """
+    return ProcessingSession.query.filter_by(user_id=user_id, id=session_id).first()
+
+
+def buscar_sesion_por_contenido(user_id, content_hash, generar_graficos, formato_exportacion, modo_graficos):
+    """
+    Sesión más reciente del usuario procesada a partir del mismo archivo completo y
+    exportada en el mismo formato. Si se piden gráficos, solo sirve una sesión que ya
+    los tenga en el mismo modo. Las sesiones incrementales no tienen hash (solo
+    contienen las filas nuevas), así que nunca se reutilizan.
+    """
+    consulta = ProcessingSession.query.filter_by(user_id=user_id, content_hash=content_hash,
+                                                 export_format=formato_exportacion)
+    if generar_graficos:
+        consulta = consulta.filter_by(charts_enabled=True, chart_mode=modo_graficos)
+    return consulta.order_by(ProcessingSession.created_at.desc()).first()
+
+
+def actualizar_presupuesto(ps, presupuesto_mensual, saldo_final, alerta_presupuesto, generar_graficos):
+    """
+    Actualiza una sesión reutilizada con el nuevo presupuesto. Las tablas y los
+    gráficos no cambian porque dependen solo del archivo; una sesión con gráficos los
+    conserva aunque la nueva carga no los pida.
+    """
+    ps.budget = presupuesto_mensual
+    ps.final_balance = float(saldo_final)
+    ps.budget_alert = alerta_presupuesto
+    ps.charts_enabled = ps.charts_enabled or generar_graficos
+    # Pasa a ser el último procesamiento del usuario (dashboard sin cookie, historial)
+    ps.created_at = datetime.utcnow()
+
+
+def _resumen_ventas(ps):
+    return {
+        'total_ventas': ps.total_sales,
+        'producto_mas_vendido': ps.best_seller,
+        'producto_menos_vendido': ps.worst_seller,
+        'alerta_presupuesto': ps.budget_alert or '',
+        'generar_graficos': ps.charts_enabled,
+        'presupuesto_mensual': ps.budget,
+        'saldo_final': ps.final_balance
+    }
+
+
+def cargar_resumen_db(user_id, session_id=None):
+    """
+    Lo que necesita el dashboard, con una sola consulta. Retorna None si la sesión
+    no está en la DB (p. ej. procesada antes de existir estas tablas).
+    """
+    ps = _buscar_sesion(user_id, session_id)
+    if ps is None:
+        return None
+    return {
+        'session_id': ps.id,
+        'bucket_name': ps.bucket_name,
+        'resumen_ventas': _resumen_ventas(ps),
+        'total_gastos': ps.total_expenses,
+        'total_ventas': ps.total_monthly_sales,
+        'nombres_graficos': json.loads(ps.chart_names),
+        'formato_exportacion': ps.export_format,
+    }
+
+
+def cargar_sesion_db(user_id, session_id=None):
+    """
+    Todos los resúmenes de una sesión (lo que usa el PDF), con el mismo formato que
+    artefactos.cargar_sesion. Retorna None si la sesión no está en la DB.
+    """
+    import pandas as pd
+
+    ps = _buscar_sesion(user_id, session_id)
+    if ps is None:
+        return None
+
+    filas = db.session.execute(
+        sa.select(ProductMonthSummary).where(ProductMonthSummary.session_id == ps.id)
+        .order_by(ProductMonthSummary.id)
+    ).scalars().all()
+    gastos = db.session.execute(
+        sa.select(MonthlyExpense).where(MonthlyExpense.session_id == ps.id).order_by(MonthlyExpense.id)
+    ).scalars().all()
+
+    con_ventas = [f for f in filas if f.sales is not None]
+    con_stock = [f for f in filas if f.avg_min_stock is not None or f.final_stock is not None]
+
+    return {
+        'session_id': ps.id,
+        'bucket_name': ps.bucket_name,
+        'resumen_ventas': _resumen_ventas(ps),
+        'ventas_por_producto': pd.DataFrame({
+            'Nombre Producto': [f.product for f in con_ventas],
+            'Mes': [f.month for f in con_ventas],
+            'Ventas': [f.sales for f in con_ventas],
+        }) if con_ventas else None,
+        'resumen_productos': pd.DataFrame({
+            'Nombre Producto': [f.product for f in con_stock],
+            'Mes': [f.month for f in con_stock],
+            'Stock_Final_Ultimo_Dia': [f.final_stock for f in con_stock],
+            'Stock_Minimo_Promedio': [f.avg_min_stock for f in con_stock],
+            'Stock_Maximo_Promedio': [f.avg_max_stock for f in con_stock],
+        }) if con_stock else None,
+        'gastos_por_mes': pd.DataFrame({
+            'Mes': [g.month for g in gastos],
+            'Gastos(compras)': [g.expenses for g in gastos],
+        }) if gastos else None,
+        'nombres_graficos': json.loads(ps.chart_names),
+    }
+
+
+def sesiones_recientes(user_id, limite=12):
+    """
+    Últimos procesamientos del usuario (usa el índice user_id, created_at).
+    """
+    return (ProcessingSession.query.filter_by(user_id=user_id)
+            .order_by(ProcessingSession.created_at.desc()).limit(limite).all())
@@ -1,22 +1,110 @@
 // dashboard.js
 
 document.addEventListener('DOMContentLoaded', function () {
-  const ctx = document.getElementById('grafico').getContext('2d');
-  new Chart(ctx, {
-    type: 'bar',
-    data: {
-      labels: window.nombres, // ← lo pasamos desde Flask
-      datasets: [{
-        label: 'Stock Final',
-        data: window.stocks,
-        backgroundColor: '#1a73e8'
-      }]
-    },
-    options: {
-      responsive: true,
-      scales: {
-        y: { beginAtZero: true }
+  const canvasStock = document.getElementById('grafico');
+  if (canvasStock && window.nombres) {
+    new Chart(canvasStock.getContext('2d'), {
+      type: 'bar',
+      data: {
+        labels: window.nombres, // ← lo pasamos desde Flask
+        datasets: [{
+          label: 'Stock Final',
+          data: window.stocks,
+          backgroundColor: '#1a73e8'
+        }]
+      },
+      options: {
+        responsive: true,
+        scales: {
+          y: { beginAtZero: true }
+        }
       }
+    });
+  }
+
+  // Gráficos de la sesión dibujados en el navegador a partir de /graficos/datos
+  const contenedor = document.getElementById('graficos');
+  if (contenedor) {
+    contenedor.querySelectorAll('.grafico[data-tipo]').forEach(function (elemento) {
+      iniciarGrafico(contenedor.dataset.url, elemento);
+    });
+  }
+});
+
+function datasetsGrafico(tipo, datos) {
+  if (tipo === 'stock') {
+    return [
+      { label: 'Stock mínimo', data: datos.minimo, backgroundColor: '#1a73e8' },
+      { label: 'Stock máximo', data: datos.maximo, backgroundColor: '#f29900' }
+    ];
+  }
+  return [{ label: 'Ventas', data: datos.ventas, backgroundColor: 'skyblue' }];
+}
+
+function iniciarGrafico(url, elemento) {
+  const tipo = elemento.dataset.tipo;
+  const canvas = elemento.querySelector('canvas');
+  const estado = elemento.querySelector('.pagina-actual');
+  const botones = elemento.querySelectorAll('button[data-paso]');
+  const botonTodos = elemento.querySelector('button[data-todas]');
+  let pagina = 1;
+  let paginas = 1;
+  let grafico = null;
+
+  function cargar() {
+    // Sin página se piden todos los productos en un solo gráfico
+    // La URL ya trae ?sesion=...: los datos cacheados son siempre los de esa sesión
+    const direccion = new URL(url, window.location.href);
+    direccion.searchParams.set('tipo', tipo);
+    direccion.searchParams.set('pagina', pagina === null ? 'todas' : pagina);
+    fetch(direccion.toString(), { headers: { 'Accept': 'application/json' } })
+      .then(function (r) { return r.json(); })
+      .then(function (respuesta) {
+        const datos = respuesta[tipo];
+        if (!datos || datos.productos.length === 0) {
+          elemento.style.display = 'none';
+          return;
+        }
+        paginas = datos.paginas;
+        dibujar(datos);
+        estado.textContent = pagina === null ? 'Todos los productos' : 'Parte ' + pagina + ' de ' + paginas;
+        botones.forEach(function (boton) {
+          const destino = (pagina || 1) + Number(boton.dataset.paso);
+          boton.disabled = pagina === null || destino < 1 || destino > paginas;
+        });
+        botonTodos.textContent = pagina === null ? 'Ver por partes' : 'Ver todos';
+      });
+  }
+
+  function dibujar(datos) {
+    if (grafico) {
+      grafico.data.labels = datos.productos;
+      grafico.data.datasets = datasetsGrafico(tipo, datos);
+      grafico.update();
+      return;
     }
+    grafico = new Chart(canvas.getContext('2d'), {
+      type: 'bar',
+      data: { labels: datos.productos, datasets: datasetsGrafico(tipo, datos) },
+      options: {
+        responsive: true,
+        scales: {
+          x: { stacked: tipo === 'stock' },
+          y: { stacked: tipo === 'stock', beginAtZero: true }
+        }
+      }
+    });
+  }
+
+  botones.forEach(function (boton) {
+    boton.addEventListener('click', function () {
+      pagina = (pagina || 1) + Number(boton.dataset.paso);
+      cargar();
+    });
   });
-});
+  botonTodos.addEventListener('click', function () {
+    pagina = pagina === null ? 1 : null;
+    cargar();
+  });
+  cargar();
+}
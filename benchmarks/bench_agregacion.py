@@ -0,0 +1,101 @@
+# benchmarks/bench_agregacion.py - motor de agregación factorizado vs groupby de pandas
+#
+# Compara las tablas de agregacion.agregar_inventario con la implementación anterior
+# (varios groupby + sort por Fecha) y mide el tiempo de ambas.
+#
+# Uso: python benchmarks/bench_agregacion.py [filas...]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.agregacion import (preparar_datos, agregar_parcial, agregar_inventario, finalizar_agregados,
+                            combinar_parciales)
+
+CLAVES = ['Nombre Producto', 'Mes']
+
+
+def datos_inventario(filas, productos=500, seed=0):
+    """Filas crudas con la forma de la plantilla, con nulos y fechas repetidas."""
+    rng = np.random.default_rng(seed)
+    nombres = np.array([f"  Producto {i} " for i in range(productos)], dtype=object)
+    fechas = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, filas), unit='D')
+    df = pd.DataFrame({
+        'Fecha': fechas,
+        'Nombre Producto': nombres[rng.integers(0, productos, filas)],
+        'Ventas': rng.uniform(0, 1000, filas).round(2),
+        'Gastos(compras)': rng.uniform(0, 800, filas).round(2),
+        'Ventas Totales': rng.integers(1, 500, filas).astype(float),
+        'Tiempo': rng.integers(1, 30, filas).astype(float),
+        'Reposición (días)': rng.integers(1, 15, filas).astype(float),
+        'Stock Final': rng.integers(0, 1000, filas).astype(float),
+    })
+    for columna in ('Ventas', 'Stock Final', 'Tiempo'):
+        df.loc[rng.random(filas) < 0.01, columna] = np.nan
+    df.loc[rng.random(filas) < 0.001, 'Nombre Producto'] = None
+    return df
+
+
+def referencia(df):
+    """Agregados parciales calculados como antes: un groupby por tabla."""
+    fecha_max = df['Fecha'].max()
+    parcial = {'columnas': list(df.columns), 'total_ventas': float(df['Ventas'].sum()),
+               'fecha_max': None if pd.isna(fecha_max) else fecha_max}
+    parcial['stock_producto'] = df.groupby('Nombre Producto').agg(
+        min_suma=('Stock mínimo', 'sum'), min_n=('Stock mínimo', 'count'),
+        max_suma=('Stock máximo', 'sum'), max_n=('Stock máximo', 'count'),
+    ).reset_index()
+    parcial['ventas_producto'] = df.groupby('Nombre Producto')['Ventas'].sum().reset_index()
+    parcial['ventas_mes'] = df.groupby(CLAVES)['Ventas'].sum().reset_index()
+    parcial['gastos_mes'] = df.groupby('Mes')['Gastos(compras)'].sum().reset_index()
+    parcial['stock_mes'] = df.groupby(CLAVES).agg(
+        min_suma=('Stock mínimo', 'sum'), min_n=('Stock mínimo', 'count'),
+        max_suma=('Stock máximo', 'sum'), max_n=('Stock máximo', 'count'),
+    ).reset_index()
+    con_stock = df.loc[df['Stock Final'].notna(), CLAVES + ['Fecha', 'Stock Final']].dropna(subset=CLAVES)
+    parcial['ultimo_stock'] = con_stock.sort_values('Fecha', kind='stable').drop_duplicates(
+        subset=CLAVES, keep='last')
+    return finalizar_agregados(parcial)
+
+
+def comparar(esperado, obtenido):
+    assert np.isclose(esperado['total_ventas'], obtenido['total_ventas'])
+    assert esperado['fecha_max'] == obtenido['fecha_max']
+    for nombre in ('ventas_por_nombre', 'ventas_por_producto', 'gastos_por_mes',
+                   'resumen_productos', 'stock_por_nombre'):
+        pd.testing.assert_frame_equal(esperado[nombre].reset_index(drop=True),
+                                      obtenido[nombre].reset_index(drop=True),
+                                      check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+def cronometrar(funcion, repeticiones=3):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return resultado, mejor * 1000
+
+
+if __name__ == '__main__':
+    filas_lista = [int(f) for f in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+
+    # Paridad también al combinar bloques (modo streaming)
+    df = preparar_datos(datos_inventario(20_000, productos=50))
+    por_bloques = None
+    for inicio in range(0, len(df), 3_000):
+        por_bloques = combinar_parciales(por_bloques, agregar_parcial(df.iloc[inicio:inicio + 3_000]))
+    comparar(referencia(df), finalizar_agregados(por_bloques))
+    print("Paridad por bloques: OK")
+
+    print(f"{'filas':>10} {'groupby ms':>11} {'factorizado ms':>15} {'speedup':>8}")
+    for filas in filas_lista:
+        df = preparar_datos(datos_inventario(filas))
+        esperado, t_ref = cronometrar(lambda: referencia(df))
+        obtenido, t_nuevo = cronometrar(lambda: agregar_inventario(df))
+        comparar(esperado, obtenido)
+        print(f"{filas:>10} {t_ref:>11.1f} {t_nuevo:>15.1f} {t_ref / t_nuevo:>7.1f}x")
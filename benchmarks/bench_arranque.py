@@ -0,0 +1,108 @@
+# benchmarks/bench_arranque.py - tiempo de arranque de un worker (imports y fases de create_app)
+#
+# Cada medición corre en un proceso nuevo (como un worker de gunicorn recién creado):
+# importa el paquete, llama a create_app() y atiende GET /login. Informa la mediana de
+# cada fase, los imports más caros (python -X importtime) y qué librerías pesadas
+# quedaron cargadas. Con --ref se mide además otra versión del repo (git worktree).
+#
+# Uso: python benchmarks/bench_arranque.py [repeticiones] [--ref COMMIT]
+import os
+import sys
+import json
+import time
+import shutil
+import statistics
+import subprocess
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ('pandas', 'numpy', 'matplotlib', 'fpdf', 'PIL', 'boto3', 'botocore', 'pyarrow', 'openpyxl', 'xlsxwriter')
+
+
+def medir(raiz):
+    # Se ejecuta en el proceso hijo
+    inicio = time.perf_counter()
+    sys.path.insert(0, raiz)
+    from app import create_app
+    importado = time.perf_counter()
+    app = create_app()
+    creado = time.perf_counter()
+    app.test_client().get('/login')
+    fin = time.perf_counter()
+
+    resultado = {
+        'import app': (importado - inicio) * 1000,
+        'create_app': (creado - importado) * 1000,
+        'primer GET /login': (fin - creado) * 1000,
+        'total': (fin - inicio) * 1000,
+        'pesados': sorted(m for m in PESADOS if m in sys.modules),
+    }
+    # Fases internas de create_app (solo en versiones que las registran)
+    for fase, ms in app.config.get('TIEMPOS_ARRANQUE', {}).items():
+        if fase != 'total':
+            resultado[f"  {fase}"] = ms
+    print(json.dumps(resultado))
+
+
+def _ejecutar(raiz, importtime=False):
+    entorno = dict(os.environ)
+    # DB propia para no tocar la de desarrollo; los prints de create_app se descartan
+    entorno.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'arranque.db')}")
+    comando = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [os.path.abspath(__file__), '--medir', raiz]
+    proceso = subprocess.run(comando, capture_output=True, text=True, cwd=raiz, env=entorno, check=True)
+    return json.loads(proceso.stdout.strip().splitlines()[-1]), proceso.stderr
+
+
+def imports_caros(stderr, cantidad=12):
+    """
+    Paquetes de primer nivel con mayor tiempo acumulado de import (incluye sus
+    dependencias, así que un paquete puede contener a otro de la lista).
+    """
+    paquetes = {}
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or '|' not in linea:
+            continue
+        _, acumulado, nombre = linea.split('|')
+        nombre = nombre.strip()
+        if acumulado.strip().isdigit() and '.' not in nombre:
+            paquetes[nombre] = max(paquetes.get(nombre, 0), int(acumulado) / 1000)
+    return sorted(paquetes.items(), key=lambda p: -p[1])[:cantidad]
+
+
+def informe(titulo, raiz, repeticiones):
+    mediciones = [_ejecutar(raiz)[0] for _ in range(repeticiones)]
+    _, stderr = _ejecutar(raiz, importtime=True)
+
+    print(f"\n== {titulo} (mediana de {repeticiones}) ==")
+    for fase in mediciones[0]:
+        if fase != 'pesados':
+            print(f"{fase:<32} {statistics.median(m[fase] for m in mediciones):>8.0f} ms")
+    print(f"librerías pesadas cargadas: {', '.join(mediciones[0]['pesados']) or 'ninguna'}")
+    print("imports más caros (acumulado):")
+    for nombre, ms in imports_caros(stderr):
+        print(f"  {nombre:<30} {ms:>8.0f} ms")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--medir':
+        medir(sys.argv[2])
+        sys.exit(0)
+
+    argumentos = sys.argv[1:]
+    ref = None
+    if '--ref' in argumentos:
+        posicion = argumentos.index('--ref')
+        ref = argumentos[posicion + 1]
+        del argumentos[posicion:posicion + 2]
+    repeticiones = int(argumentos[0]) if argumentos else 5
+
+    if ref:
+        worktree = tempfile.mkdtemp(prefix='arranque-')
+        subprocess.run(['git', '-C', RAIZ, 'worktree', 'add', '--detach', worktree, ref],
+                       check=True, capture_output=True)
+        try:
+            informe(ref, worktree, repeticiones)
+        finally:
+            subprocess.run(['git', '-C', RAIZ, 'worktree', 'remove', '--force', worktree], capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+    informe('árbol actual', RAIZ, repeticiones)
@@ -0,0 +1,55 @@
+# benchmarks/bench_artefactos.py - tamaño y tiempo de carga: JSON records vs Parquet
+#
+# Uso: python benchmarks/bench_artefactos.py [filas...]
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.artefactos import serializar_tabla, deserializar_tabla, PARQUET_DISPONIBLE
+
+MESES = pd.date_range('2020-01-01', periods=60, freq='MS').strftime('%B %Y')
+
+
+def tabla_productos(filas, seed=0):
+    """Filas producto-mes con la forma de ventas_por_producto."""
+    rng = np.random.default_rng(seed)
+    productos = max(1, filas // len(MESES))
+    return pd.DataFrame({
+        'Nombre Producto': [f"producto {i % productos}" for i in range(filas)],
+        'Mes': [MESES[i // productos % len(MESES)] for i in range(filas)],
+        'Ventas': rng.uniform(0, 10000, filas).round(2),
+    })
+
+
+def cronometrar(funcion, repeticiones=5):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+if __name__ == '__main__':
+    filas_lista = [int(f) for f in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    formatos = ['json+zlib'] + (['parquet'] if PARQUET_DISPONIBLE else [])
+
+    print(f"{'filas':>8} {'formato':>12} {'tamaño':>12} {'carga':>10}")
+    for filas in filas_lista:
+        df = tabla_productos(filas)
+
+        # Referencia: lo que se hacía antes (to_json records + pd.read_json)
+        texto = df.to_json(orient='records').encode('utf-8')
+        carga = cronometrar(lambda: pd.read_json(io.BytesIO(texto)))
+        print(f"{filas:>8} {'json':>12} {len(texto):>11,}B {carga:>8.1f}ms")
+
+        for formato in formatos:
+            datos, formato_real = serializar_tabla(df, formato=formato.split('+')[0])
+            carga = cronometrar(lambda: deserializar_tabla(datos, formato_real))
+            print(f"{filas:>8} {formato_real:>12} {len(datos):>11,}B {carga:>8.1f}ms")
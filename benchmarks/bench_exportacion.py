@@ -0,0 +1,84 @@
+# benchmarks/bench_exportacion.py - tiempo, memoria y tamaño del inventario exportado
+#
+# Compara la exportación anterior (df.to_excel a un BytesIO con openpyxl) con
+# exportacion.Exportador en cada formato. Cada variante corre en un proceso propio
+# para medir su pico de memoria por separado; los datos se generan antes de medir.
+#
+# Uso: python benchmarks/bench_exportacion.py [filas]
+import io
+import os
+import sys
+import time
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.exportacion import Exportador, formatos_disponibles
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def inventario(filas, seed=0):
+    # Mismas columnas que un inventario ya enriquecido por preparar_datos
+    rng = np.random.default_rng(seed)
+    ventas = rng.uniform(0, 500, filas)
+    ventas[rng.random(filas) < 0.05] = np.nan
+    return pd.DataFrame({
+        'Fecha': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, filas), unit='D'),
+        'Nombre Producto': [f"producto {i}" for i in rng.integers(0, 500, filas)],
+        'Ventas': ventas,
+        'Gastos(compras)': rng.uniform(0, 300, filas),
+        'Stock Final': rng.integers(0, 1000, filas),
+        'Stock mínimo': rng.uniform(10, 200, filas),
+        'Stock máximo': rng.uniform(200, 400, filas),
+        'Mes': rng.choice(['Enero', 'Febrero', 'Marzo'], filas),
+    })
+
+
+def medir(variante, filas):
+    df = inventario(filas)
+    rss_inicio = rss_mb()
+
+    inicio = time.perf_counter()
+    if variante == 'anterior':
+        archivo = io.BytesIO()
+        df.to_excel(archivo, index=False)
+        tamano = archivo.tell()
+    else:
+        exportador = Exportador(variante)
+        # Por bloques, como en el modo streaming
+        for inicio_bloque in range(0, len(df), 5000):
+            exportador.agregar(df.iloc[inicio_bloque:inicio_bloque + 5000])
+        archivo = exportador.cerrar()
+        archivo.seek(0, os.SEEK_END)
+        tamano = archivo.tell()
+    segundos = time.perf_counter() - inicio
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{variante:>9} {segundos:>9.2f} {pico - rss_inicio:>16.0f} {tamano / 1024 / 1024:>11.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--variante':
+        medir(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"{filas} filas")
+    print(f"{'variante':>9} {'segundos':>9} {'pico extra MB':>16} {'tamaño MB':>11}")
+    sys.stdout.flush()
+    for variante in ['anterior'] + formatos_disponibles():
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--variante', variante, str(filas)], check=True)
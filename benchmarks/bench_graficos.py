@@ -0,0 +1,48 @@
+# benchmarks/bench_graficos.py - tiempo de dibujo de gráficos según productos y procesos
+#
+# Con más de un proceso el tiempo incluye crear y cerrar el pool (uno por lote).
+#
+# Uso: python benchmarks/bench_graficos.py [productos...]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.graficos import renderizar_graficos
+
+
+def datos_graficos(num_productos, seed=0):
+    rng = np.random.default_rng(seed)
+    nombres = [f"producto {i}" for i in range(num_productos)]
+    df_stock = pd.DataFrame({
+        'Nombre Producto': nombres,
+        'Stock mínimo': rng.uniform(10, 200, num_productos),
+        'Stock máximo': rng.uniform(200, 400, num_productos),
+    })
+    df_ventas = pd.DataFrame({
+        'Nombre Producto': nombres,
+        'Ventas': rng.uniform(0, 10000, num_productos),
+    })
+    return df_stock, df_ventas
+
+
+if __name__ == '__main__':
+    productos = [int(p) for p in sys.argv[1:]] or [60, 300, 600]
+    cpus = os.cpu_count() or 1
+    workers = sorted({1, 2, 4, cpus})
+
+    print(f"CPUs disponibles: {cpus}")
+    print(f"{'productos':>10} {'gráficos':>9} " + " ".join(f"{f'w={w}':>9}" for w in workers))
+    for num_productos in productos:
+        df_stock, df_ventas = datos_graficos(num_productos)
+        tiempos = []
+        for w in workers:
+            inicio = time.perf_counter()
+            graficos = renderizar_graficos(df_stock, df_ventas, workers=w)
+            tiempos.append(time.perf_counter() - inicio)
+        total = len(graficos['stock']) + len(graficos['ventas'])
+        print(f"{num_productos:>10} {total:>9} " + " ".join(f"{t:>8.2f}s" for t in tiempos))
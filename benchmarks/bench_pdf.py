@@ -0,0 +1,75 @@
+# benchmarks/bench_pdf.py - tiempo de la sección de gráficos del PDF según cantidad de gráficos
+#
+# Compara la versión anterior (descarga en serie, archivo en /tmp y fpdf.image) con
+# obtener_graficos + agregar_graficos (descarga en paralelo e imágenes en memoria).
+# La latencia de S3 se simula con una espera por descarga.
+#
+# Uso: python benchmarks/bench_pdf.py [latencia_ms] [graficos...]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+from app import pdf as modulo_pdf
+from app import graficos_sesion
+from app.graficos import renderizar_grafico_ventas
+
+
+def pngs(cantidad):
+    rng = np.random.default_rng(0)
+    png = renderizar_grafico_ventas(pd.DataFrame({
+        'Nombre Producto': [f"producto {i}" for i in range(6)],
+        'Ventas': rng.uniform(0, 1000, 6),
+    }), 1)
+    return {f"grafico_ventas_{i + 1}.png": png for i in range(cantidad)}
+
+
+def anterior(almacen, leer):
+    pdf = FPDF()
+    pdf.add_page()
+    for i, nombre in enumerate(almacen):
+        contenido = leer(None, None, nombre)
+        temp_path = f"/tmp/{nombre}"
+        with open(temp_path, 'wb') as f:
+            f.write(contenido)
+        pdf.image(temp_path, x=10, y=None, w=180)
+        pdf.ln(85)
+        os.remove(temp_path)
+        if i < len(almacen) - 1:
+            pdf.add_page()
+    return pdf.output(dest='S')
+
+
+def actual(almacen):
+    pdf = modulo_pdf.ReportePDF()
+    pdf.add_page()
+    modulo_pdf.agregar_graficos(pdf, graficos_sesion.obtener_graficos(None, None, list(almacen)))
+    return pdf.output(dest='S')
+
+
+if __name__ == '__main__':
+    latencia = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.05
+    cantidades = [int(c) for c in sys.argv[2:]] or [6, 24, 60]
+
+    print(f"Latencia simulada por descarga: {latencia * 1000:.0f} ms")
+    print(f"{'gráficos':>9} {'anterior ms':>12} {'actual ms':>10} {'speedup':>8}")
+    for cantidad in cantidades:
+        almacen = pngs(cantidad)
+
+        def leer(bucket_name, session_id, nombre):
+            time.sleep(latencia)
+            return almacen[nombre]
+
+        graficos_sesion._grafico_guardado = leer
+        inicio = time.perf_counter()
+        anterior(almacen, leer)
+        t_anterior = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        actual(almacen)
+        t_actual = (time.perf_counter() - inicio) * 1000
+        print(f"{cantidad:>9} {t_anterior:>12.0f} {t_actual:>10.0f} {t_anterior / t_actual:>7.1f}x")
@@ -0,0 +1,87 @@
+# benchmarks/bench_pdf_tablas.py - tiempo de las tablas del PDF según cantidad de filas
+#
+# Compara las tablas con iterrows + format_currency por fila (versión anterior) con
+# construir_pdf (columnas de texto precalculadas), sin límite de filas y con el
+# límite por defecto (PDF_MAX_FILAS, top N + fila "Otros").
+#
+# Uso: python benchmarks/bench_pdf_tablas.py [filas...]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+from app import pdf as modulo_pdf
+from app.pdf import construir_pdf, format_currency
+
+
+def sesion_de_prueba(filas, seed=0):
+    rng = np.random.default_rng(seed)
+    meses = pd.date_range('2020-01-01', periods=24, freq='MS').strftime('%B %Y')
+    productos = [f"producto {i % max(1, filas // len(meses))}" for i in range(filas)]
+    mes = [meses[i % len(meses)] for i in range(filas)]
+    return {
+        'resumen_ventas': {'total_ventas': 1000.0, 'producto_mas_vendido': 'a', 'producto_menos_vendido': 'b',
+                           'alerta_presupuesto': '', 'generar_graficos': False},
+        'ventas_por_producto': pd.DataFrame({'Nombre Producto': productos, 'Mes': mes,
+                                             'Ventas': rng.uniform(0, 1e6, filas)}),
+        'gastos_por_mes': pd.DataFrame({'Mes': list(meses), 'Gastos(compras)': rng.uniform(0, 1e6, len(meses))}),
+        'resumen_productos': pd.DataFrame({
+            'Nombre Producto': productos, 'Mes': mes,
+            'Stock_Final_Ultimo_Dia': rng.integers(0, 1000, filas).astype(float),
+            'Stock_Minimo_Promedio': rng.uniform(0, 100, filas),
+            'Stock_Maximo_Promedio': rng.uniform(100, 200, filas),
+        }),
+        'nombres_graficos': {'stock': [], 'ventas': []},
+    }
+
+
+def anterior(sesion):
+    """Tablas como se dibujaban antes: iterrows y una llamada a format_currency por fila."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font("Arial", '', 10)
+    for index, row in sesion['ventas_por_producto'].iterrows():
+        pdf.cell(60, 10, str(row.get('Nombre Producto', 'N/A')), 1, 0, 'C')
+        pdf.cell(60, 10, str(row.get('Mes', 'N/A')), 1, 0, 'C')
+        pdf.cell(60, 10, str(format_currency(row.get('Ventas', 0))), 1, 1, 'C')
+    for index, row in sesion['gastos_por_mes'].iterrows():
+        pdf.cell(95, 10, str(row.get('Mes', 'N/A')), 1, 0, 'C')
+        pdf.cell(95, 10, str(format_currency(row.get('Gastos(compras)', 0))), 1, 1, 'C')
+    for index, row in sesion['resumen_productos'].iterrows():
+        pdf.cell(40, 10, str(row.get('Nombre Producto', 'N/A')), 1, 0, 'C')
+        pdf.cell(30, 10, str(row.get('Mes', 'N/A')), 1, 0, 'C')
+        pdf.cell(40, 10, str(int(row.get('Stock_Final_Ultimo_Dia', 0))), 1, 0, 'C')
+        pdf.cell(40, 10, f"{row.get('Stock_Minimo_Promedio', 0):.2f}", 1, 0, 'C')
+        pdf.cell(40, 10, f"{row.get('Stock_Maximo_Promedio', 0):.2f}", 1, 1, 'C')
+    return pdf.output(dest='S')
+
+
+def actual(sesion, max_filas):
+    modulo_pdf.PDF_MAX_FILAS = max_filas
+    return construir_pdf(sesion, 'bench', None).output(dest='S')
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return (time.perf_counter() - inicio) * 1000, len(resultado)
+
+
+if __name__ == '__main__':
+    filas_lista = [int(f) for f in sys.argv[1:]] or [100, 10_000, 100_000]
+    limite = modulo_pdf.PDF_MAX_FILAS
+
+    print(f"{'filas':>8} {'anterior ms':>12} {'sin límite ms':>14} {f'top {limite} ms':>12} {'páginas top':>12}")
+    for filas in filas_lista:
+        sesion = sesion_de_prueba(filas)
+        t_anterior, _ = cronometrar(lambda: anterior(sesion))
+        t_completo, _ = cronometrar(lambda: actual(sesion, 0))
+        t_limitado, _ = cronometrar(lambda: actual(sesion, limite))
+        paginas = construir_pdf(sesion, 'bench', None).page_no()
+        print(f"{filas:>8} {t_anterior:>12.0f} {t_completo:>14.0f} {t_limitado:>12.0f} {paginas:>12}")
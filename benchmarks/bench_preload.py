@@ -0,0 +1,101 @@
+# benchmarks/bench_preload.py - memoria por worker de gunicorn con y sin preload
+#
+# Levanta gunicorn con gunicorn.conf.py y N workers. Para comparar workers en el mismo
+# estado, sin preload cada worker importa lo mismo que el maestro precarga
+# (app.precargar_modulos), como le pasa a un worker tras su primer job o PDF.
+# Memoria privada (USS) y proporcional (PSS) de /proc/<pid>/smaps_rollup (Linux), al
+# levantar y después de atender requests (las escrituras copian páginas compartidas).
+#
+# Uso: python benchmarks/bench_preload.py [workers] [requests]
+import os
+import sys
+import time
+import socket
+import signal
+import tempfile
+import subprocess
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_EXTRA = """
+exec(open({config!r}).read())
+_post_worker_init = post_worker_init
+
+
+def post_worker_init(worker):
+    _post_worker_init(worker)
+    if not preload_app:
+        from app import precargar_modulos
+        precargar_modulos()
+    open(os.path.join({marcas!r}, str(worker.pid)), 'w').close()
+"""
+
+
+def memoria_mb(pid):
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[1].isdigit():
+                valores[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    privada = valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0)
+    return privada, valores.get('Pss', 0), valores.get('Rss', 0)
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _informar(nombre, maestro, marcas, workers):
+    por_worker = [memoria_mb(int(pid)) for pid in os.listdir(marcas)]
+    privada = sum(m[0] for m in por_worker) / workers
+    pss = sum(m[1] for m in por_worker) / workers
+    rss = sum(m[2] for m in por_worker) / workers
+    total = memoria_mb(maestro.pid)[1] + sum(m[1] for m in por_worker)
+    print(f"{nombre:>26} {privada:>13.0f} {pss:>10.0f} {rss:>10.0f} {total:>14.0f}")
+
+
+def medir(preload, workers, requests):
+    directorio = tempfile.mkdtemp(prefix='preload-')
+    marcas = os.path.join(directorio, 'marcas')
+    os.makedirs(marcas)
+    config = os.path.join(directorio, 'gunicorn_bench.conf.py')
+    with open(config, 'w') as f:
+        f.write(CONFIG_EXTRA.format(config=os.path.join(RAIZ, 'gunicorn.conf.py'), marcas=marcas))
+
+    entorno = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0', WEB_CONCURRENCY=str(workers),
+                   DATABASE_URL=f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+    puerto = puerto_libre()
+    maestro = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', config, '--bind', f"127.0.0.1:{puerto}", 'wsgi:app'],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        limite = time.time() + 120
+        while len(os.listdir(marcas)) < workers:
+            if time.time() > limite or maestro.poll() is not None:
+                raise RuntimeError("gunicorn no levantó los workers")
+            time.sleep(0.2)
+        time.sleep(1)
+
+        nombre = 'preload' if preload else 'sin preload'
+        _informar(nombre, maestro, marcas, workers)
+        for _ in range(requests):
+            for ruta in ('/', '/login', '/register'):
+                urllib.request.urlopen(f"http://127.0.0.1:{puerto}{ruta}").read()
+        _informar(f"{nombre}, {requests * 3} requests", maestro, marcas, workers)
+    finally:
+        maestro.send_signal(signal.SIGTERM)
+        maestro.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"{workers} workers, promedios por worker en MB")
+    print(f"{'modo':>26} {'privada (USS)':>13} {'PSS':>10} {'RSS':>10} {'PSS total app':>14}")
+    for preload in (False, True):
+        medir(preload, workers, requests)
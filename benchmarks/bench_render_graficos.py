@@ -0,0 +1,115 @@
+# benchmarks/bench_render_graficos.py - gráficos por segundo y memoria residente al dibujar en serie
+#
+# Compara la versión anterior (pyplot, una figura nueva por gráfico y pandas .plot para
+# el stock) con graficos.py (API orientada a objetos de Agg, una figura reutilizada).
+# Cada versión corre en un proceso propio para medir su memoria por separado.
+#
+# Uso: python benchmarks/bench_render_graficos.py [graficos]
+import io
+import os
+import sys
+import time
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+# Ambas versiones importan lo mismo, así la memoria inicial es comparable
+from app.graficos import renderizar_grafico_stock, renderizar_grafico_ventas
+
+
+def rss_mb():
+    # Memoria residente actual (Linux); en otros sistemas, el pico
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def grupos(cantidad, seed=0):
+    rng = np.random.default_rng(seed)
+    resultado = []
+    for i in range(cantidad):
+        nombres = [f"producto {i * 6 + j}" for j in range(6)]
+        resultado.append(pd.DataFrame({
+            'Nombre Producto': nombres,
+            'Stock mínimo': rng.uniform(10, 200, 6),
+            'Stock máximo': rng.uniform(200, 400, 6),
+            'Ventas': rng.uniform(0, 10000, 6),
+        }))
+    return resultado
+
+
+def anterior_stock(df_chunk, parte):
+    import matplotlib.pyplot as plt
+    df_chunk.set_index('Nombre Producto').plot(kind='bar', stacked=True)
+    plt.title(f'Stock Mínimo y Máximo Promedio por Producto (Parte {parte})')
+    plt.ylabel('Cantidad')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    img_buffer = io.BytesIO()
+    plt.savefig(img_buffer, format='png')
+    plt.close()
+    return img_buffer.getvalue()
+
+
+def anterior_ventas(df_chunk, parte):
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(10, 6))
+    plt.bar(df_chunk['Nombre Producto'], df_chunk['Ventas'], color='skyblue')
+    plt.title(f'Ventas Totales por Producto (Parte {parte})')
+    plt.ylabel('Ventas')
+    plt.xlabel('Producto')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    img_buffer = io.BytesIO()
+    plt.savefig(img_buffer, format='png')
+    plt.close()
+    return img_buffer.getvalue()
+
+
+def medir(version, cantidad):
+    if version == 'anterior':
+        import matplotlib.pyplot as plt
+        plt.switch_backend('Agg')
+        stock, ventas = anterior_stock, anterior_ventas
+    else:
+        stock, ventas = renderizar_grafico_stock, renderizar_grafico_ventas
+
+    datos = grupos(cantidad // 2 + 1)
+    # El primer gráfico de cada tipo carga fuentes y crea la figura
+    stock(datos[0][['Nombre Producto', 'Stock mínimo', 'Stock máximo']], 0)
+    ventas(datos[0], 0)
+    rss_inicio = rss_mb()
+
+    inicio = time.perf_counter()
+    for i in range(cantidad):
+        df = datos[i // 2]
+        if i % 2:
+            ventas(df, i)
+        else:
+            stock(df[['Nombre Producto', 'Stock mínimo', 'Stock máximo']], i)
+    segundos = time.perf_counter() - inicio
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{version:>9} {cantidad / segundos:>13.1f} {rss_inicio:>14.0f} {rss_mb():>11.0f} {pico:>9.0f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--version':
+        medir(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"{cantidad} gráficos (mitad stock, mitad ventas)")
+    print(f"{'versión':>9} {'gráficos/seg':>13} {'RSS inicio MB':>14} {'RSS fin MB':>11} {'pico MB':>9}")
+    sys.stdout.flush()
+    for version in ('anterior', 'actual'):
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--version', version, str(cantidad)], check=True)
@@ -0,0 +1,53 @@
+# benchmarks/bench_s3_cliente.py - latencia por llamada: cliente nuevo vs cliente compartido
+#
+# Uso: python benchmarks/bench_s3_cliente.py [key_existente_en_S3_BUCKET_NAME]
+# Sin key solo se mide el costo de obtener el cliente (sin red).
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import s3_utils
+from io import BytesIO
+
+REPETICIONES = int(os.getenv('BENCH_REPETICIONES', '50'))
+
+
+def medir(funcion, repeticiones=REPETICIONES):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), max(tiempos)
+
+
+def reportar(nombre, antes, despues):
+    print(f"{nombre:<28} antes: {antes[0]:8.2f} ms (máx {antes[1]:8.2f})   "
+          f"después: {despues[0]:8.2f} ms (máx {despues[1]:8.2f})   x{antes[0] / max(despues[0], 1e-6):.1f}")
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+    # "Antes": un cliente nuevo por llamada, como hacía get_s3_client()
+    antes = medir(s3_utils._crear_s3_client)
+    s3_utils.get_s3_client()
+    despues = medir(s3_utils.get_s3_client)
+    reportar("obtener cliente", antes, despues)
+
+    bucket = os.getenv('S3_BUCKET_NAME')
+    key = sys.argv[1] if len(sys.argv) > 1 else None
+    if bucket and key:
+        def descargar(cliente):
+            buffer = BytesIO()
+            cliente.download_fileobj(bucket, key, buffer)
+
+        antes = medir(lambda: descargar(s3_utils._crear_s3_client()))
+        despues = medir(lambda: descargar(s3_utils.get_s3_client()))
+        reportar(f"descargar {key}", antes, despues)
+    else:
+        print("Define S3_BUCKET_NAME y pasa una key para medir también la descarga real.")
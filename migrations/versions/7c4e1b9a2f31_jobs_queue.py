@@ -0,0 +1,40 @@
+"""jobs queue table
+
+Revision ID: 7c4e1b9a2f31
+Revises: 2d2ec262f424
+Create Date: 2025-10-02 18:12:05.114207
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1b9a2f31'
+down_revision = '2d2ec262f424'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cola de jobs de procesamiento (la propia DB hace de broker)
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.String(length=36), primary_key=True, nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('session_id', sa.String(length=36), nullable=False),
+        sa.Column('bucket_name', sa.String(length=255), nullable=True),
+        sa.Column('ruta_archivo', sa.String(length=512), nullable=True),
+        sa.Column('parametros', sa.Text(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='fk_jobs_user_id_users'),
+    )
+    op.create_index('ix_jobs_estado', 'jobs', ['estado'])
+    op.create_index('ix_jobs_user_id', 'jobs', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_user_id', table_name='jobs')
+    op.drop_index('ix_jobs_estado', table_name='jobs')
+    op.drop_table('jobs')
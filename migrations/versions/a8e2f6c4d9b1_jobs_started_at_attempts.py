@@ -0,0 +1,28 @@
+"""start time and attempts on jobs
+
+Revision ID: a8e2f6c4d9b1
+Revises: f3b9d2c7a1e8
+Create Date: 2025-10-13 15:02:33.718240
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a8e2f6c4d9b1'
+down_revision = 'f3b9d2c7a1e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cuándo se reclamó el job y cuántas veces: un job en proceso por más de
+    # JOBS_TIMEOUT quedó huérfano (worker reiniciado) y se reencola o se marca con error
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('intentos', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('intentos')
+        batch_op.drop_column('started_at')
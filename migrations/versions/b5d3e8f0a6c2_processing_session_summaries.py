@@ -0,0 +1,75 @@
+"""processing sessions and per-product/per-month summaries
+
+Revision ID: b5d3e8f0a6c2
+Revises: 7c4e1b9a2f31
+Create Date: 2025-10-06 11:47:52.380914
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b5d3e8f0a6c2'
+down_revision = '7c4e1b9a2f31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Resumen de cada procesamiento (lo que antes solo vivía en S3)
+    op.create_table(
+        'processing_sessions',
+        sa.Column('id', sa.String(length=36), primary_key=True, nullable=False),
+        sa.Column('bucket_name', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('budget', sa.Float(), nullable=False),
+        sa.Column('total_sales', sa.Float(), nullable=False),
+        sa.Column('total_monthly_sales', sa.Float(), nullable=False),
+        sa.Column('total_expenses', sa.Float(), nullable=False),
+        sa.Column('final_balance', sa.Float(), nullable=False),
+        sa.Column('best_seller', sa.String(length=255), nullable=True),
+        sa.Column('worst_seller', sa.String(length=255), nullable=True),
+        sa.Column('budget_alert', sa.String(length=255), nullable=True),
+        sa.Column('charts_enabled', sa.Boolean(), nullable=False),
+        sa.Column('chart_names', sa.Text(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='fk_processing_sessions_user_id_users'),
+    )
+    op.create_index('ix_processing_sessions_user_id_created_at', 'processing_sessions',
+                    ['user_id', 'created_at'])
+
+    # Ventas y stock por producto y mes
+    op.create_table(
+        'product_month_summaries',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('product', sa.String(length=255), nullable=False),
+        sa.Column('month', sa.String(length=20), nullable=False),
+        sa.Column('sales', sa.Float(), nullable=True),
+        sa.Column('final_stock', sa.Float(), nullable=True),
+        sa.Column('avg_min_stock', sa.Float(), nullable=True),
+        sa.Column('avg_max_stock', sa.Float(), nullable=True),
+        sa.Column('session_id', sa.String(length=36), nullable=False),
+        sa.ForeignKeyConstraint(['session_id'], ['processing_sessions.id'],
+                                name='fk_product_month_summaries_session_id', ondelete='CASCADE'),
+    )
+    op.create_index('ix_product_month_summaries_session_id', 'product_month_summaries', ['session_id'])
+
+    # Gastos por mes
+    op.create_table(
+        'monthly_expenses',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('month', sa.String(length=20), nullable=False),
+        sa.Column('expenses', sa.Float(), nullable=False),
+        sa.Column('session_id', sa.String(length=36), nullable=False),
+        sa.ForeignKeyConstraint(['session_id'], ['processing_sessions.id'],
+                                name='fk_monthly_expenses_session_id', ondelete='CASCADE'),
+    )
+    op.create_index('ix_monthly_expenses_session_id', 'monthly_expenses', ['session_id'])
+
+
+def downgrade():
+    op.drop_index('ix_monthly_expenses_session_id', table_name='monthly_expenses')
+    op.drop_table('monthly_expenses')
+    op.drop_index('ix_product_month_summaries_session_id', table_name='product_month_summaries')
+    op.drop_table('product_month_summaries')
+    op.drop_index('ix_processing_sessions_user_id_created_at', table_name='processing_sessions')
+    op.drop_table('processing_sessions')
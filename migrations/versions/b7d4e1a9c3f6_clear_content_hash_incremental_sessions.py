@@ -0,0 +1,29 @@
+"""clear the content hash of incremental sessions
+
+Revision ID: b7d4e1a9c3f6
+Revises: a8e2f6c4d9b1
+Create Date: 2025-10-14 10:27:09.581364
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e1a9c3f6'
+down_revision = 'a8e2f6c4d9b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las sesiones incrementales guardaban el hash del archivo completo aunque solo
+    # tienen las filas nuevas: una carga completa del mismo archivo las reutilizaba.
+    # Se reconocen por el job que las creó (parametros con sesion_base no nulo)
+    op.execute(sa.text(
+        "UPDATE processing_sessions SET content_hash = NULL WHERE id IN "
+        "(SELECT session_id FROM jobs WHERE parametros LIKE '%\"sesion_base\": \"%')"
+    ))
+
+
+def downgrade():
+    # Los hashes borrados no se pueden recuperar (solo se pierde la reutilización)
+    pass
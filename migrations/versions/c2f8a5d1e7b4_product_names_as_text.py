@@ -0,0 +1,45 @@
+"""store product names as text
+
+Revision ID: c2f8a5d1e7b4
+Revises: b7d4e1a9c3f6
+Create Date: 2025-10-15 09:12:44.207915
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c2f8a5d1e7b4'
+down_revision = 'b7d4e1a9c3f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los nombres de producto vienen de la hoja del usuario sin truncar; con String(255)
+    # un nombre largo fallaba en Postgres después de subir los artefactos a S3
+    with op.batch_alter_table('product_month_summaries', schema=None) as batch_op:
+        batch_op.alter_column('product', existing_type=sa.String(length=255),
+                              type_=sa.Text(), existing_nullable=False)
+
+    with op.batch_alter_table('processing_sessions', schema=None) as batch_op:
+        batch_op.alter_column('best_seller', existing_type=sa.String(length=255),
+                              type_=sa.Text(), existing_nullable=True)
+        batch_op.alter_column('worst_seller', existing_type=sa.String(length=255),
+                              type_=sa.Text(), existing_nullable=True)
+
+
+def downgrade():
+    # Recorta los nombres largos para que entren de nuevo en String(255)
+    op.execute(sa.text("UPDATE product_month_summaries SET product = substr(product, 1, 255)"))
+    op.execute(sa.text("UPDATE processing_sessions SET best_seller = substr(best_seller, 1, 255), "
+                       "worst_seller = substr(worst_seller, 1, 255)"))
+
+    with op.batch_alter_table('processing_sessions', schema=None) as batch_op:
+        batch_op.alter_column('worst_seller', existing_type=sa.Text(),
+                              type_=sa.String(length=255), existing_nullable=True)
+        batch_op.alter_column('best_seller', existing_type=sa.Text(),
+                              type_=sa.String(length=255), existing_nullable=True)
+
+    with op.batch_alter_table('product_month_summaries', schema=None) as batch_op:
+        batch_op.alter_column('product', existing_type=sa.Text(),
+                              type_=sa.String(length=255), existing_nullable=False)
@@ -0,0 +1,28 @@
+"""content hash on processing sessions
+
+Revision ID: d1a7c3e9b4f5
+Revises: b5d3e8f0a6c2
+Create Date: 2025-10-08 16:05:21.553170
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd1a7c3e9b4f5'
+down_revision = 'b5d3e8f0a6c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Hash del archivo subido, para reconocer cargas repetidas del mismo Excel
+    with op.batch_alter_table('processing_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_processing_sessions_user_id_content_hash', 'processing_sessions',
+                    ['user_id', 'content_hash'])
+
+
+def downgrade():
+    op.drop_index('ix_processing_sessions_user_id_content_hash', table_name='processing_sessions')
+    with op.batch_alter_table('processing_sessions', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
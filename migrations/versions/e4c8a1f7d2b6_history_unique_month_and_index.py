@@ -0,0 +1,35 @@
+"""unique month per user on history and index for the history page
+
+Revision ID: e4c8a1f7d2b6
+Revises: d1a7c3e9b4f5
+Create Date: 2025-10-10 09:42:17.204381
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e4c8a1f7d2b6'
+down_revision = 'd1a7c3e9b4f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # El read-then-write anterior podía duplicar el mes con cargas simultáneas: se deja
+    # la fila más reciente de cada (user_id, year, month) antes de crear la restricción
+    op.execute(
+        "DELETE FROM history WHERE id NOT IN "
+        "(SELECT MAX(id) FROM history GROUP BY user_id, year, month)"
+    )
+    # Un saldo por usuario y mes; es el objetivo del INSERT ... ON CONFLICT del pipeline
+    with op.batch_alter_table('history', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_history_user_id_year_month', ['user_id', 'year', 'month'])
+    # Página de historial: filtra por usuario y ordena por fecha descendente
+    op.create_index('ix_history_user_id_date_recorded', 'history',
+                    ['user_id', sa.text('date_recorded DESC')])
+
+
+def downgrade():
+    op.drop_index('ix_history_user_id_date_recorded', table_name='history')
+    with op.batch_alter_table('history', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_history_user_id_year_month', type_='unique')
@@ -0,0 +1,28 @@
+"""export format and chart mode on processing sessions
+
+Revision ID: f3b9d2c7a1e8
+Revises: e4c8a1f7d2b6
+Create Date: 2025-10-13 11:18:46.390527
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d2c7a1e8'
+down_revision = 'e4c8a1f7d2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Formato del inventario exportado y modo de los gráficos: una carga repetida solo
+    # reutiliza la sesión si pide lo mismo (las sesiones anteriores quedan en NULL)
+    with op.batch_alter_table('processing_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('export_format', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('chart_mode', sa.String(length=10), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('processing_sessions', schema=None) as batch_op:
+        batch_op.drop_column('chart_mode')
+        batch_op.drop_column('export_format')
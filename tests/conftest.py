@@ -0,0 +1,41 @@
+# tests/conftest.py - permite importar el paquete app desde la raíz del repo
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+BUCKET = 'inventariate-test'
+
+
+@pytest.fixture
+def app(monkeypatch):
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    monkeypatch.setenv('DATABASE_URL', 'sqlite://')
+    from app import create_app, db
+    from app.s3_utils import get_s3_client, reset_s3_client
+
+    with moto.mock_aws():
+        reset_s3_client()
+        get_s3_client().create_bucket(Bucket=BUCKET)
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+        reset_s3_client()
+
+
+@pytest.fixture
+def user_id(app):
+    from app import db
+    from app.models import User
+
+    user = User(username='prueba')
+    user.set_password('clave')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
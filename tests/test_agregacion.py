@@ -0,0 +1,174 @@
+# tests/test_agregacion.py - paridad del motor factorizado con los groupby del procesar original
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app.agregacion import preparar_datos, agregar_parcial, combinar_parciales, finalizar_agregados, agregar_inventario
+from app.ingesta import agregar_excel_streaming
+
+TABLAS = ['ventas_por_nombre', 'ventas_por_producto', 'gastos_por_mes', 'resumen_productos', 'stock_por_nombre']
+
+
+def referencia(df):
+    """
+    Las mismas tablas calculadas como en el procesar original (un groupby por tabla).
+    El original ordenaba con el quicksort por defecto, que no fija el orden de las
+    fechas repetidas; aquí se usa el orden estable (gana la última fila del archivo).
+    """
+    df_sorted = df.sort_values('Fecha', kind='stable')
+    return {
+        'total_ventas': float(df['Ventas'].sum()),
+        'ventas_por_nombre': df.groupby('Nombre Producto')['Ventas'].sum().reset_index(),
+        'ventas_por_producto': df.groupby(['Nombre Producto', 'Mes'])['Ventas'].sum().reset_index(),
+        'gastos_por_mes': df.groupby('Mes')['Gastos(compras)'].sum().reset_index(),
+        'resumen_productos': df_sorted.groupby(['Nombre Producto', 'Mes']).agg(
+            Stock_Final_Ultimo_Dia=('Stock Final', 'last'),
+            Stock_Minimo_Promedio=('Stock mínimo', 'mean'),
+            Stock_Maximo_Promedio=('Stock máximo', 'mean')
+        ).reset_index(),
+        'stock_por_nombre': df_sorted.groupby('Nombre Producto').agg({
+            'Stock mínimo': 'mean',
+            'Stock máximo': 'mean'
+        }).reset_index(),
+    }
+
+
+def comparar(esperado, obtenido):
+    assert obtenido['total_ventas'] == pytest.approx(esperado['total_ventas'])
+    for nombre in TABLAS:
+        pd.testing.assert_frame_equal(esperado[nombre].reset_index(drop=True),
+                                      obtenido[nombre].reset_index(drop=True),
+                                      check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+def inventario_crudo(filas=2_000, productos=40, seed=0, fechas_nulas=True):
+    """
+    Filas crudas con nulos en ventas, stock, tiempo, fechas y nombres, fechas
+    repetidas y un producto que solo tiene valores nulos.
+    """
+    rng = np.random.default_rng(seed)
+    nombres = np.array([f"  Producto {i} " for i in range(productos)], dtype=object)
+    df = pd.DataFrame({
+        'Fecha': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 400, filas), unit='D'),
+        'Nombre Producto': nombres[rng.integers(0, productos, filas)],
+        'Ventas': rng.uniform(0, 1000, filas).round(2),
+        'Gastos(compras)': rng.uniform(0, 800, filas).round(2),
+        'Ventas Totales': rng.integers(1, 500, filas).astype(float),
+        'Tiempo': rng.integers(1, 30, filas).astype(float),
+        'Reposición (días)': rng.integers(1, 15, filas).astype(float),
+        'Stock Final': rng.integers(0, 1000, filas).astype(float),
+    })
+    for columna in ('Ventas', 'Stock Final', 'Tiempo', 'Gastos(compras)'):
+        df.loc[rng.random(filas) < 0.05, columna] = np.nan
+    df.loc[rng.random(filas) < 0.01, 'Nombre Producto'] = None
+    if fechas_nulas:
+        df.loc[rng.random(filas) < 0.01, 'Fecha'] = pd.NaT
+    vacio = df['Nombre Producto'] == nombres[0]
+    df.loc[vacio, ['Ventas', 'Stock Final', 'Tiempo']] = np.nan
+    return df
+
+
+def inventario(**kwargs):
+    return preparar_datos(inventario_crudo(**kwargs))
+
+
+def excel(df):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(list(df.columns))
+    for fila in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+        hoja.append([v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in fila])
+    archivo = io.BytesIO()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def base_y_extendido(crudo):
+    """
+    Archivo base (filas hasta una fecha de corte) y el mismo archivo con filas
+    posteriores agregadas al final, como lo extiende un usuario.
+    """
+    corte = crudo['Fecha'].quantile(0.5)
+    base = crudo[crudo['Fecha'] <= corte]
+    return base, pd.concat([base, crudo[crudo['Fecha'] > corte]], ignore_index=True)
+
+
+def por_bloques(df, filas_por_bloque):
+    parcial = None
+    for inicio in range(0, len(df), filas_por_bloque):
+        parcial = combinar_parciales(parcial, agregar_parcial(df.iloc[inicio:inicio + filas_por_bloque]))
+    return finalizar_agregados(parcial)
+
+
+def test_paridad_archivo_completo():
+    df = inventario()
+    comparar(referencia(df), agregar_inventario(df))
+
+
+def test_grupos_sin_valores():
+    df = inventario()
+    obtenido = agregar_inventario(df)
+    vacio = obtenido['resumen_productos']['Nombre Producto'] == 'producto 0'
+
+    assert vacio.any()
+    assert obtenido['resumen_productos'].loc[vacio, 'Stock_Final_Ultimo_Dia'].isna().all()
+    assert obtenido['resumen_productos'].loc[vacio, 'Stock_Minimo_Promedio'].isna().all()
+    assert (obtenido['ventas_por_nombre'].set_index('Nombre Producto').loc['producto 0', 'Ventas']) == 0
+    comparar(referencia(df), obtenido)
+
+
+@pytest.mark.parametrize('filas_por_bloque', [7, 64, 333, 5_000])
+def test_paridad_por_bloques(filas_por_bloque):
+    df = inventario(filas=1_000)
+    comparar(referencia(df), por_bloques(df, filas_por_bloque))
+
+
+def test_fechas_repetidas_gana_la_ultima_fila():
+    df = preparar_datos(pd.DataFrame({
+        'Fecha': ['2024-03-01', '2024-03-05', '2024-03-05', '2024-03-02'],
+        'Nombre Producto': ['arroz', 'arroz', 'arroz', 'arroz'],
+        'Ventas': [1.0, 2.0, 3.0, 4.0],
+        'Gastos(compras)': [1.0, 1.0, 1.0, 1.0],
+        'Ventas Totales': [10.0, 10.0, 10.0, 10.0],
+        'Tiempo': [5.0, 5.0, 5.0, 5.0],
+        'Reposición (días)': [2.0, 2.0, 2.0, 2.0],
+        'Stock Final': [10.0, 20.0, 30.0, 40.0],
+    }))
+    esperado = referencia(df)
+
+    assert esperado['resumen_productos']['Stock_Final_Ultimo_Dia'].tolist() == [30.0]
+    comparar(esperado, agregar_inventario(df))
+    comparar(esperado, por_bloques(df, 2))
+
+
+@pytest.mark.parametrize('filas_por_bloque', [97, 5_000])
+def test_paridad_incremental(filas_por_bloque):
+    base, extendido = base_y_extendido(inventario_crudo(filas=1_500, fechas_nulas=False))
+    parcial_base = agregar_excel_streaming(excel(base), filas_por_bloque=filas_por_bloque)['parcial']
+    obtenido = agregar_excel_streaming(excel(extendido), filas_por_bloque=filas_por_bloque,
+                                       parcial_base=parcial_base)
+
+    comparar(referencia(preparar_datos(extendido.copy())), obtenido)
+    comparar(agregar_excel_streaming(excel(extendido)), obtenido)
+
+
+def test_archivo_completo_cuenta_filas_sin_fecha():
+    crudo = inventario_crudo(filas=600)
+    assert crudo['Fecha'].isna().any()
+    obtenido = agregar_excel_streaming(excel(crudo), filas_por_bloque=64)
+
+    comparar(referencia(preparar_datos(crudo.copy())), obtenido)
+    assert obtenido['total_ventas'] == pytest.approx(crudo['Ventas'].sum())
+
+
+def test_incremental_rechaza_filas_sin_fecha():
+    base, extendido = base_y_extendido(inventario_crudo(filas=600, fechas_nulas=False))
+    parcial_base = agregar_excel_streaming(excel(base))['parcial']
+    extendido.loc[len(extendido) - 1, 'Fecha'] = pd.NaT
+
+    with pytest.raises(ValueError, match='sin una Fecha válida'):
+        agregar_excel_streaming(excel(extendido), parcial_base=parcial_base)
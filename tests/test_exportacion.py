@@ -0,0 +1,73 @@
+# tests/test_exportacion.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app.exportacion import Exportador, PARQUET_DISPONIBLE
+from app.ingesta import agregar_excel_streaming, TIPOS_EXPORTACION
+
+requiere_parquet = pytest.mark.skipif(not PARQUET_DISPONIBLE, reason="pyarrow no está instalado")
+
+ENCABEZADOS = ['Fecha', 'Nombre Producto', 'Ventas', 'Gastos(compras)', 'Ventas Totales',
+               'Tiempo', 'Reposición (días)', 'Stock Final', 'Comentario']
+
+
+def _excel(filas):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(ENCABEZADOS)
+    for fila in filas:
+        hoja.append(fila)
+    archivo = io.BytesIO()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def _filas_mixtas():
+    """
+    Diez filas con ventas enteras y sin comentario (el primer bloque queda con int64 y
+    una columna toda nula), luego filas con decimales y comentarios.
+    """
+    filas = [[pd.Timestamp(2025, 1, 1 + i).to_pydatetime(), 'Arroz', 3, 10, 30, 30, 7, 5, None]
+             for i in range(10)]
+    filas += [[pd.Timestamp(2025, 2, 1 + i).to_pydatetime(), 'Leche', 12.5, 7.25, 40.5, 30, 5, 2, 'revisar']
+              for i in range(5)]
+    return filas
+
+
+@requiere_parquet
+def test_parquet_bloques_con_tipos_distintos():
+    exportador = Exportador('parquet', tipos=TIPOS_EXPORTACION)
+    agregar_excel_streaming(_excel(_filas_mixtas()), filas_por_bloque=10, exportador=exportador)
+    resultado = pd.read_parquet(exportador.cerrar())
+
+    assert len(resultado) == 15
+    assert resultado['Ventas'].dtype == np.float64
+    assert resultado['Ventas'].tolist() == [3.0] * 10 + [12.5] * 5
+    assert resultado['Comentario'].isna().sum() == 10
+    assert resultado['Comentario'].iloc[-1] == 'revisar'
+    assert pd.api.types.is_datetime64_any_dtype(resultado['Fecha'])
+
+
+@requiere_parquet
+def test_parquet_sin_tipos_declarados():
+    exportador = Exportador('parquet')
+    exportador.agregar(pd.DataFrame({'Ventas': [1, 2], 'Nota': [None, None]}))
+    exportador.agregar(pd.DataFrame({'Ventas': [2.5, None], 'Nota': ['a', None]}))
+    resultado = pd.read_parquet(exportador.cerrar())
+
+    assert resultado['Ventas'].tolist()[:3] == [1.0, 2.0, 2.5]
+    assert resultado['Nota'].tolist()[2] == 'a'
+
+
+def test_csv_encabezado_una_vez():
+    exportador = Exportador('csv')
+    exportador.agregar(pd.DataFrame({'Ventas': pd.Series([], dtype='float64')}))
+    exportador.agregar(pd.DataFrame({'Ventas': [1, 2]}))
+    contenido = exportador.cerrar().read().decode('utf-8')
+
+    assert contenido.splitlines() == ['Ventas', '1', '2']
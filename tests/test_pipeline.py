@@ -0,0 +1,113 @@
+# tests/test_pipeline.py - reutilización de sesiones por contenido y modo incremental
+import io
+
+import pandas as pd
+import pytest
+from conftest import BUCKET
+from openpyxl import Workbook
+
+pytest.importorskip('moto')
+
+ENCABEZADOS = ['Fecha', 'Nombre Producto', 'Ventas', 'Gastos(compras)', 'Ventas Totales',
+               'Tiempo', 'Reposición (días)', 'Stock Final']
+
+
+def excel(filas):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(ENCABEZADOS)
+    for fila in filas:
+        hoja.append(fila)
+    archivo = io.BytesIO()
+    libro.save(archivo)
+    return archivo.getvalue()
+
+
+def filas_inventario(cantidad, desde='2024-01-01'):
+    inicio = pd.Timestamp(desde)
+    return [[(inicio + pd.Timedelta(hours=6 * i)).to_pydatetime(), f"producto {i % 7}",
+             float(i % 50), float(i % 30), 100.0, 30.0, 5.0, float(i % 90)]
+            for i in range(cantidad)]
+
+
+def procesar(datos, session_id, user_id, **kwargs):
+    from app.pipeline import procesar_inventario
+
+    kwargs.setdefault('formato_exportacion', 'csv')
+    return procesar_inventario(io.BytesIO(datos), session_id, BUCKET, user_id=user_id, **kwargs)
+
+
+def filas_exportadas(session_id, formato='csv'):
+    from app.s3_utils import get_s3_client
+
+    cuerpo = get_s3_client().get_object(Bucket=BUCKET, Key=f"{session_id}/inventario_calculado.{formato}")['Body']
+    return len(pd.read_csv(io.BytesIO(cuerpo.read())))
+
+
+def test_reutiliza_el_mismo_archivo(user_id):
+    datos = excel(filas_inventario(50))
+    assert procesar(datos, 's1', user_id) == 's1'
+    assert procesar(datos, 's2', user_id) == 's1'
+
+
+def test_no_reutiliza_otro_formato_ni_otro_modo_de_graficos(user_id):
+    datos = excel(filas_inventario(50))
+    assert procesar(datos, 's1', user_id, generar_graficos=True, modo_graficos='cliente') == 's1'
+    assert procesar(datos, 's2', user_id, generar_graficos=True, modo_graficos='cliente',
+                    formato_exportacion='xlsx') == 's2'
+    assert procesar(datos, 's3', user_id, generar_graficos=True, modo_graficos='servidor') == 's3'
+    # Sin gráficos sirve la sesión que los tiene, y los conserva
+    assert procesar(datos, 's4', user_id) == 's3'
+    from app.models import ProcessingSession
+    from app import db
+    assert db.session.get(ProcessingSession, 's3').charts_enabled
+
+
+def test_carga_completa_no_reutiliza_una_sesion_incremental(user_id):
+    base = filas_inventario(300)
+    # Los mismos bytes en las dos cargas (openpyxl guarda la hora de creación)
+    extendido = excel(base + filas_inventario(600, desde='2024-04-01'))
+    procesar(excel(base), 'base', user_id)
+    assert procesar(extendido, 'incremental', user_id, sesion_base='base') == 'incremental'
+    assert filas_exportadas('incremental') == 600
+
+    # La carga completa del mismo archivo: nueva sesión con todas las filas
+    assert procesar(extendido, 'completa', user_id) == 'completa'
+    assert filas_exportadas('completa') == 900
+
+
+def test_reporte_con_grafico_fallido_se_renderiza_una_vez(app, user_id, monkeypatch):
+    import app.pdf as pdf
+
+    procesar(excel(filas_inventario(50)), 's1', user_id, generar_graficos=True)
+    renderizados = []
+    construir_pdf = pdf.construir_pdf
+    monkeypatch.setattr(pdf, 'construir_pdf', lambda *a: renderizados.append(a) or construir_pdf(*a))
+    monkeypatch.setattr(pdf, 'obtener_graficos', lambda bucket, sesion, nombres, workers=None:
+                        [(nombre, None, None) for nombre in nombres])
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'prueba', 'password': 'clave'})
+    respuesta = cliente.get('/generar_pdf')
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/pdf'
+    assert respuesta.data.startswith(b'%PDF')
+    assert len(renderizados) == 1
+    # Incompleto: no queda guardado en S3
+    assert pdf.preparar_reporte(user_id)['key'] is None
+
+
+def test_nombres_de_producto_largos_se_guardan_completos(user_id):
+    from app.models import ProcessingSession, ProductMonthSummary
+
+    # SQLite no aplica el largo de VARCHAR; Postgres sí, así que se revisa también el tipo
+    for columna in (ProductMonthSummary.product, ProcessingSession.best_seller, ProcessingSession.worst_seller):
+        assert getattr(columna.type, 'length', None) is None
+
+    largo = 'producto ' + 'x' * 300
+    filas = filas_inventario(50)
+    for fila in filas[::2]:
+        fila[1] = largo
+    assert procesar(excel(filas), 's1', user_id) == 's1'
+    assert ProductMonthSummary.query.filter_by(session_id='s1', product=largo).count() > 0
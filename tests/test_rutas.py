@@ -0,0 +1,21 @@
+# tests/test_rutas.py - acceso a las rutas internas
+import pytest
+
+
+@pytest.fixture
+def cliente(app, user_id):
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'prueba', 'password': 'clave'})
+    return cliente
+
+
+def test_estadisticas_cache_solo_para_administradores(cliente, monkeypatch):
+    from app import routes
+
+    monkeypatch.setattr(routes, 'ADMIN_USUARIOS', set())
+    assert cliente.get('/estadisticas/cache').status_code == 404
+
+    monkeypatch.setattr(routes, 'ADMIN_USUARIOS', {'prueba'})
+    respuesta = cliente.get('/estadisticas/cache')
+    assert respuesta.status_code == 200
+    assert set(respuesta.get_json()) == {'pid', 'usuarios', 'artefactos'}
@@ -1,6 +1,11 @@
+import os
 from app import create_app
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Con el recargador de debug solo el proceso hijo atiende requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from app.jobs import reanudar_cola
+        reanudar_cola(app)
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file